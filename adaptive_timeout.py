@@ -0,0 +1,270 @@
+"""
+按主机自适应的请求超时与对冲请求
+requests 的 timeout=(连接, 读取) 中，连接超时只约束建立连接，读取超时约束每一次套接字读取
+（等待响应头，以及下载正文时相邻两块数据之间的等待），而不是整个下载的耗时，因此分阶段记录：
+  - 连接耗时：ConnectTimingAdapter 在连接池每次新建连接（TCP + TLS 握手）时记录，连接超时按其 p95 推算
+  - 读取等待：发出请求到收到响应头的耗时（resp.elapsed）与正文相邻数据块的最大间隔中较大者，读取超时按其 p99 推算
+  - 完整耗时：用于对冲请求的时机和汇总
+  - 超时的请求只按超时的那个阶段记一个样本（连接超时记连接耗时，读取超时记读取等待）
+  某阶段样本不足时该阶段使用 timeout_max，两个阶段都不足时退回 [timeout_min, timeout_max] 内的随机超时
+  - hedged_get 在主请求超过该主机 p95 耗时仍未完成时，再发出一个相同的请求，
+    先完成者胜出，落后的请求立即关闭连接（还在等待响应头的，收到响应头后立即关闭）
+"""
+import os
+import math
+import time
+import random
+import socket
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+def format_timeout(timeout) -> str:
+    """把 requests 的 timeout 参数（数值或 (连接, 读取) 元组）格式化为便于打印的字符串"""
+    if isinstance(timeout, tuple):
+        return f"{timeout[0]:.2f}/{timeout[1]:.2f}秒"
+    return f"{timeout:.2f}秒"
+
+def headers_seconds(resp):
+    """发出请求到解析完响应头的耗时（秒），响应对象没有 elapsed 时返回 None"""
+    elapsed = getattr(resp, "elapsed", None)
+    return elapsed.total_seconds() if elapsed is not None else None
+
+def read_content(resp, chunk_size=64 * 1024, cancelled=None) -> tuple:
+    """
+    分块读取 stream=True 的响应正文并关闭响应
+    :param cancelled: threading.Event，置位后停止读取并返回 (None, 已测得的最大间隔)
+    :return: (正文, 相邻两块数据之间的最大等待秒数)
+    """
+    chunks = []
+    max_gap = 0.0
+    last = time.monotonic()
+    try:
+        for chunk in resp.iter_content(chunk_size):
+            now = time.monotonic()
+            max_gap = max(max_gap, now - last)
+            last = now
+            if cancelled is not None and cancelled.is_set():
+                return None, max_gap
+            chunks.append(chunk)
+    finally:
+        resp.close()
+    return b"".join(chunks), max_gap
+
+class LatencyTracker:
+    """按主机分阶段记录请求耗时（秒），线程安全"""
+
+    def __init__(self, window=200, min_samples=10, connect_factor=3.0, read_factor=3.0, min_timeout=1.0):
+        """
+        :param window: 每个主机每个阶段保留最近多少个样本
+        :param min_samples: 样本数达到多少后才启用自适应超时
+        :param connect_factor: 连接超时 = 连接耗时 p95 × connect_factor
+        :param read_factor: 读取超时 = 读取等待 p99 × read_factor
+        :param min_timeout: 超时下限（秒）
+        """
+        self.enabled = True
+        self.window = window
+        self.min_samples = min_samples
+        self.connect_factor = connect_factor
+        self.read_factor = read_factor
+        self.min_timeout = min_timeout
+        # 阶段 -> {主机 -> 最近的样本}；完整耗时和读取等待按 netloc，连接耗时按主机名（连接池只知道主机名）
+        self.samples = {"total": {}, "read": {}, "connect": {}}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlsplit(url).netloc
+
+    def _add(self, kind: str, host: str, seconds: float):
+        with self.lock:
+            if host not in self.samples[kind]:
+                self.samples[kind][host] = deque(maxlen=self.window)
+            self.samples[kind][host].append(seconds)
+
+    def record(self, url: str, seconds: float, headers_seconds: float = None, gap_seconds: float = None):
+        """
+        记录一次完成的请求
+        :param seconds: 完整耗时（含读取正文）
+        :param headers_seconds: 等待响应头的耗时（resp.elapsed），未知时为 None
+        :param gap_seconds: 读取正文时相邻两块数据的最大间隔，未分块读取时为 None
+        """
+        host = self.host_of(url)
+        self._add("total", host, seconds)
+        waits = [value for value in (headers_seconds, gap_seconds) if value is not None]
+        if waits:
+            self._add("read", host, max(waits))
+
+    def record_connect(self, hostname: str, seconds: float):
+        """记录一次新建连接（TCP + TLS 握手）的耗时，由 ConnectTimingAdapter 调用"""
+        self._add("connect", hostname, seconds)
+
+    def record_timeout(self, url: str, timeout, connect: bool = False):
+        """
+        超时的请求只在超时的阶段按超时值记一个样本，使主机变慢时该阶段的分位数随之上升
+        :param connect: 是否为连接超时（requests.exceptions.ConnectTimeout），否则为读取超时
+        """
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        if connect:
+            self.record_connect(urlsplit(url).hostname, connect_timeout)
+        else:
+            self._add("read", self.host_of(url), read_timeout)
+
+    def percentile(self, url: str, q: float, kind: str = "total"):
+        """返回 url 所在主机某阶段（total/read/connect）耗时的 q 分位数，样本不足时返回 None"""
+        host = urlsplit(url).hostname if kind == "connect" else self.host_of(url)
+        return self.host_percentile(host, q, kind)
+
+    def host_percentile(self, host: str, q: float, kind: str = "total"):
+        with self.lock:
+            data = sorted(self.samples[kind].get(host, ()))
+        if len(data) < self.min_samples:
+            return None
+        index = min(len(data) - 1, max(0, math.ceil(q / 100 * len(data)) - 1))
+        return data[index]
+
+    def timeouts(self, url: str, timeout_min=8.0, timeout_max=12.0):
+        """
+        返回 requests 的 timeout 参数
+        样本足够时为 (连接超时, 读取超时)，分别由该主机连接耗时的 p95 和读取等待的 p99 推算，
+        并限制在 [min_timeout, timeout_max]，样本不足的阶段取 timeout_max；
+        两个阶段样本都不足（或已关闭自适应）时为 [timeout_min, timeout_max] 内的随机值
+        """
+        if not self.enabled:
+            return random.uniform(timeout_min, timeout_max)
+        connect_p95 = self.percentile(url, 95, "connect")
+        read_p99 = self.percentile(url, 99, "read")
+        if connect_p95 is None and read_p99 is None:
+            return random.uniform(timeout_min, timeout_max)
+        return (self._scaled(connect_p95, self.connect_factor, timeout_max),
+                self._scaled(read_p99, self.read_factor, timeout_max))
+
+    def _scaled(self, value, factor, timeout_max):
+        if value is None:
+            return timeout_max
+        return min(timeout_max, max(self.min_timeout, value * factor))
+
+    def hedge_delay(self, url: str):
+        """对冲请求的发出时机：该主机完整耗时的 p95，样本不足时返回 None（不对冲）"""
+        return self.percentile(url, 95) if self.enabled else None
+
+    def summary(self) -> str:
+        """各主机完整耗时 p50/p95 的简要说明"""
+        parts = []
+        for host in sorted(self.samples["total"]):
+            p50, p95 = self.host_percentile(host, 50), self.host_percentile(host, 95)
+            if p50 is not None:
+                parts.append(f"{host} p50={p50:.2f}秒 p95={p95:.2f}秒")
+        return "；".join(parts)
+
+def _timed_connection(connection_cls, tracker):
+    """返回记录建立连接耗时的连接类"""
+    class TimedConnection(connection_cls):
+        def connect(self):
+            start = time.monotonic()
+            super().connect()
+            tracker.record_connect(self.host, time.monotonic() - start)
+    return TimedConnection
+
+class ConnectTimingAdapter(HTTPAdapter):
+    """连接池每次新建连接时把耗时记入 LatencyTracker，挂载到 requests.Session 上使用"""
+
+    def __init__(self, tracker, **kwargs):
+        self.tracker = tracker
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("TimedHTTPConnectionPool", (HTTPConnectionPool,),
+                         {"ConnectionCls": _timed_connection(HTTPConnection, self.tracker)}),
+            "https": type("TimedHTTPSConnectionPool", (HTTPSConnectionPool,),
+                          {"ConnectionCls": _timed_connection(HTTPSConnection, self.tracker)}),
+        }
+
+def _abort(resp):
+    """
+    关闭响应底层的套接字，另一个线程中阻塞的读取立即出错返回，连接不会放回连接池
+    （resp.close() 要等阻塞中的读取结束才能拿到缓冲区的锁，慢连接上可能等很久）
+    """
+    try:
+        fd = resp.raw.fileno()
+    except (AttributeError, OSError, ValueError):
+        return
+    # 复制出的描述符指向同一个套接字，shutdown 对原连接生效，关闭副本不影响原描述符
+    try:
+        with socket.socket(fileno=os.dup(fd)) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def hedged_get(session, url, timeout, hedge_after, tracker=None, chunk_size=64 * 1024):
+    """
+    带对冲的 GET 请求
+    :param session: requests.Session
+    :param timeout: requests 的 timeout 参数
+    :param hedge_after: 主请求超过多少秒未完成时发出对冲请求
+    :param tracker: LatencyTracker，记录胜出请求的耗时和对冲次数
+    :return: (响应对象, 响应内容)；两个请求都失败时抛出最后一个异常
+    """
+    cancelled = threading.Event()
+    # 已收到响应头的请求，胜负分出后关闭落后者的连接，使其阻塞中的读取立即结束
+    responses = []
+    lock = threading.Lock()
+
+    def attempt():
+        start = time.monotonic()
+        resp = session.get(url, stream=True, timeout=timeout)
+        with lock:
+            if cancelled.is_set():
+                resp.close()
+                return None
+            responses.append(resp)
+        content, gap = read_content(resp, chunk_size, cancelled)
+        if content is None:
+            return None
+        if tracker is not None:
+            tracker.record(url, time.monotonic() - start, headers_seconds(resp), gap)
+        return resp, content
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        primary = executor.submit(attempt)
+        pending = {primary}
+        done, _ = wait(pending, timeout=hedge_after)
+        if not done:
+            pending.add(executor.submit(attempt))
+            if tracker is not None:
+                with tracker.lock:
+                    tracker.hedges += 1
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if result is not None:
+                    # 关闭落后请求的连接；还没收到响应头的，收到后立即关闭
+                    cancelled.set()
+                    with lock:
+                        for resp in responses:
+                            if resp is not result[0]:
+                                _abort(resp)
+                    if future is not primary and tracker is not None:
+                        with tracker.lock:
+                            tracker.hedge_wins += 1
+                    return result
+        raise error
+    finally:
+        executor.shutdown(wait=False)
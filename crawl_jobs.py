@@ -0,0 +1,306 @@
+"""
+多任务爬取
+在一个进程内按任务文件执行多组爬取配置（不同的股票文件、--days、--no-html、保存目录等）：
+  - 所有任务共用一个 HTTP 连接池和一个全局请求速率预算（令牌桶，按每秒请求数限制列表请求和下载的总和），
+    各任务自己的 --delay / --download-delay 仍然生效
+  - 已下载公告ID合并为一个共享台账：某个任务已下载的公告，其他任务不再下载；
+    并行时同一公告同一时间只由一个任务下载
+  - 结束时台账写回 --ledger-dir 和每个任务的保存目录（.downloaded_ids.u64），单独运行 main_api_1118.py 时同样跳过
+
+任务文件（JSON）示例：
+    {
+      "jobs": [
+        {"name": "daily", "args": {"stock-file": "stockcodes/codes.txt", "days": 1}},
+        {"name": "annual", "args": {"stock-file": "stockcodes/big.txt", "category": "年报", "no-html": true,
+                                    "save-dir": "downloads_annual", "max-items-total": 500}}
+      ]
+    }
+args 的键为 main_api_1118.py 的参数名（不带 --），值为 true 的作为开关；也可以直接写参数列表 ["--days", "1"]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import id_set
+import storage
+import main_api_1118 as crawler
+from adaptive_timeout import ConnectTimingAdapter
+from response_cache import ResponseCache
+from download_scheduler import DownloadScheduler, PriorityPolicy, parse_keyword_weights, load_deferred, save_deferred, DEFERRED_FILE
+
+# 任务中不支持的参数：常驻模式、只估算、剖析和自适应超时（所有任务共用一份延迟统计）都是整个进程级别的行为
+UNSUPPORTED_OPTIONS = ("watch", "plan_only", "profile", "no_adaptive_timeout")
+
+class RateBudget:
+    """令牌桶：平均每秒最多 rate 个请求，允许 burst 个突发，线程安全"""
+
+    def __init__(self, rate=1.0, burst=1):
+        if rate <= 0:
+            raise ValueError(f"请求速率必须大于 0: {rate}")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def acquire(self):
+        """取一个令牌，不够时等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+class BudgetedSession(requests.Session):
+    """每个请求发出前先从共享的速率预算中取令牌"""
+
+    def __init__(self, budget, pool_size=10):
+        super().__init__()
+        self.budget = budget
+        adapter = ConnectTimingAdapter(crawler.LATENCY, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, *args, **kwargs):
+        self.budget.acquire()
+        return super().request(*args, **kwargs)
+
+class SharedLedger:
+    """各任务共享的已下载公告ID台账"""
+
+    def __init__(self, ids):
+        self.ids = ids
+        # 网页公告不写入已下载台账，只在本次运行内去重
+        self.html_ids = set()
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(item) -> str:
+        # 个别公告没有 announcementId，按附件地址区分，避免它们互相冲突只下载第一条
+        return item.announcement_id or "url:" + item.adjunct_url
+
+    def claim(self, item) -> bool:
+        """登记即将下载的公告；已下载、或正由其他任务下载时返回 False"""
+        with self.lock:
+            key = self.key(item)
+            if item.announcement_id and item.announcement_id in self.ids:
+                return False
+            if key in self.html_ids or key in self.in_flight:
+                return False
+            self.in_flight.add(key)
+            return True
+
+    def release(self, item, ok: bool):
+        with self.lock:
+            key = self.key(item)
+            self.in_flight.discard(key)
+            if ok and not item.is_pdf:
+                self.html_ids.add(key)
+
+def job_argv(job_args) -> list:
+    """把任务的 args（字典或参数列表）转换为命令行参数列表"""
+    if isinstance(job_args, list):
+        return [str(arg) for arg in job_args]
+    argv = []
+    for key, value in (job_args or {}).items():
+        option = "--" + key.lstrip("-")
+        if value is True:
+            argv.append(option)
+        elif value is not False and value is not None:
+            argv.extend([option, str(value)])
+    return argv
+
+def load_jobs(job_file) -> list:
+    """
+    读取任务文件，返回 [(任务名, 参数 Namespace), ...]
+    参数错误时抛出 ValueError
+    """
+    with open(job_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    jobs = []
+    for index, job in enumerate(spec.get("jobs") or []):
+        name = job.get("name") or f"job{index + 1}"
+        try:
+            args = crawler.parse_args(job_argv(job.get("args")))
+        except SystemExit:
+            raise ValueError(f"任务 {name} 的参数有误") from None
+        for option in UNSUPPORTED_OPTIONS:
+            if getattr(args, option, None):
+                raise ValueError(f"任务 {name}: 多任务模式不支持 --{option.replace('_', '-')}")
+        if args.compress:
+            try:
+                storage.check_compression(args.compress)
+            except (ValueError, RuntimeError) as e:
+                raise ValueError(f"任务 {name}: {e}") from None
+        args.category = crawler.resolve_categories(args.category)
+        args.searchkey = args.searchkey.strip()
+        args.priority_keywords = parse_keyword_weights(args.priority_keywords)
+        jobs.append((name, args))
+    if not jobs:
+        raise ValueError(f"任务文件中没有任务: {job_file}")
+    return jobs
+
+def run_job(name, args, ledger) -> dict:
+    """执行一个任务的列表抓取和下载，返回统计 {name, listed, downloaded, shared}"""
+    log = lambda message: print(f"[{name}] {message}")
+    stock_codes = crawler.load_stock_codes(args)
+    os.makedirs(args.save_dir, exist_ok=True)
+    ids_before = len(ledger.ids)
+
+    se_date = None
+    if args.start_date or args.end_date:
+        end_date = args.end_date or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        se_date = f"{args.start_date or ''}~{end_date}"
+    response_cache = None
+    if not args.no_cache:
+        response_cache = ResponseCache(os.path.join(args.save_dir, ".http_cache"),
+                                       max_bytes=args.cache_max_mb * 1024 * 1024, ttl=args.cache_ttl)
+
+    policy = None
+    if args.priority:
+        policy = PriorityPolicy(args.priority_age_weight, args.priority_size_weight, args.priority_keywords)
+    # 任务失败时也要删除队列临时文件，进程还会继续执行其他任务
+    with DownloadScheduler(policy, crawler.get_announcement_date, args.deadline,
+                           spool_dir=args.save_dir, record_type=crawler.Announcement) as scheduler:
+        stats = crawler.RunStats()
+        for item in crawler.iter_announcements(stock_codes, args, ledger.ids, se_date, response_cache, stats):
+            if (item.is_pdf or not args.no_html) and scheduler.push(item, 1 if item.is_pdf else 2):
+                stats.add_item(item)
+        log(f"共获取 {stats.total} 条待下载公告（列表请求 {stats.list_requests} 次）")
+
+        deferred_file = os.path.join(args.save_dir, DEFERRED_FILE)
+        for item in load_deferred(deferred_file, crawler.Announcement):
+            if item.announcement_id not in ledger.ids and (item.is_pdf or not args.no_html):
+                if scheduler.push(item, 0, args.priority_deferred_bonus):
+                    stats.add_item(item)
+
+        shared = 0
+        for item in scheduler:
+            if not ledger.claim(item):
+                shared += 1
+                continue
+            ok = False
+            start = time.monotonic()
+            try:
+                if item.is_pdf:
+                    ok = crawler.download_pdf(item, args.save_dir, ledger.ids, args.timeout_min, args.timeout_max,
+                                              max_retries=args.max_retries, retry_delay=args.retry_delay, hedge=args.hedge,
+                                              compression=args.compress, compression_level=args.compress_level)
+                else:
+                    ok = crawler.download_html(item, args.save_dir, args.timeout_min, args.timeout_max,
+                                               args.compress, args.compress_level)
+            finally:
+                ledger.release(item, ok)
+            if ok:
+                elapsed = time.monotonic() - start
+                stats.add_success(item, elapsed)
+                scheduler.record(item, elapsed)
+            time.sleep(random.uniform(args.download_delay_min, args.download_delay_max))
+        save_deferred(deferred_file, scheduler.iter_deferred())
+
+        if args.export_dir:
+            crawler.export_items(scheduler.spooled(), args.save_dir, args.export_dir, args.export_format,
+                                 args.export_batch_size, args.compress, args.convert_dir)
+    missing_codes = sorted(code for code in stock_codes if code.split('.')[0] not in stats.per_stock)
+    crawler.generate_download_report(args.save_dir, stock_codes, stats, set(stock_codes), missing_codes,
+                                     ids_before, ledger.ids, args)
+
+    downloaded = stats.success_pdf + stats.success_html
+    log(f"完成: 下载 {downloaded}/{stats.total} 份，其中 {shared} 份已由其他任务下载而跳过"
+        + (f"，推迟 {len(scheduler.deferred)} 份" if scheduler.deferred else ""))
+    return {"name": name, "listed": stats.total, "downloaded": downloaded, "shared": shared}
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="在一个进程内执行多组爬取配置，共享连接池、请求速率预算和已下载台账",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 顺序执行任务文件中的所有任务，所有任务合计每秒最多 1 个请求
+        python crawl_jobs.py jobs.json
+
+        # 3 个任务并行，合计每秒最多 2 个请求、允许 4 个突发
+        python crawl_jobs.py jobs.json --parallel 3 --rate 2 --burst 4
+        """
+    )
+    parser.add_argument("job_file", help="任务文件（JSON），格式见 crawl_jobs.py 开头说明")
+    parser.add_argument("--parallel", type=int, default=1, help="同时执行的任务数 (默认: 1)")
+    parser.add_argument("--rate", type=float, default=1.0, help="所有任务合计每秒最多发出多少个请求 (默认: 1.0)")
+    parser.add_argument("--burst", type=int, default=1, help="速率预算允许的突发请求数 (默认: 1)")
+    parser.add_argument("--ledger-dir", type=str, default="downloads",
+                        help="共享台账 .downloaded_ids.u64 所在目录 (默认: downloads)")
+    parser.add_argument("--no-adaptive-timeout", action="store_true",
+                        help="所有任务都关闭自适应超时，按各任务的 --timeout-min/--timeout-max 随机取值")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    try:
+        jobs = load_jobs(args.job_file)
+        budget = RateBudget(args.rate, args.burst)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    # 所有任务共用一个会话（连接池）和一份延迟统计；crawler 中的请求都通过 crawler.HTTP_SESSION 发出
+    crawler.HTTP_SESSION = BudgetedSession(budget, pool_size=max(10, args.parallel * 2))
+    crawler.LATENCY.enabled = not args.no_adaptive_timeout
+
+    # 台账为 --ledger-dir 与各任务保存目录中已下载ID的并集：先按文件归并写入 --ledger-dir，
+    # 不把其他目录的ID逐个加入内存中的新增部分
+    save_dirs = [args.ledger_dir] + [job_args.save_dir for _, job_args in jobs]
+    save_dirs = list(dict.fromkeys(save_dirs))
+    ids = crawler.load_downloaded_ids(save_dirs[0])
+    if len(save_dirs) > 1:
+        id_sets = [ids] + [crawler.load_downloaded_ids(save_dir) for save_dir in save_dirs[1:]]
+        os.makedirs(save_dirs[0], exist_ok=True)
+        id_set.write_union(id_sets, os.path.join(save_dirs[0], id_set.ID_FILE))
+        ids = crawler.load_downloaded_ids(save_dirs[0])
+    ledger = SharedLedger(ids)
+    ids_before = len(ids)
+    print(f"📋 共享台账: {ids_before} 个已下载公告ID，{len(jobs)} 个任务，并行 {args.parallel}，"
+          f"速率预算 {args.rate} 次/秒")
+
+    start = time.monotonic()
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+            futures = {executor.submit(run_job, name, job_args, ledger): name for name, job_args in jobs}
+            for future, name in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"❌ 任务 {name} 失败: {e}")
+    finally:
+        for save_dir in save_dirs:
+            os.makedirs(save_dir, exist_ok=True)
+            crawler.save_downloaded_ids(save_dir, ledger.ids)
+
+    print("\n🎯 全部任务完成")
+    for result in results:
+        print(f"   {result['name']}: 下载 {result['downloaded']}/{result['listed']} 份，跨任务去重跳过 {result['shared']} 份")
+    print(f"   新增下载: {len(ledger.ids) - ids_before} 份PDF，共发出 {budget.acquired} 个请求，"
+          f"因速率预算等待 {budget.waited:.1f} 秒，用时 {time.monotonic() - start:.1f} 秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+爬取计划估算（--plan-only）
+  - 每批股票只请求第 1 页，读取服务端返回的公告总数（totalAnnouncement），
+    按与 iter_announcements 相同的翻页规则算出列表请求数，按第 1 页样本的 PDF 占比和 adjunctSize 估计下载量
+  - 每次实际运行结束后把列表请求、下载的耗时和字节数追加到 <保存目录>/.run_history.jsonl，
+    估算耗时时使用最近若干次运行的实测速率，延迟按配置的随机区间均值计入
+"""
+import json
+import math
+from datetime import datetime, timezone
+
+HISTORY_FILE = ".run_history.jsonl"
+HISTORY_RUNS = 20
+
+def append_history(path, stats):
+    """追加一次运行的实测数据（RunStats 中的计时字段）"""
+    record = {
+        "finished_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "list_requests": stats.list_requests,
+        "list_seconds": round(stats.list_seconds, 3),
+        "pdf_downloads": stats.success_pdf,
+        "pdf_bytes": stats.pdf_bytes,
+        "pdf_seconds": round(stats.pdf_seconds, 3),
+        "html_downloads": stats.success_html,
+        "html_seconds": round(stats.html_seconds, 3),
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+def load_throughput(path, runs=HISTORY_RUNS) -> dict:
+    """
+    汇总最近 runs 次运行的实测速率
+    :return: {list_seconds_per_request, pdf_bytes_per_second, html_seconds_per_item, runs}，没有样本的项为 None
+    """
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    records = records[-runs:]
+
+    def total(field):
+        return sum(record.get(field, 0) for record in records)
+
+    return {
+        "runs": len(records),
+        "list_seconds_per_request": total("list_seconds") / total("list_requests") if total("list_requests") else None,
+        "pdf_bytes_per_second": total("pdf_bytes") / total("pdf_seconds") if total("pdf_seconds") > 0 else None,
+        "html_seconds_per_item": total("html_seconds") / total("html_downloads") if total("html_downloads") else None,
+    }
+
+def list_requests_for(total: int, needed: int, page_size: int) -> int:
+    """
+    一批股票按 iter_announcements 的规则翻页时发出的列表请求数
+    :param total: 该批公告总数
+    :param needed: 该批最多还需要多少条（受 --max-items-total 限制）
+    """
+    taken = min(total, needed)
+    if taken <= 0:
+        # 总数为 0 时仍会请求第 1 页；已达上限时不再请求
+        return 1 if needed > 0 else 0
+    pages = math.ceil(taken / page_size)
+    # 取完整批且最后一页恰好满页时，还会再请求一个空页才停止
+    if taken == total and total % page_size == 0 and taken < needed:
+        pages += 1
+    return pages
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}小时{minutes}分"
+    if minutes:
+        return f"{minutes}分{seconds}秒"
+    return f"{seconds}秒"
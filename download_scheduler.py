@@ -0,0 +1,212 @@
+"""
+下载阶段的优先级调度
+  - PriorityPolicy 为每条公告打分：标题关键词加分，发布越早、文件越大扣分越多，分高的先下载
+  - DownloadScheduler 用堆按分数出队；设置截止时间时，按已完成下载的实测速率估计每份文件的耗时，
+    放不进剩余时间的文件推迟，继续尝试更小的文件，到期后剩下的全部推迟
+  - 推迟的公告写入 <保存目录>/.deferred.jsonl，下次运行时重新加入队列（已下载的自动跳过）
+  - 指定 spool_dir 时公告记录写入临时文件，出队时再读回；内存中每条只保留堆条目 (分数, 分组, 序号, 文件偏移)
+    和去重用的公告ID（或附件地址），内存占用仍与队列长度成正比，只是每条远小于完整记录
+"""
+import os
+import json
+import time
+import heapq
+import tempfile
+from datetime import datetime, timezone
+
+DEFERRED_FILE = ".deferred.jsonl"
+
+def parse_keyword_weights(spec: str) -> dict:
+    """
+    解析关键词权重，如 "问询函:10,董事会:3"，未写权重的关键词记为 1
+    格式错误时抛出 ValueError
+    """
+    weights = {}
+    for part in (spec or "").replace("，", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        keyword, sep, weight = part.partition(":")
+        try:
+            weights[keyword.strip()] = float(weight) if sep else 1.0
+        except ValueError:
+            raise ValueError(f"关键词权重格式错误: {part}（应为 关键词:权重）") from None
+    return weights
+
+class PriorityPolicy:
+    """公告下载优先级打分，分数越高越先下载"""
+
+    def __init__(self, age_weight=1.0, size_weight=0.5, keyword_weights=None, today=None):
+        """
+        :param age_weight: 发布日期每早一天扣多少分
+        :param size_weight: 文件每 1MB 扣多少分（adjunctSize 以 KB 计，网页公告为 0）
+        :param keyword_weights: 标题包含关键词时加的分，{关键词: 分数}
+        :param today: 计算天数的基准日期 YYYY-MM-DD，默认当天（UTC）
+        """
+        self.age_weight = age_weight
+        self.size_weight = size_weight
+        self.keyword_weights = keyword_weights or {}
+        self.today = datetime.strptime(today, "%Y-%m-%d").date() if today else datetime.now(timezone.utc).date()
+
+    def score(self, item, date: str) -> float:
+        """
+        :param item: Announcement 记录
+        :param date: 公告日期 YYYY-MM-DD，未知时为空（不按日期扣分）
+        """
+        score = sum(weight for keyword, weight in self.keyword_weights.items() if keyword in item.title)
+        if date:
+            try:
+                age_days = (self.today - datetime.strptime(date, "%Y-%m-%d").date()).days
+                score -= self.age_weight * max(0, age_days)
+            except ValueError:
+                pass
+        score -= self.size_weight * float(item.adjunct_size or 0) / 1024
+        return score
+
+class DownloadScheduler:
+    """按优先级出队的下载队列，可设置截止时间"""
+
+    def __init__(self, policy=None, date_func=None, deadline=None, spool_dir=None, record_type=None):
+        """
+        :param policy: PriorityPolicy，为 None 时按分组、再按加入顺序下载
+        :param date_func: 由公告记录得到 YYYY-MM-DD 日期的函数
+        :param deadline: 下载阶段可用的秒数，None 表示不限
+        :param spool_dir: 临时文件所在目录，指定时公告记录写入磁盘而不留在内存中
+        :param record_type: 从临时文件读回记录时使用的类型（Announcement），指定 spool_dir 时必须提供
+        """
+        self.policy = policy
+        self.date_func = date_func or (lambda item: "")
+        self.deadline = deadline
+        self.record_type = record_type
+        self.spool = tempfile.TemporaryFile(dir=spool_dir, prefix=".pending_") if spool_dir is not None else None
+        self.heap = []
+        self.seq = 0
+        self.ids = set()
+        # 推迟的公告（启用临时文件时为文件偏移），用 iter_deferred() 读取
+        self.deferred = []
+        self.start = None
+        # 已完成下载的累计字节数和耗时，用于估计剩余文件能否在截止前完成
+        self.done_bytes = 0
+        self.done_seconds = 0.0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """删除临时文件"""
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def push(self, item, group: int = 0, bonus: float = 0.0) -> bool:
+        """
+        加入一条公告，同一公告ID只加入一次；没有ID的按附件地址去重，两者都没有时不去重
+        :param group: 分数相同时分组小的先出队（如上次推迟的、PDF、网页依次为 0、1、2）
+        :param bonus: 设置 policy 时在打分基础上额外加的分（如上次推迟的公告），不打分时忽略
+        """
+        key = item.announcement_id or item.adjunct_url
+        if key:
+            if key in self.ids:
+                return False
+            self.ids.add(key)
+        score = self.policy.score(item, self.date_func(item)) + bonus if self.policy else 0.0
+        ref = item
+        if self.spool is not None:
+            self.spool.seek(0, os.SEEK_END)
+            ref = self.spool.tell()
+            self.spool.write(json.dumps(item._asdict(), ensure_ascii=False).encode("utf-8") + b"\n")
+        heapq.heappush(self.heap, (-score, group, self.seq, ref))
+        self.seq += 1
+        return True
+
+    def _load(self, ref):
+        """由堆中保存的引用取回公告记录"""
+        if self.spool is None:
+            return ref
+        self.spool.seek(ref)
+        return self.record_type(**json.loads(self.spool.readline()))
+
+    def spooled(self):
+        """按加入顺序逐条读回所有加入过的公告（仅启用临时文件时可用），供下载后的导出使用"""
+        offset = 0
+        while True:
+            self.spool.seek(offset)
+            line = self.spool.readline()
+            if not line:
+                return
+            offset = self.spool.tell()
+            yield self.record_type(**json.loads(line))
+
+    def iter_deferred(self):
+        """逐条读回推迟的公告"""
+        for ref in self.deferred:
+            yield self._load(ref)
+
+    def remaining(self):
+        """距截止时间还剩多少秒，不限时返回 None"""
+        if self.deadline is None:
+            return None
+        if self.start is None:
+            self.start = time.monotonic()
+        return self.deadline - (time.monotonic() - self.start)
+
+    def estimate(self, item):
+        """按实测下载速率估计这份文件的耗时（秒），还没有样本或大小未知时返回 None"""
+        size = float(item.adjunct_size or 0) * 1024
+        if not size or not self.done_bytes or self.done_seconds <= 0:
+            return None
+        return size / (self.done_bytes / self.done_seconds)
+
+    def __iter__(self):
+        """按优先级逐条产出待下载的公告，放不进剩余时间的推迟"""
+        while self.heap:
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                self.deferred.extend(ref for _, _, _, ref in sorted(self.heap))
+                self.heap = []
+                return
+            _, _, _, ref = heapq.heappop(self.heap)
+            item = self._load(ref)
+            estimate = self.estimate(item)
+            if remaining is not None and estimate is not None and estimate > remaining:
+                self.deferred.append(ref)
+                continue
+            yield item
+
+    def record(self, item, seconds: float):
+        """记录一次成功下载的耗时（大小未知的不计入速率）"""
+        if not item.adjunct_size:
+            return
+        self.done_bytes += float(item.adjunct_size or 0) * 1024
+        self.done_seconds += seconds
+
+def load_deferred(path, record_type) -> list:
+    """读取上次推迟的公告，record_type 为 Announcement"""
+    items = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    items.append(record_type(**json.loads(line)))
+    except FileNotFoundError:
+        pass
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ 读取推迟队列失败，忽略: {path} - {e}")
+    return items
+
+def save_deferred(path, items) -> int:
+    """保存推迟的公告（可以是生成器），没有推迟时删除文件，返回保存条数"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item._asdict(), ensure_ascii=False) + "\n")
+            count += 1
+    if not count:
+        os.remove(path)
+    return count
@@ -0,0 +1,232 @@
+"""
+公告列式导出脚本
+把公告元数据和提取的正文批量写入按 日期/交易所 分区的 Parquet（或 Arrow IPC）文件，
+每次追加只新增分片文件，不改写历史分区
+依赖 pyarrow（可选）：pip install pyarrow
+"""
+import os
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow 为可选依赖，仅导出时需要
+    pa = None
+
+from pdf2md import extract_text_from_pdf, parse_announcement_name
+import storage
+
+DEFAULT_EXPORT_DIR = Path("export")
+LEDGER_FILE = ".exported_keys"
+
+COLUMNS = [
+    "announcement_id", "sec_code", "sec_name", "org_id", "exchange", "date",
+    "title", "adjunct_url", "file_type", "file_path", "text", "exported_at",
+]
+
+# 标准 orgId 的前四位标明交易所，如 gssz0000001、gssh0600000、gfbj0830799
+ORG_ID_EXCHANGES = {"gssz": "SZ", "gssh": "SH", "gfbj": "BJ", "gsbj": "BJ"}
+# 没有 orgId（回填历史文件）或 orgId 不是标准格式（如 9900012345）时按股票代码号段判断
+CODE_PREFIX_EXCHANGES = [("92", "BJ"), ("4", "BJ"), ("8", "BJ"), ("6", "SH"), ("9", "SH"), ("0", "SZ"), ("2", "SZ"), ("3", "SZ")]
+
+def exchange_of(sec_code: str, org_id: str = "") -> str:
+    """由 orgId 前缀判断交易所，无法判断时按股票代码号段；都无法判断时返回空字符串"""
+    exchange = ORG_ID_EXCHANGES.get((org_id or "")[:4].lower())
+    if exchange:
+        return exchange
+    for prefix, exchange in CODE_PREFIX_EXCHANGES:
+        if (sec_code or "").startswith(prefix):
+            return exchange
+    return ""
+
+def make_record(item, date: str, file_path: str = "", text: str = None) -> dict:
+    """
+    由公告记录构建一行导出记录
+    :param item: fetch_announcements 返回的 Announcement 记录
+    :param date: 公告日期 YYYY-MM-DD
+    :param file_path: 本地文件路径
+    :param text: 提取的正文（未提取则为 None）
+    """
+    return {
+        "announcement_id": item.announcement_id,
+        "sec_code": item.sec_code,
+        "sec_name": item.sec_name,
+        "org_id": item.org_id,
+        "exchange": exchange_of(item.sec_code, item.org_id),
+        "date": date or "",
+        "title": item.title,
+        "adjunct_url": item.adjunct_url,
+        "file_type": "pdf" if item.is_pdf else "html",
+        "file_path": str(file_path),
+        "text": text,
+    }
+
+def record_from_file(file_path: Path, text: str = None) -> dict:
+    """由本地下载文件（文件名 代码_日期_标题）构建导出记录，用于回填历史数据"""
+    meta = parse_announcement_name(storage.logical_path(file_path).stem)
+    sec_code = meta["stock"]
+    return {
+        "announcement_id": "",
+        "sec_code": sec_code,
+        "sec_name": "",
+        "org_id": "",
+        "exchange": exchange_of(sec_code) if sec_code else "",
+        "date": meta["date"],
+        "title": meta["title"],
+        "adjunct_url": "",
+        "file_type": storage.logical_path(file_path).suffix.lstrip(".").lower(),
+        "file_path": str(file_path),
+        "text": text,
+    }
+
+class ColumnarExporter:
+    """
+    分批写入分区列式文件
+    记录先在内存中按 (日期, 交易所) 缓冲，累计到 batch_size 条后一次性写出；
+    每次写出都生成新的分片文件 part-<运行标识>-<序号>，已有分片从不改写
+    """
+
+    def __init__(self, export_dir=DEFAULT_EXPORT_DIR, batch_size=1000, file_format="parquet", compression="zstd"):
+        if pa is None:
+            raise RuntimeError("列式导出需要 pyarrow，请先执行 pip install pyarrow")
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"不支持的导出格式: {file_format}（支持 parquet、arrow）")
+        self.export_dir = Path(export_dir)
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.compression = compression
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+        self.buffers = {}
+        self.buffered = 0
+        self.part_seq = 0
+        self.written_rows = 0
+        self.written_files = []
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.ledger_path = self.export_dir / LEDGER_FILE
+        self.exported_keys = self._load_ledger()
+        self.pending_keys = []
+
+    def _load_ledger(self) -> set:
+        """加载已导出记录的键（见 record_key），避免重复追加"""
+        if not self.ledger_path.exists():
+            return set()
+        with open(self.ledger_path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    @staticmethod
+    def record_key(record: dict) -> str:
+        """
+        记录的导出键：本地文件去掉压缩后缀后的绝对路径
+        爬取时导出与回填（文件名中没有 announcementId）使用同一个键，同一份公告只导出一次
+        """
+        if not record["file_path"]:
+            return record["announcement_id"]
+        return storage.logical_path(os.path.abspath(record["file_path"])).as_posix()
+
+    def add(self, record: dict) -> bool:
+        """添加一条记录，已导出过的记录返回 False"""
+        key = self.record_key(record)
+        if key in self.exported_keys:
+            return False
+        self.exported_keys.add(key)
+        self.pending_keys.append(key)
+
+        partition = (record["date"] or "unknown", record["exchange"] or "unknown")
+        self.buffers.setdefault(partition, []).append(record)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """把缓冲区中的记录写成新的分片文件，并追加导出键到台账"""
+        if not self.buffered:
+            return
+        exported_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        suffix = ".parquet" if self.file_format == "parquet" else ".arrow"
+        for (date, exchange), records in sorted(self.buffers.items()):
+            partition_dir = self.export_dir / f"date={date}" / f"exchange={exchange}"
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            columns = {name: [r.get(name) for r in records] for name in COLUMNS}
+            columns["exported_at"] = [exported_at] * len(records)
+            # 所有列固定为字符串类型，保证各分片 schema 一致
+            table = pa.table(columns, schema=pa.schema([(name, pa.string()) for name in COLUMNS]))
+
+            part_path = partition_dir / f"part-{self.run_id}-{self.part_seq:05d}{suffix}"
+            tmp_path = part_path.with_name(part_path.name + ".tmp")
+            if self.file_format == "parquet":
+                pq.write_table(table, tmp_path, compression=self.compression)
+            else:
+                feather.write_feather(table, tmp_path, compression=self.compression)
+            os.replace(tmp_path, part_path)
+
+            self.part_seq += 1
+            self.written_rows += len(records)
+            self.written_files.append(part_path)
+
+        with open(self.ledger_path, "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in self.pending_keys))
+        self.pending_keys = []
+        self.buffers = {}
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="把已下载的公告及其提取文本导出为分区列式文件（回填历史数据）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 把 downloads/ 下的PDF导出为 Parquet（按 日期/交易所 分区）
+        python export_columnar.py --downloads-dir downloads --export-dir export
+
+        # 导出为 Arrow IPC 文件，每 5000 条写一批
+        python export_columnar.py --format arrow --batch-size 5000
+
+    爬取时直接导出：python main_api_1118.py ... --export-dir export
+        """
+    )
+    parser.add_argument("--downloads-dir", type=str, default="downloads", help="下载目录 (默认: downloads)")
+    parser.add_argument("--export-dir", type=str, default=str(DEFAULT_EXPORT_DIR),
+                        help=f"导出目录 (默认: {DEFAULT_EXPORT_DIR})")
+    parser.add_argument("--format", type=str, default="parquet", choices=["parquet", "arrow"],
+                        help="导出格式 (默认: parquet)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批写出的记录数 (默认: 1000)")
+    parser.add_argument("--no-text", action="store_true", help="只导出元数据，不提取正文")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    downloads_dir = Path(args.downloads_dir)
+    if not downloads_dir.exists():
+        print(f"❌ {downloads_dir} 目录不存在")
+        return
+
+    pdf_files = storage.find_files(downloads_dir, ".pdf")
+    print(f"📁 找到 {len(pdf_files)} 个PDF文件")
+    added = 0
+    with ColumnarExporter(args.export_dir, args.batch_size, args.format) as exporter:
+        for pdf_path in pdf_files:
+            if exporter.record_key(record_from_file(pdf_path)) in exporter.exported_keys:
+                continue
+            text = None if args.no_text else extract_text_from_pdf(str(pdf_path))
+            if exporter.add(record_from_file(pdf_path, text)):
+                added += 1
+    print(f"✅ 导出完成: 新增 {added} 条，写出 {len(exporter.written_files)} 个分片文件")
+    print(f"📂 导出目录: {args.export_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+网页公告（HTML）转 Markdown 正文
+  - 编码判断只看 Content-Type / BOM / 开头的 <meta charset>，必要时再试 UTF-8，
+    不像 requests 的 apparent_encoding 那样对整个响应做统计检测
+  - 文件按块解压、增量解码后喂给 html.parser，边解析边输出，不需要整篇读入内存再构建 DOM
+"""
+import re
+import codecs
+from html.parser import HTMLParser
+
+import storage
+
+SNIFF_BYTES = 4096
+READ_CHUNK = 64 * 1024
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+CONTENT_TYPE_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+# 页面没有声明编码且不是合法 UTF-8 时，按中文网页最常见的 GB 系编码处理
+FALLBACK_ENCODING = "gb18030"
+
+def normalize_encoding(name: str):
+    """规范化编码名称，未知编码返回 None；GB2312/GBK 统一按其超集 GB18030 解码"""
+    try:
+        name = codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+    if name in ("gb2312", "gbk"):
+        return FALLBACK_ENCODING
+    return name
+
+def sniff_charset(head: bytes, content_type: str = "") -> str:
+    """
+    根据响应头和内容开头判断编码
+    :param head: 内容开头若干字节（SNIFF_BYTES 即可）
+    :param content_type: HTTP Content-Type 头，没有则为空
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = CONTENT_TYPE_CHARSET_RE.search(content_type or "")
+    if match and normalize_encoding(match.group(1)):
+        return normalize_encoding(match.group(1))
+    match = META_CHARSET_RE.search(head)
+    if match and normalize_encoding(match.group(1).decode("ascii")):
+        return normalize_encoding(match.group(1).decode("ascii"))
+    try:
+        # 增量解码器允许开头片段在多字节字符中间截断
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+class MarkdownHTMLParser(HTMLParser):
+    """把 HTML 增量转换为 Markdown：标题、段落、换行、列表和表格，忽略脚本和样式"""
+
+    BLOCK_TAGS = {"p", "div", "section", "article", "center", "blockquote", "pre", "ul", "ol", "table", "tr"}
+    # 不跳过整个 <head>：缺少 </head> 的页面会把正文一起跳过；<head> 中有文字的只有 <title>
+    SKIP_TAGS = {"script", "style", "title", "noscript"}
+    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, render_table):
+        """
+        :param render_table: 把二维单元格列表渲染为 Markdown 表格的函数（如 pdf2md.table_to_markdown）
+        """
+        super().__init__(convert_charrefs=True)
+        self.render_table = render_table
+        self.parts = []
+        self.skip_depth = 0
+        self.table_depth = 0
+        self.rows = []
+        self.row = None
+        self.cell = None
+
+    def emit(self, text):
+        if self.cell is not None:
+            self.cell.append(text)
+        else:
+            self.parts.append(text)
+
+    def close_cell(self):
+        """结束当前单元格（如有），写入当前行"""
+        if self.cell is not None:
+            self.row.append(" ".join("".join(self.cell).split()))
+            self.cell = None
+
+    def close_row(self):
+        """结束当前单元格和当前行（如有），非空行写入表格"""
+        self.close_cell()
+        if self.row is not None:
+            if any(self.row):
+                self.rows.append(self.row)
+            self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            # 正文开始时结束跳过，<head> 中未闭合的 <title>/<script> 不会吞掉正文
+            self.skip_depth = 0
+        elif tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "table":
+            self.table_depth += 1
+            if self.table_depth == 1:
+                self.rows = []
+        elif tag == "tr" and self.table_depth == 1:
+            # </td>、</tr> 可以省略：新行开始时结束上一行
+            self.close_row()
+            self.row = []
+        elif tag in ("td", "th") and self.table_depth == 1:
+            self.close_cell()
+            if self.row is None:
+                # 省略 <tr> 的单元格自成一行
+                self.row = []
+            self.cell = []
+        elif tag == "br":
+            self.emit(" " if self.cell is not None else "\n")
+        elif tag in self.HEADING_TAGS:
+            self.emit("\n\n" + "#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self.emit("\n- ")
+        elif tag in self.BLOCK_TAGS:
+            self.emit("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == "table":
+            if self.table_depth == 1:
+                self.close_row()
+            self.table_depth = max(0, self.table_depth - 1)
+            if self.table_depth == 0 and self.rows:
+                self.parts.append("\n\n" + self.render_table(self.rows) + "\n\n")
+                self.rows = []
+        elif tag in ("td", "th") and self.table_depth == 1:
+            self.close_cell()
+        elif tag == "tr" and self.table_depth == 1:
+            self.close_row()
+        elif tag in self.HEADING_TAGS or tag in self.BLOCK_TAGS:
+            self.emit("\n\n")
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        # 源码中的换行和缩进只是排版，合并为单个空格
+        text = re.sub(r"\s+", " ", data)
+        if text.strip() or (self.parts and not self.parts[-1].endswith(("\n", " "))):
+            self.emit(text)
+
+    def text(self) -> str:
+        """返回转换结果：去掉行首尾空白，连续空行合并为一个"""
+        lines = [line.strip() for line in "".join(self.parts).split("\n")]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n"
+
+def html_file_to_text(html_path, render_table) -> str:
+    """按块读取（压缩保存的文件边读边解压）并转换网页公告，返回 Markdown 正文"""
+    parser = MarkdownHTMLParser(render_table)
+    with storage.open_read(html_path) as f:
+        head = f.read(SNIFF_BYTES)
+        decoder = codecs.getincrementaldecoder(sniff_charset(head))(errors="replace")
+        chunk = head
+        while chunk:
+            parser.feed(decoder.decode(chunk))
+            chunk = f.read(READ_CHUNK)
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.text()
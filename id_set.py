@@ -0,0 +1,347 @@
+"""
+已下载公告ID的紧凑集合
+全市场多年归档有数千万个 announcementId，放进 Python set（每个ID一个 str）要占用数GB内存，
+启动时解析 JSON 也要数秒。这里把ID存为 64 位整数：
+  - <保存目录>/.downloaded_ids.u64：升序排列的 uint64（小端），只读内存映射，查找为二分查找，
+    每个ID只占 8 字节且不占进程堆内存
+  - 本次运行新增的ID放在一个小的 Python set 中，保存时与磁盘数组归并写出新文件
+  - 可选的 Bloom 过滤器 <保存目录>/.downloaded_ids.u64.bloom（同样内存映射）：
+    未下载过的ID大多在过滤器处直接排除，不必访问磁盘数组
+  - 非纯数字的ID（不会出现在巨潮接口中）按字符串另存在 .downloaded_ids.u64.extra
+  - 常驻模式每轮只把新增ID追加到 .downloaded_ids.u64.journal（append_journal），不重写整个数组；
+    加载时日志中的ID并入新增部分，下次完整保存归并后删除日志
+旧版的 .downloaded_ids.json 在首次加载时自动迁移，原文件保留不再更新
+"""
+import os
+import sys
+import json
+import mmap
+import math
+import heapq
+import bisect
+import struct
+from array import array
+
+ID_FILE = ".downloaded_ids.u64"
+LEGACY_FILE = ".downloaded_ids.json"
+EXTRA_SUFFIX = ".extra"
+BLOOM_SUFFIX = ".bloom"
+JOURNAL_SUFFIX = ".journal"
+# 开启 Bloom 过滤器时每个ID分配的位数（约 1% 误判率）
+DEFAULT_BLOOM_BITS = 10
+MASK64 = (1 << 64) - 1
+BLOOM_HEADER = struct.Struct("<QQQ")  # 位数的对数、哈希函数个数、构建时的ID数
+
+def _to_int(announcement_id):
+    """纯数字且无前导零的ID转为整数，否则返回 None"""
+    text = str(announcement_id)
+    if text.isdigit() and len(text) <= 19 and (text[0] != "0" or text == "0"):
+        return int(text)
+    return None
+
+def _map_file(path):
+    """只读映射文件，返回 (mmap, 文件对象)；文件不存在或为空时返回 (None, None)"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None, None
+    if os.fstat(f.fileno()).st_size == 0:
+        f.close()
+        return None, None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), f
+
+class BloomFilter:
+    """按位数组实现的 Bloom 过滤器，位数为 2 的幂，哈希位置由两个乘法哈希组合得到"""
+
+    def __init__(self, log_bits, hashes, bits=None, count=0):
+        self.log_bits = log_bits
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray(1 << max(0, log_bits - 3))
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, bits_per_id=DEFAULT_BLOOM_BITS):
+        # 预留一倍余量，ID数翻倍前只需增量置位，不必重建
+        log_bits = max(16, math.ceil(math.log2(max(1, capacity) * bits_per_id * 2)))
+        return cls(log_bits, max(1, round(bits_per_id * math.log(2))))
+
+    def capacity(self, bits_per_id=DEFAULT_BLOOM_BITS) -> int:
+        return (1 << self.log_bits) // bits_per_id
+
+    def _positions(self, key):
+        shift = 64 - self.log_bits
+        h1 = (key * 0x9E3779B97F4A7C15) & MASK64
+        h2 = (((key ^ (key >> 31)) * 0xBF58476D1CE4E5B9) & MASK64) | 1
+        for i in range(self.hashes):
+            yield ((h1 + i * h2) & MASK64) >> shift
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(BLOOM_HEADER.pack(self.log_bits, self.hashes, self.count))
+            f.write(self.bits)
+
+class CompactIdSet:
+    """
+    公告ID集合，接口与 set 的常用部分一致（in、add、update、len、迭代），可直接替代 load_downloaded_ids 原先返回的 set
+    多线程下 add 与 in 可以并发调用（新增部分是普通 set）
+    """
+
+    def __init__(self, path=None, bloom_bits=0):
+        """
+        :param path: .u64 文件路径，不存在时为空集合
+        :param bloom_bits: 大于 0 时启用 Bloom 过滤器，值为每个ID分配的位数
+        """
+        self.path = str(path) if path else None
+        self.bloom_bits = bloom_bits
+        self.added = set()
+        self.extra = set()
+        # 尚未追加到日志文件的新增ID
+        self.unjournaled = []
+        self._mapped = []
+        self.base = array("Q")
+        self.bloom = None
+        if self.path:
+            self._load()
+
+    def _load(self):
+        mm, f = _map_file(self.path)
+        if mm is not None:
+            self._mapped.append((mm, f))
+            if sys.byteorder == "little":
+                self.base = memoryview(mm).cast("Q")
+            else:
+                self.base = array("Q", mm[:])
+                self.base.byteswap()
+        try:
+            with open(self.path + EXTRA_SUFFIX, "r", encoding="utf-8") as f:
+                self.extra = {line.rstrip("\n") for line in f if line.strip()}
+        except FileNotFoundError:
+            pass
+        if self.bloom_bits:
+            self.bloom = self._load_bloom()
+        try:
+            with open(self.path + JOURNAL_SUFFIX, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(line.rstrip("\n"))
+        except FileNotFoundError:
+            pass
+
+    def _load_bloom(self):
+        """映射已有的过滤器；不存在或与数组不一致（如由其他程序改写过数组）时重建"""
+        mm, f = _map_file(self.path + BLOOM_SUFFIX)
+        if mm is not None:
+            log_bits, hashes, count = BLOOM_HEADER.unpack_from(mm)
+            if count == len(self.base) and len(mm) == BLOOM_HEADER.size + (1 << max(0, log_bits - 3)):
+                self._mapped.append((mm, f))
+                return BloomFilter(log_bits, hashes, memoryview(mm)[BLOOM_HEADER.size:], count)
+            mm.close()
+            f.close()
+        bloom = BloomFilter.for_capacity(len(self.base), self.bloom_bits)
+        for key in self.base:
+            bloom.add(key)
+        return bloom
+
+    def _release(self):
+        if isinstance(self.base, memoryview):
+            self.base.release()
+        if self.bloom is not None and isinstance(self.bloom.bits, memoryview):
+            self.bloom.bits.release()
+        for mm, f in self._mapped:
+            mm.close()
+            f.close()
+        self._mapped = []
+
+    def _in_base(self, key) -> bool:
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        base = self.base
+        index = bisect.bisect_left(base, key)
+        return index < len(base) and base[index] == key
+
+    def __contains__(self, announcement_id):
+        key = _to_int(announcement_id)
+        if key is None:
+            return str(announcement_id) in self.extra
+        return key in self.added or self._in_base(key)
+
+    def _add(self, announcement_id) -> bool:
+        """加入一个ID，原先不在集合中时返回 True"""
+        key = _to_int(announcement_id)
+        if key is None:
+            if str(announcement_id) in self.extra:
+                return False
+            self.extra.add(str(announcement_id))
+        elif key in self.added or self._in_base(key):
+            return False
+        else:
+            self.added.add(key)
+        return True
+
+    def add(self, announcement_id):
+        if self._add(announcement_id) and self.path:
+            self.unjournaled.append(str(announcement_id))
+
+    def update(self, ids):
+        for announcement_id in ids:
+            self.add(announcement_id)
+
+    def __len__(self):
+        return len(self.base) + len(self.added) + len(self.extra)
+
+    def __iter__(self):
+        for key in self.base:
+            yield str(key)
+        for key in self.added:
+            yield str(key)
+        yield from self.extra
+
+    def _write_merged(self, f, added):
+        """把磁盘数组与新增ID归并写出：逐段复制数组切片，只有新增ID逐个打包"""
+        base = self.base
+        if sys.byteorder != "little" or len(added) * 8 > len(base):
+            # 新增量大（如从 JSON 迁移）时整体排序更快
+            merged = array("Q", sorted([*base, *added]))
+            if sys.byteorder != "little":
+                merged.byteswap()
+            f.write(merged.tobytes())
+            return
+        start = 0
+        for key in added:
+            index = bisect.bisect_left(base, key, start)
+            f.write(base[start:index])
+            f.write(struct.pack("<Q", key))
+            start = index
+        f.write(base[start:])
+
+    def append_journal(self) -> int:
+        """把上次追加以来新增的ID追加到日志文件，返回追加个数"""
+        if not self.unjournaled:
+            return 0
+        with open(self.path + JOURNAL_SUFFIX, "a", encoding="utf-8") as f:
+            f.write("".join(f"{announcement_id}\n" for announcement_id in self.unjournaled))
+        count = len(self.unjournaled)
+        self.unjournaled = []
+        return count
+
+    def save(self, path=None):
+        """
+        写出到 path（默认为加载时的路径），先写临时文件再替换，中途退出不会损坏原文件
+        写回自身路径时先解除映射再替换（Windows 上被映射的文件不能替换），之后重新映射新文件、
+        清空新增部分并删除已归并的日志文件
+        """
+        path = str(path or self.path)
+        added = sorted(self.added)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            self._write_merged(f, added)
+        bloom = None
+        if self.bloom_bits:
+            total = len(self.base) + len(added)
+            if self.bloom is not None and self.bloom.capacity(self.bloom_bits) >= total:
+                bloom = BloomFilter(self.bloom.log_bits, self.bloom.hashes, bytearray(self.bloom.bits), self.bloom.count)
+                for key in added:
+                    bloom.add(key)
+            else:
+                bloom = BloomFilter.for_capacity(total, self.bloom_bits)
+                for key in self.base:
+                    bloom.add(key)
+                for key in added:
+                    bloom.add(key)
+            bloom.save(path + BLOOM_SUFFIX + ".tmp")
+        if self.extra:
+            with open(path + EXTRA_SUFFIX, "w", encoding="utf-8") as f:
+                f.write("".join(f"{announcement_id}\n" for announcement_id in sorted(self.extra)))
+
+        remap = path == self.path
+        if remap:
+            # Windows 上不能替换仍被映射的文件：先解除映射，替换后重新映射
+            self._release()
+            self.base = array("Q")
+            self.bloom = None
+        try:
+            if bloom is not None:
+                # 先替换过滤器：任何时刻过滤器都包含数组中的全部ID，两次替换之间退出也不会漏判
+                os.replace(path + BLOOM_SUFFIX + ".tmp", path + BLOOM_SUFFIX)
+            os.replace(tmp_path, path)
+            if remap:
+                try:
+                    os.remove(path + JOURNAL_SUFFIX)
+                except FileNotFoundError:
+                    pass
+                self.unjournaled = []
+                self.added = set()
+        finally:
+            # 替换失败时重新映射原文件，新增部分保留在内存中
+            if remap:
+                self._load()
+
+    def close(self):
+        self._release()
+        self.base = array("Q")
+        self.bloom = None
+
+def write_union(id_sets, path) -> int:
+    """
+    把多个 CompactIdSet 的并集写为 path 处的 .u64 文件（含 .extra），返回ID数
+    各磁盘数组已排序，逐个读出做多路归并、分块写出，内存占用与磁盘数组的大小无关；
+    写完后关闭所有集合（path 可以是其中某个集合自身的文件），并删除 path 旧的日志和过滤器
+    """
+    path = str(path)
+    extra = set().union(*(ids.extra for ids in id_sets))
+    streams = [ids.base for ids in id_sets] + [sorted(ids.added) for ids in id_sets]
+    count = 0
+    last = None
+    buffer = array("Q")
+    with open(path + ".tmp", "wb") as f:
+        for key in heapq.merge(*streams):
+            if key == last:
+                continue
+            last = key
+            buffer.append(key)
+            if len(buffer) >= 65536:
+                count += _flush(f, buffer)
+        count += _flush(f, buffer)
+    for ids in id_sets:
+        ids.close()
+    if extra:
+        with open(path + EXTRA_SUFFIX, "w", encoding="utf-8") as f:
+            f.write("".join(f"{announcement_id}\n" for announcement_id in sorted(extra)))
+    # 旧过滤器与新数组不一致，先删除（下次加载时重建）；日志中的ID已归并进数组，替换后删除
+    _remove(path + BLOOM_SUFFIX)
+    os.replace(path + ".tmp", path)
+    _remove(path + JOURNAL_SUFFIX)
+    return count + len(extra)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _flush(f, buffer) -> int:
+    """按小端写出并清空缓冲的ID，返回写出个数"""
+    count = len(buffer)
+    if sys.byteorder != "little":
+        buffer.byteswap()
+    f.write(buffer.tobytes())
+    del buffer[:]
+    return count
+
+def load_legacy_json(path) -> list:
+    """读取旧版 .downloaded_ids.json 中的ID列表"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("downloaded_ids", [])
@@ -1,19 +1,42 @@
 import os
+import sys
 import time
 import random
 import requests
 import re
 import argparse
 import json
+import shlex
 from pathlib import Path
+from collections import namedtuple
 from datetime import datetime, timezone
 from tqdm import tqdm
 
+import md_index
+from response_cache import ResponseCache
+import storage
+import html2md
+from download_scheduler import DownloadScheduler, PriorityPolicy, parse_keyword_weights, load_deferred, save_deferred, DEFERRED_FILE
+import crawl_plan
+import id_set
+from id_set import CompactIdSet
+from adaptive_timeout import LatencyTracker, ConnectTimingAdapter, hedged_get, read_content, format_timeout, headers_seconds
+import profiling
+from profiling import PROFILER
+
 BASE_URL = "https://www.cninfo.com.cn/new/hisAnnouncement/query"
 PDF_BASE = "https://static.cninfo.com.cn/"
 ORGID_MAP_FILE = Path("stockcodes/stock_orgids.json")
 with open(ORGID_MAP_FILE, "r", encoding="utf-8") as f:
     STOCK_ORGIDS = json.load(f)
+# 复用 TCP/TLS 连接的会话（常驻模式下保持连接池常热）
+HTTP_SESSION = requests.Session()
+# 按主机分阶段记录请求耗时，据此设置超时和对冲请求的时机；新建连接的耗时由连接池适配器记录
+LATENCY = LatencyTracker()
+HTTP_SESSION.mount("http://", ConnectTimingAdapter(LATENCY))
+HTTP_SESSION.mount("https://", ConnectTimingAdapter(LATENCY))
+# 常驻模式下同一公告连续失败多少轮后放弃
+WATCH_MAX_FAILURES = 3
 # 交易所映射
 EXCHANGE_MAP = {
     'sz': 'SZ',    # 深圳证券交易所
@@ -21,39 +44,136 @@ EXCHANGE_MAP = {
     'szse': 'SZ',  # 深圳证券交易所
     'sse': 'SH',   # 上海证券交易所
 }
+# 公告分类：名称 -> 巨潮分类代码（沪深两市通用），--category 也可直接使用代码或去掉前后缀的简写（如 ndbg）
+CATEGORY_CODES = {
+    '年报': 'category_ndbg_szsh',
+    '半年报': 'category_bndbg_szsh',
+    '一季报': 'category_yjdbg_szsh',
+    '三季报': 'category_sjdbg_szsh',
+    '业绩预告': 'category_yjygjxz_szsh',
+    '权益分派': 'category_qyfpxzcs_szsh',
+    '董事会': 'category_dshgg_szsh',
+    '监事会': 'category_jshgg_szsh',
+    '股东大会': 'category_gddh_szsh',
+    '日常经营': 'category_rcjy_szsh',
+    '公司治理': 'category_gszl_szsh',
+    '中介报告': 'category_zj_szsh',
+    '首发': 'category_sf_szsh',
+    '增发': 'category_zf_szsh',
+    '股权激励': 'category_gqjl_szsh',
+    '配股': 'category_pg_szsh',
+    '解禁': 'category_jj_szsh',
+    '公司债': 'category_gszq_szsh',
+    '可转债': 'category_kzzq_szsh',
+    '其他融资': 'category_qtrz_szsh',
+    '股权变动': 'category_gqbd_szsh',
+    '补充更正': 'category_bcgz_szsh',
+    '澄清致歉': 'category_cqdq_szsh',
+    '风险提示': 'category_fxts_szsh',
+    '特别处理和退市': 'category_tbclts_szsh',
+    '退市整理期': 'category_tszlq_szsh',
+}
 
-def get_random_timeout(min_timeout=8, max_timeout=12):
-    """返回指定范围内的随机超时时间"""
-    return random.uniform(min_timeout, max_timeout)
+class Announcement(namedtuple("Announcement", [
+    "announcement_id", "sec_code", "sec_name", "org_id", "title",
+    "announcement_time", "adjunct_url", "adjunct_size",
+])):
+    """公告的紧凑表示：只保留下载、命名和统计用到的字段，接口返回的原始字典转换后即丢弃"""
+    __slots__ = ()
 
-def load_downloaded_ids(save_dir):
-    """从 save_dir 内加载已下载的 announcementId 集合"""
-    ids_file = os.path.join(save_dir, ".downloaded_ids.json")
-    if not os.path.exists(ids_file):
-        return set()
-    
-    try:
-        with open(ids_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return set(data.get("downloaded_ids", []))
-    except Exception as e:
-        print(f"⚠️ 加载已下载ID列表失败: {e}，将重新开始")
-        return set()
+    @classmethod
+    def from_item(cls, item):
+        """由接口返回的原始公告字典构建（股票代码等高重复字符串做驻留，进一步节省内存）"""
+        return cls(
+            announcement_id=str(item.get('announcementId') or ''),
+            sec_code=sys.intern(item.get('secCode') or 'unknown'),
+            sec_name=sys.intern(item.get('secName') or ''),
+            org_id=sys.intern(item.get('orgId') or ''),
+            title=item.get('announcementTitle') or 'Unknown',
+            announcement_time=item.get('announcementTime'),
+            adjunct_url=item.get('adjunctUrl') or '',
+            adjunct_size=item.get('adjunctSize') or 0,
+        )
+
+    @property
+    def is_pdf(self):
+        return self.adjunct_url.lower().endswith(".pdf")
+
+class RunStats:
+    """本次运行的累计统计：只保存计数，不保留公告本身"""
+
+    def __init__(self):
+        self.total = 0
+        self.pdf = 0
+        self.html = 0
+        self.success_pdf = 0
+        self.success_html = 0
+        # 列表请求与下载的实测耗时（秒，不含随机延迟），写入运行历史供 --plan-only 估算
+        self.list_requests = 0
+        self.list_seconds = 0.0
+        self.pdf_bytes = 0
+        self.pdf_seconds = 0.0
+        self.html_seconds = 0.0
+        # secCode -> [PDF数, HTML数, PDF成功数, HTML成功数]
+        self.per_stock = {}
+
+    def add_item(self, record):
+        counts = self.per_stock.setdefault(record.sec_code, [0, 0, 0, 0])
+        self.total += 1
+        if record.is_pdf:
+            self.pdf += 1
+            counts[0] += 1
+        else:
+            self.html += 1
+            counts[1] += 1
+
+    def add_success(self, record, seconds=0.0):
+        counts = self.per_stock.setdefault(record.sec_code, [0, 0, 0, 0])
+        if record.is_pdf:
+            self.success_pdf += 1
+            self.pdf_bytes += int(record.adjunct_size or 0) * 1024
+            self.pdf_seconds += seconds
+            counts[2] += 1
+        else:
+            self.success_html += 1
+            self.html_seconds += seconds
+            counts[3] += 1
+
+def load_downloaded_ids(save_dir, bloom_bits=0):
+    """
+    从 save_dir 内加载已下载的 announcementId 集合（CompactIdSet，见 id_set.py）
+    只有旧版 .downloaded_ids.json 时自动迁移，下次保存写为 .downloaded_ids.u64
+    :param bloom_bits: 大于 0 时在查找前加一层 Bloom 过滤器
+    """
+    ids = CompactIdSet(os.path.join(save_dir, id_set.ID_FILE), bloom_bits)
+    legacy_file = os.path.join(save_dir, id_set.LEGACY_FILE)
+    if len(ids) == 0 and os.path.exists(legacy_file):
+        try:
+            ids.update(id_set.load_legacy_json(legacy_file))
+            print(f"📦 已从 {legacy_file} 迁移 {len(ids)} 个已下载ID，之后保存为 {id_set.ID_FILE}（原文件保留，不再更新）")
+        except Exception as e:
+            print(f"⚠️ 加载已下载ID列表失败: {e}，将重新开始")
+    return ids
 
 def save_downloaded_ids(save_dir, downloaded_ids):
-    """保存已下载的 announcementId 集合到 save_dir 内"""
-    ids_file = os.path.join(save_dir, ".downloaded_ids.json")
-    data = {
-        "downloaded_ids": list(downloaded_ids),
-        "last_update": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
-        "total_count": len(downloaded_ids)
-    }
+    """保存已下载的 announcementId 集合到 save_dir 内（.downloaded_ids.u64）"""
+    ids_file = os.path.join(save_dir, id_set.ID_FILE)
+    if not isinstance(downloaded_ids, CompactIdSet):
+        compact = CompactIdSet()
+        compact.update(downloaded_ids)
+        downloaded_ids = compact
     try:
-        with open(ids_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        downloaded_ids.save(ids_file)
     except Exception as e:
         print(f"⚠️ 保存已下载ID列表失败: {e}")
 
+def append_downloaded_ids(downloaded_ids):
+    """常驻模式每轮只把新增的ID追加到日志文件（见 id_set.py），完整归并留到退出时的 save_downloaded_ids"""
+    try:
+        downloaded_ids.append_journal()
+    except Exception as e:
+        print(f"⚠️ 追加已下载ID失败: {e}")
+
 def cninfo_stock_param(code):
     """把 000001.SZ / 600000.SH 转成巨潮需要的 sz000001 / sh600000"""
     if not code or '.' not in code:
@@ -61,9 +181,48 @@ def cninfo_stock_param(code):
     digits, suffix = code.split('.')
     return f"{suffix.lower()}{digits}"
 
-def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=8, timeout_max=12, max_retries=3, retry_delay=2, days=None):
+def resolve_categories(spec):
     """
-    获取公告列表
+    把 --category 的取值解析为巨潮接口的 category 参数
+    :param spec: 逗号分隔的分类名称（年报）、简写（ndbg）或完整代码（category_ndbg_szsh）
+    :return: 分号连接的分类代码；多个分类合并在同一次请求中查询，而不是逐个分类重复翻页
+    """
+    if not spec:
+        return ""
+    known_codes = set(CATEGORY_CODES.values())
+    codes = []
+    for name in (part.strip() for part in spec.split(',')):
+        if not name:
+            continue
+        if name in CATEGORY_CODES:
+            code = CATEGORY_CODES[name]
+        elif name in known_codes:
+            code = name
+        elif f"category_{name}_szsh" in known_codes:
+            code = f"category_{name}_szsh"
+        else:
+            raise ValueError(f"未知的公告分类: {name}（可选: {', '.join(CATEGORY_CODES)}）")
+        if code not in codes:
+            codes.append(code)
+    return ";".join(codes)
+
+def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=8, timeout_max=12, max_retries=3, retry_delay=2, days=None,
+                        se_date=None, cache=None, category="", searchkey="", api_url=BASE_URL):
+    """
+    获取公告列表，参数同 fetch_announcement_page
+    :return: 公告列表（Announcement 记录）
+    """
+    data = fetch_announcement_page(stock_codes, page_num, page_size, timeout_min, timeout_max, max_retries, retry_delay,
+                                   days, se_date, cache, category, searchkey, api_url)
+    if not data:
+        return []
+    with PROFILER.stage("list.decode"):
+        return [Announcement.from_item(item) for item in data.get("announcements") or []]
+
+def fetch_announcement_page(stock_codes=None, page_num=1, page_size=30, timeout_min=8, timeout_max=12, max_retries=3, retry_delay=2,
+                            days=None, se_date=None, cache=None, category="", searchkey="", api_url=BASE_URL):
+    """
+    请求一页公告列表，返回接口的原始响应（含 announcements、totalAnnouncement 等字段），失败时返回 None
     :param stock_codes: 股票代码列表（格式：["000001.SZ", "600000.SH"]）
     :param page_num: 页码
     :param page_size: 每页数量
@@ -71,16 +230,21 @@ def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=
     :param timeout_max: 最大超时时间
     :param max_retries: 最大重试次数
     :param retry_delay: 重试延迟（秒）
-    :return: 公告列表
+    :param se_date: 指定日期窗口（格式：2025-01-01~2025-01-31），优先于 days
+    :param cache: ResponseCache 实例，为 None 时不使用缓存
+    :param category: 分类代码（多个用分号连接，见 resolve_categories），由服务端过滤
+    :param searchkey: 标题关键词，由服务端过滤
+    :param api_url: 公告列表接口地址（--api-url）
     """
-    # 计算日期范围
-    se_date = ""
-    if days is not None and days > 0:
-        end_date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-        start_ts = time.time() - (days * 24 * 60 * 60)
-        start_date = datetime.fromtimestamp(start_ts, tz=timezone.utc).strftime('%Y-%m-%d')
-        se_date = f"{start_date}~{end_date}"
-        print(f"   📅 日期范围: {start_date} ~ {end_date} (近 {days} 天)")
+    # 计算日期范围（已指定 se_date 时直接使用）
+    if not se_date:
+        se_date = ""
+        if days is not None and days > 0:
+            end_date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+            start_ts = time.time() - (days * 24 * 60 * 60)
+            start_date = datetime.fromtimestamp(start_ts, tz=timezone.utc).strftime('%Y-%m-%d')
+            se_date = f"{start_date}~{end_date}"
+            print(f"   📅 日期范围: {start_date} ~ {end_date} (近 {days} 天)")
     
     params = {
         "stock": "",
@@ -90,8 +254,8 @@ def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=
         "plate": "",
         "seDate": se_date,  # 动态设置日期范围
         "column": "szse",
-        "category": "",
-        "searchkey": "",
+        "category": category,
+        "searchkey": searchkey,
         "secid": "",
         "sortName": "",
         "sortType": "",
@@ -113,22 +277,38 @@ def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=
             first_code = stock_codes[0]
             params["column"] = "sse" if first_code.endswith(".SH") else "szse"
 
+    # 命中缓存则不发请求；非默认接口地址的响应单独缓存
+    cache_key = params if api_url == BASE_URL else dict(params, api_url=api_url)
+    if cache is not None:
+        with PROFILER.stage("list.cache"):
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
     # 重试逻辑
     for attempt in range(max_retries + 1):
         try:
-            timeout = get_random_timeout(timeout_min, timeout_max)
-            resp = requests.post(BASE_URL, data=params, timeout=timeout)
-            resp.raise_for_status()  # 检查HTTP状态码
-            data = resp.json()
-            return data.get("announcements", [])
+            timeout = LATENCY.timeouts(api_url, timeout_min, timeout_max)
+            start = time.monotonic()
+            with PROFILER.stage("list.request"):
+                resp = HTTP_SESSION.post(api_url, data=params, timeout=timeout)
+                resp.raise_for_status()  # 检查HTTP状态码
+            LATENCY.record(api_url, time.monotonic() - start, headers_seconds(resp))
+            with PROFILER.stage("list.decode"):
+                data = resp.json()
+            if cache is not None:
+                with PROFILER.stage("list.cache"):
+                    cache.put(cache_key, data)
+            return data
         except requests.exceptions.Timeout as e:
+            LATENCY.record_timeout(api_url, timeout, isinstance(e, requests.exceptions.ConnectTimeout))
             if attempt < max_retries:
                 wait_time = retry_delay * (attempt + 1)  # 指数退避
-                print(f"⚠️ 请求超时（第 {page_num} 页，尝试 {attempt + 1}/{max_retries + 1}）: timeout={timeout:.2f}秒，{wait_time:.1f}秒后重试...")
+                print(f"⚠️ 请求超时（第 {page_num} 页，尝试 {attempt + 1}/{max_retries + 1}）: timeout={format_timeout(timeout)}，{wait_time:.1f}秒后重试...")
                 time.sleep(wait_time)
             else:
                 print(f"⚠️ 请求超时（第 {page_num} 页）: 已重试 {max_retries} 次仍失败，返回空列表")
-                return []
+                return None
         except requests.exceptions.RequestException as e:
             if attempt < max_retries:
                 wait_time = retry_delay * (attempt + 1)
@@ -136,7 +316,7 @@ def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=
                 time.sleep(wait_time)
             else:
                 print(f"⚠️ 请求异常（第 {page_num} 页）: 已重试 {max_retries} 次仍失败，返回空列表")
-                return []
+                return None
         except Exception as e:
             if attempt < max_retries:
                 wait_time = retry_delay * (attempt + 1)
@@ -144,9 +324,9 @@ def fetch_announcements(stock_codes=None, page_num=1, page_size=30, timeout_min=
                 time.sleep(wait_time)
             else:
                 print(f"⚠️ 未知错误（第 {page_num} 页）: 已重试 {max_retries} 次仍失败，返回空列表")
-                return []
+                return None
     
-    return []
+    return None
 
 def sanitize_filename(filename):
     """清理文件名，移除非法字符"""
@@ -183,9 +363,54 @@ def normalize_stock_code(stock_code):
     )
 
 
+def load_stock_codes(args):
+    """
+    合并 --stock-code 与 --stock-file 中的股票代码，标准化后按原顺序去重
+    :return: 股票代码列表（格式：["000001.SZ", "600000.SH"]），未指定时为空列表（全市场）
+    :raises ValueError: 代码格式错误或股票文件不存在
+    """
+    stock_codes = []
+    if args.stock_code:
+        # 分割多个股票代码
+        raw_codes = [code.strip() for code in args.stock_code.split(',') if code.strip()]
+        try:
+            # 标准化所有股票代码
+            stock_codes = [normalize_stock_code(code) for code in raw_codes]
+        except ValueError as e:
+            raise ValueError(f"股票代码格式错误: {e}") from None
+        print(f"📋 已解析股票代码: {', '.join(stock_codes)}")
+    # 如果提供了股票文件，则读取文件中的股票代码
+    if args.stock_file:
+        if not os.path.exists(args.stock_file):
+            raise ValueError(f"股票文件不存在: {args.stock_file}")
+
+        with open(args.stock_file, "r", encoding="utf-8") as f:
+            file_codes = [line.strip() for line in f if line.strip()]
+
+        if not file_codes:
+            print(f"⚠️ 股票文件 {args.stock_file} 为空")
+        else:
+            try:
+                normalized_file_codes = [normalize_stock_code(code) for code in file_codes]
+            except ValueError as e:
+                raise ValueError(f"股票文件中的代码格式错误: {e}") from None
+
+            # 合并命令行和文件中的代码，并去重
+            merged_codes = stock_codes + normalized_file_codes
+            # 保持原有顺序的同时去重
+            seen = set()
+            stock_codes = []
+            for code in merged_codes:
+                if code not in seen:
+                    seen.add(code)
+                    stock_codes.append(code)
+
+            print(f"📋 已从文件加载股票代码: {', '.join(normalized_file_codes)}")
+    return stock_codes
+
 def get_announcement_date(item):
     """把 announcementTime 统一转换为 YYYY-MM-DD（公告发布时间），缺省则返回空字符串"""
-    raw_time = item.get('announcementTime')
+    raw_time = item.announcement_time
     if raw_time in (None, ''):
         return ''
 
@@ -199,15 +424,66 @@ def get_announcement_date(item):
     # 否则视为已有的日期字符串，取前 10 位（如 '2025-11-14'）
     return str(raw_time)[:10]
 
-def generate_download_report(save_dir, stock_codes, all_items, stock_groups, 
-                             success_pdf, success_html, pdf_items, html_items,
+def get_item_filepath(item, save_dir, ext, compression=None):
+    """按 股票代码_公告日期_公告标题.<ext> 规则返回公告在 save_dir 内的保存路径（压缩保存时带 .gz / .zst 后缀）"""
+    filename_parts = [item.sec_code]
+    announcement_time = get_announcement_date(item)
+    if announcement_time:
+        filename_parts.append(announcement_time)
+    filename_parts.append(sanitize_filename(item.title))
+    return storage.stored_path(os.path.join(save_dir, item.sec_code, "_".join(filename_parts) + f".{ext}"), compression)
+
+def converted_text(file_path, save_dir, convert_dir):
+    """读取 pdf2md.py（或常驻模式）已转换的 Markdown 正文（去掉 frontmatter），没有转换结果时返回 None"""
+    from pdf2md import get_output_path
+    try:
+        md_path = get_output_path(Path(file_path), Path(convert_dir), source_root=save_dir)
+        _, body = md_index.parse_frontmatter(md_path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, ValueError):
+        return None
+    return body
+
+def export_items(items, save_dir, export_dir, file_format="parquet", batch_size=1000, compression=None,
+                 convert_dir=None):
+    """
+    把本次已下载公告的元数据和PDF正文导出为按 日期/交易所 分区的列式文件，返回导出条数
+    正文优先取 convert_dir 下已转换的 Markdown；没有时经原始提取缓存（<convert_dir>/raw_cache，
+    与 pdf2md.py --raw-cache 共用）提取，之后转换同一份PDF时不再解析
+    """
+    # 导出依赖 pdfplumber/pyarrow，只在需要时导入，单纯爬取不依赖它们
+    from pdf2md import extract_pdf, get_raw_cache
+    from export_columnar import ColumnarExporter, make_record
+    import raw_cache
+    try:
+        exporter = ColumnarExporter(export_dir, batch_size=batch_size, file_format=file_format)
+    except RuntimeError as e:
+        print(f"⚠️ 列式导出失败: {e}")
+        return 0
+
+    exported = 0
+    with exporter:
+        for item in items:
+            filepath = get_item_filepath(item, save_dir, "pdf" if item.is_pdf else "html", compression)
+            if not os.path.exists(filepath):
+                continue
+            text = converted_text(filepath, save_dir, convert_dir) if convert_dir else None
+            if text is None and item.is_pdf:
+                cache = get_raw_cache(Path(convert_dir) / raw_cache.DEFAULT_CACHE_DIR.name) if convert_dir else None
+                text, _ = extract_pdf(filepath, raw_cache=cache)
+            if exporter.add(make_record(item, get_announcement_date(item), filepath, text)):
+                exported += 1
+    print(f"🗃️ 列式导出: 新增 {exported} 条，写出 {len(exporter.written_files)} 个分片文件到 {export_dir}")
+    return exported
+
+def generate_download_report(save_dir, stock_codes, stats,
                              requested_codes, missing_codes, downloaded_ids_before, downloaded_ids_after,
                              args):
-    """在 save_dir 内生成本次下载的详细报告"""
+    """在 save_dir 内生成本次下载的详细报告（统计数据来自 RunStats 累计值）"""
     report_file = os.path.join(save_dir, f"download_report_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.md")
     
     report_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
     new_downloads = len(downloaded_ids_after) - downloaded_ids_before
+    html_total = 0 if args.no_html else stats.html
     
     report_content = f"""# 公告下载报告
 
@@ -215,7 +491,7 @@ def generate_download_report(save_dir, stock_codes, all_items, stock_groups,
 - **下载时间**: {report_time}
 - **保存目录**: {save_dir}
 - **指定股票数量**: {len(requested_codes) if requested_codes else '全部股票'}
-- **实际获取公告的股票数**: {len(stock_groups)}
+- **实际获取公告的股票数**: {len(stats.per_stock)}
 
 ## 运行参数
 - **股票代码文件**: {args.stock_file if args.stock_file else '未指定'}
@@ -230,20 +506,18 @@ def generate_download_report(save_dir, stock_codes, all_items, stock_groups,
 ## 下载统计
 
 ### 总体情况
-- **获取公告总数**: {len(all_items)} 条
-- **PDF公告数**: {len(pdf_items)} 条
-- **HTML公告数**: {len(html_items)} 条
-- **PDF下载成功**: {success_pdf}/{len(pdf_items)} 份
-- **HTML下载成功**: {success_html}/{len(html_items)} 份
+- **获取公告总数**: {stats.total} 条
+- **PDF公告数**: {stats.pdf} 条
+- **HTML公告数**: {html_total} 条
+- **PDF下载成功**: {stats.success_pdf}/{stats.pdf} 份
+- **HTML下载成功**: {stats.success_html}/{html_total} 份
 - **本次新增下载**: {new_downloads} 条（累计已下载: {len(downloaded_ids_after)} 条）
 
 ### 各股票公告数量
 """
     
-    for sec_code, items in sorted(stock_groups.items()):
-        sec_pdf = len([i for i in items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")])
-        sec_html = len(items) - sec_pdf
-        report_content += f"- **{sec_code}**: 共 {len(items)} 条（PDF: {sec_pdf}, HTML: {sec_html}）\n"
+    for sec_code, (sec_pdf, sec_html, _, _) in sorted(stats.per_stock.items()):
+        report_content += f"- **{sec_code}**: 共 {sec_pdf + sec_html} 条（PDF: {sec_pdf}, HTML: {sec_html}）\n"
     
     report_content += f"""
 ## 下载详情
@@ -251,13 +525,7 @@ def generate_download_report(save_dir, stock_codes, all_items, stock_groups,
 ### 各股票下载统计
 """
     
-    for sec_code, items in sorted(stock_groups.items()):
-        sec_pdf = len([i for i in items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")])
-        sec_html = len(items) - sec_pdf
-        sec_success_pdf = len([i for i in items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf") and os.path.exists(os.path.join(save_dir, sec_code, f"{sec_code}_{get_announcement_date(i)}_{sanitize_filename(i.get('announcementTitle', 'Unknown'))}.pdf"))])
-        sec_success_html = 0
-        if not args.no_html:
-            sec_success_html = len([i for i in items if not ("adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")) and os.path.exists(os.path.join(save_dir, sec_code, f"{sec_code}_{get_announcement_date(i)}_{sanitize_filename(i.get('announcementTitle', 'Unknown'))}.html"))])
+    for sec_code, (sec_pdf, sec_html, sec_success_pdf, sec_success_html) in sorted(stats.per_stock.items()):
         report_content += f"- **{sec_code}**: PDF {sec_success_pdf}/{sec_pdf} 份, HTML {sec_success_html}/{sec_html} 份\n"
     
     # 股票代码列表（放到最后，使用表格格式）
@@ -315,25 +583,30 @@ def generate_download_report(save_dir, stock_codes, all_items, stock_groups,
     except Exception as e:
         print(f"⚠️ 保存下载报告失败: {e}")
 
-def download_pdf(item, save_dir, downloaded_ids, timeout_min=8, timeout_max=12, output_func=print, max_retries=3, retry_delay=1):
-    """下载PDF公告"""
+def download_pdf(item, save_dir, downloaded_ids, timeout_min=8, timeout_max=12, output_func=print, max_retries=3, retry_delay=1,
+                 hedge=False, compression=None, compression_level=None):
+    """
+    下载PDF公告
+    hedge 为 True 时，请求超过该主机 p95 耗时仍未完成会再发一个相同请求，先完成者胜出
+    compression 为 gzip/zstd 时边写边压缩，保存为 .pdf.gz / .pdf.zst
+    """
     # 检查是否已下载
-    announcement_id = item.get('announcementId')
+    announcement_id = item.announcement_id
     if announcement_id and announcement_id in downloaded_ids:
-        output_func(f"⏭️  跳过已下载: {item.get('announcementTitle', 'Unknown')} (ID: {announcement_id})")
+        output_func(f"⏭️  跳过已下载: {item.title} (ID: {announcement_id})")
         return False
     
     # 检查adjunctUrl是否存在且是PDF格式（大小写不敏感）
-    if "adjunctUrl" not in item:
-        output_func(f"⚠️ 缺少adjunctUrl字段: {item.get('announcementTitle', 'Unknown')}")
+    if not item.adjunct_url:
+        output_func(f"⚠️ 缺少adjunctUrl字段: {item.title}")
         return False
     
-    if not item["adjunctUrl"].lower().endswith(".pdf"):
-        output_func(f"⚠️ 非PDF格式: {item['adjunctUrl']} | 标题: {item.get('announcementTitle', 'Unknown')}")
+    if not item.is_pdf:
+        output_func(f"⚠️ 非PDF格式: {item.adjunct_url} | 标题: {item.title}")
         return False
 
-    url = PDF_BASE + item["adjunctUrl"]
-    sec_code = item.get('secCode', 'unknown')
+    url = PDF_BASE + item.adjunct_url
+    sec_code = item.sec_code
     # 创建股票代码对应的子目录
     stock_dir = os.path.join(save_dir, sec_code)
     if not os.path.exists(stock_dir):
@@ -344,30 +617,38 @@ def download_pdf(item, save_dir, downloaded_ids, timeout_min=8, timeout_max=12,
     filename_parts = [sec_code]
     if announcement_time:
         filename_parts.append(announcement_time)
-    filename_parts.append(sanitize_filename(item.get('announcementTitle', 'Unknown')))
-    filename = "_".join(filename_parts) + ".pdf"
+    filename_parts.append(sanitize_filename(item.title))
+    filename = storage.stored_path("_".join(filename_parts) + ".pdf", compression)
     filepath = os.path.join(stock_dir, filename)
     
     # 重试逻辑
     for attempt in range(max_retries + 1):
         try:
-            timeout = get_random_timeout(timeout_min, timeout_max)
+            timeout = LATENCY.timeouts(url, timeout_min, timeout_max)
+            hedge_after = LATENCY.hedge_delay(url) if hedge else None
             
-            pdf_resp = requests.get(url, timeout=timeout)
+            if hedge_after is not None:
+                pdf_resp, content = hedged_get(HTTP_SESSION, url, timeout, hedge_after, LATENCY)
+            else:
+                start = time.monotonic()
+                pdf_resp = HTTP_SESSION.get(url, stream=True, timeout=timeout)
+                content, gap = read_content(pdf_resp)
+                LATENCY.record(url, time.monotonic() - start, headers_seconds(pdf_resp), gap)
             
             if pdf_resp.status_code != 200:
                 raise ValueError(f"HTTP状态码错误: {pdf_resp.status_code}")
             
-            if len(pdf_resp.content) == 0:
+            if len(content) == 0:
                 raise ValueError("响应内容为空")
             
             # 检查是否是PDF格式
-            if not pdf_resp.content.startswith(b'%PDF'):
+            if not content.startswith(b'%PDF'):
                 raise ValueError("响应内容不是PDF格式")
             
-            # 保存文件
-            with open(filepath, "wb") as f:
-                f.write(pdf_resp.content)
+            # 保存文件（按 1MB 分块写入，压缩模式下边写边压缩）
+            with storage.open_write(filepath, compression, compression_level) as f:
+                for offset in range(0, len(content), 1024 * 1024):
+                    f.write(content[offset:offset + 1024 * 1024])
             
             # 验证文件
             if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
@@ -383,12 +664,13 @@ def download_pdf(item, save_dir, downloaded_ids, timeout_min=8, timeout_max=12,
             return True
             
         except requests.exceptions.Timeout as e:
+            LATENCY.record_timeout(url, timeout, isinstance(e, requests.exceptions.ConnectTimeout))
             if attempt < max_retries:
                 wait_time = retry_delay * (attempt + 1)
                 output_func(f"⚠️ 请求超时（尝试 {attempt + 1}/{max_retries + 1}）: {filename}，{wait_time:.1f}秒后重试...")
                 time.sleep(wait_time)
             else:
-                output_func(f"❌ 请求超时: {filename} | timeout={timeout:.2f}秒（已重试 {max_retries} 次）")
+                output_func(f"❌ 请求超时: {filename} | timeout={format_timeout(timeout)}（已重试 {max_retries} 次）")
                 return False
         except requests.exceptions.RequestException as e:
             if attempt < max_retries:
@@ -413,20 +695,20 @@ def download_pdf(item, save_dir, downloaded_ids, timeout_min=8, timeout_max=12,
     
     return False
 
-def download_html(item, save_dir, timeout_min=8, timeout_max=12):
-    """下载网页公告（HTML格式）"""
-    if "adjunctUrl" in item and item["adjunctUrl"]:
-        url = PDF_BASE + item["adjunctUrl"]
-        if item["adjunctUrl"].lower().endswith(".pdf"):
-            print(f"⚠️ 跳过PDF文件（应使用download_pdf）: {item.get('announcementTitle', 'Unknown')}")
+def download_html(item, save_dir, timeout_min=8, timeout_max=12, compression=None, compression_level=None):
+    """下载网页公告（HTML格式），compression 为 gzip/zstd 时压缩保存为 .html.gz / .html.zst"""
+    if item.adjunct_url:
+        url = PDF_BASE + item.adjunct_url
+        if item.is_pdf:
+            print(f"⚠️ 跳过PDF文件（应使用download_pdf）: {item.title}")
             return False
-    elif "announcementId" in item:
-        url = f"https://www.cninfo.com.cn/new/disclosure/detail?plate=&orgId={item.get('orgId', '')}&stock={item.get('secCode', '')}&announcementId={item['announcementId']}&announcementTime={item.get('announcementTime', '')}"
+    elif item.announcement_id:
+        url = f"https://www.cninfo.com.cn/new/disclosure/detail?plate=&orgId={item.org_id}&stock={item.sec_code}&announcementId={item.announcement_id}&announcementTime={item.announcement_time or ''}"
     else:
-        print(f"⚠️ 无法获取网页公告URL: {item.get('announcementTitle', 'Unknown')}")
+        print(f"⚠️ 无法获取网页公告URL: {item.title}")
         return False
 
-    sec_code = item.get('secCode', 'unknown')
+    sec_code = item.sec_code
     # 创建股票代码对应的子目录
     stock_dir = os.path.join(save_dir, sec_code)
     if not os.path.exists(stock_dir):
@@ -436,13 +718,16 @@ def download_html(item, save_dir, timeout_min=8, timeout_max=12):
     filename_parts = [sec_code]
     if announcement_time:
         filename_parts.append(announcement_time)
-    filename_parts.append(sanitize_filename(item.get('announcementTitle', 'Unknown')))
-    filename = "_".join(filename_parts) + ".html"
+    filename_parts.append(sanitize_filename(item.title))
+    filename = storage.stored_path("_".join(filename_parts) + ".html", compression)
     filepath = os.path.join(stock_dir, filename)
 
     try:
-        timeout = get_random_timeout(timeout_min, timeout_max)
-        html_resp = requests.get(url, timeout=timeout)
+        timeout = LATENCY.timeouts(url, timeout_min, timeout_max)
+        start = time.monotonic()
+        html_resp = HTTP_SESSION.get(url, stream=True, timeout=timeout)
+        content, gap = read_content(html_resp)
+        LATENCY.record(url, time.monotonic() - start, headers_seconds(html_resp), gap)
         
         if html_resp.status_code != 200:
             print(f"⚠️ HTML下载失败: {filename} (状态码: {html_resp.status_code})")
@@ -450,39 +735,352 @@ def download_html(item, save_dir, timeout_min=8, timeout_max=12):
         
         # 检查是否是PDF
         content_type = html_resp.headers.get('content-type', '').lower()
-        if 'application/pdf' in content_type or html_resp.content.startswith(b'%PDF'):
+        if 'application/pdf' in content_type or content.startswith(b'%PDF'):
             print(f"⚠️ 跳过PDF文件（内容检测）: {filename}")
             return False
         
-        # 检测编码
-        detected_encoding = html_resp.apparent_encoding
-        if not detected_encoding or detected_encoding.lower() in ['iso-8859-1', 'ascii']:
-            if 'charset=' in content_type:
-                detected_encoding = content_type.split('charset=')[-1].strip().lower()
-                detected_encoding = detected_encoding.strip('"\'')
-            else:
-                detected_encoding = 'utf-8'  # 默认为utf-8
-        
-        html_resp.encoding = detected_encoding
-        html_text = html_resp.text
+        # 检测编码：只看响应头和开头的 <meta charset>，不对整个响应做统计检测
+        detected_encoding = html2md.sniff_charset(content[:html2md.SNIFF_BYTES], content_type)
+        html_text = content.decode(detected_encoding, errors="replace")
+        if detected_encoding == "utf-8-sig":
+            detected_encoding = "utf-8"
         
         # 添加charset声明
         if '<head>' in html_text and 'charset=' not in html_text[:1000].lower():
             html_text = html_text.replace('<head>', f'<head>\n<meta charset="{detected_encoding}">', 1)
         
         # 保存文件
-        with open(filepath, "w", encoding=detected_encoding) as f:
-            f.write(html_text)
+        with storage.open_write(filepath, compression, compression_level) as f:
+            f.write(html_text.encode(detected_encoding, errors="replace"))
         
         print(f"✅ HTML下载成功: {filename} (编码: {detected_encoding})")
         return True
         
+    except requests.exceptions.Timeout as e:
+        LATENCY.record_timeout(url, timeout, isinstance(e, requests.exceptions.ConnectTimeout))
+        print(f"❌ HTML下载超时: {filename} | timeout={format_timeout(timeout)}")
+        return False
     except Exception as e:
         print(f"❌ HTML下载错误: {filename} | {str(e)}")
         return False
 
-def parse_args():
-    """解析命令行参数"""
+def iter_announcements(stock_codes, args, skip_ids=(), se_date=None, cache=None, stats=None):
+    """
+    逐条产出待下载的公告记录（生成器）
+    指定股票时按每批30只分批，每批循环翻页；跳过 skip_ids 中已下载的公告，累计达到 --max-items-total 后停止
+    每页的原始响应转换为 Announcement 后即被丢弃
+    :param stats: RunStats，累计列表请求次数和耗时
+    """
+    batch_size = 30
+    if stock_codes:
+        batches = [stock_codes[i:i + batch_size] for i in range(0, len(stock_codes), batch_size)]
+        print(f"\n📦 将 {len(stock_codes)} 只股票分成 {len(batches)} 批处理（每批 {batch_size} 只）")
+    else:
+        # 未指定股票代码：全市场
+        batches = [None]
+
+    produced = 0
+    for batch_idx, batch_codes in enumerate(batches):
+        if batch_codes:
+            print(f"\n📄 正在处理第 {batch_idx + 1}/{len(batches)} 批（股票: {batch_codes[0]} ~ {batch_codes[-1]}）...")
+        page = 1
+        batch_count = 0
+
+        # 对当前批次循环翻页
+        while produced < args.max_items_total:
+            print(f"   请求第 {page} 页...")
+            request_start = time.monotonic()
+            cache_hits = cache.hits if cache is not None else 0
+            data = fetch_announcements(
+                stock_codes=batch_codes,
+                page_num=page,
+                page_size=args.page_size,
+                timeout_min=args.timeout_min,
+                timeout_max=args.timeout_max,
+                max_retries=args.max_retries,
+                retry_delay=args.retry_delay,
+                days=args.days,
+                se_date=se_date,
+                cache=cache,
+                category=args.category,
+                searchkey=args.searchkey,
+                api_url=args.api_url
+            )
+            # 命中缓存的页不是真实请求，不计入实测耗时
+            if stats is not None and (cache is None or cache.hits == cache_hits):
+                stats.list_requests += 1
+                stats.list_seconds += time.monotonic() - request_start
+
+            if not data:
+                print(f"   ⚠️ 第 {batch_idx + 1} 批第 {page} 页没有更多数据" if batch_codes else "⚠️ 没有更多数据了")
+                break
+
+            # 过滤掉已下载的公告（基于announcementId），只产出未达上限的部分
+            added = 0
+            skipped_count = 0
+            for item in data:
+                if item.announcement_id and item.announcement_id in skip_ids:
+                    skipped_count += 1
+                    continue
+                if produced >= args.max_items_total:
+                    break
+                produced += 1
+                added += 1
+                yield item
+
+            if skipped_count > 0:
+                print(f"   跳过已下载: {skipped_count} 条")
+            batch_count += added
+            print(f"   第 {page} 页获取到 {added} 条新公告（本批累计: {batch_count}，总计: {produced}）")
+
+            if len(data) < args.page_size:
+                break
+
+            if produced >= args.max_items_total:
+                print(f"   ✅ 已达到总上限 {args.max_items_total} 条，停止请求")
+                break
+
+            page += 1
+            time.sleep(random.uniform(args.delay_min, args.delay_max))
+
+        if batch_codes:
+            print(f"   第 {batch_idx + 1} 批完成，获取 {batch_count} 条新公告")
+
+        # 如果已达到总上限，提前结束
+        if produced >= args.max_items_total:
+            if batch_idx < len(batches) - 1:
+                print(f"\n✅ 已达到总上限，提前结束批次处理")
+            break
+
+        # 批次间延迟
+        if batch_idx < len(batches) - 1:
+            delay = random.uniform(args.delay_min, args.delay_max)
+            print(f"   等待 {delay:.1f} 秒后处理下一批...")
+            time.sleep(delay)
+
+def plan_crawl(stock_codes, args, se_date=None):
+    """
+    --plan-only：每批股票只请求第 1 页，读取服务端公告总数，估算列表请求数、下载量和耗时
+    翻页规则与 iter_announcements 一致；耗时按 <save-dir>/.run_history.jsonl 中最近几次运行的实测速率估算
+    """
+    batch_size = 30
+    batches = [stock_codes[i:i + batch_size] for i in range(0, len(stock_codes), batch_size)] if stock_codes else [None]
+    remaining = args.max_items_total
+    list_requests = 0
+    planned = 0
+    sample = []
+    print(f"\n🔎 按批读取公告总数（{len(batches)} 批，每批只请求第 1 页）...")
+    for batch_idx, batch_codes in enumerate(batches):
+        if remaining <= 0:
+            break
+        data = fetch_announcement_page(
+            stock_codes=batch_codes,
+            page_num=1,
+            page_size=args.page_size,
+            timeout_min=args.timeout_min,
+            timeout_max=args.timeout_max,
+            max_retries=args.max_retries,
+            retry_delay=args.retry_delay,
+            days=args.days,
+            se_date=se_date,
+            category=args.category,
+            searchkey=args.searchkey,
+            api_url=args.api_url
+        )
+        if data is None:
+            print(f"❌ 第 {batch_idx + 1} 批请求失败，无法估算")
+            return
+        total = int(data.get("totalAnnouncement") or data.get("totalRecordNum") or 0)
+        taken = min(total, remaining)
+        list_requests += crawl_plan.list_requests_for(total, remaining, args.page_size)
+        planned += taken
+        remaining -= taken
+        sample.extend(Announcement.from_item(item) for item in data.get("announcements") or [])
+        print(f"   第 {batch_idx + 1} 批: 服务端共 {total} 条，计划抓取 {taken} 条")
+        if batch_idx < len(batches) - 1:
+            time.sleep(random.uniform(args.delay_min, args.delay_max))
+
+    # 按第 1 页样本估计 PDF 占比和平均大小（adjunctSize 以 KB 计）
+    sample_pdf = [item for item in sample if item.is_pdf]
+    pdf_ratio = len(sample_pdf) / len(sample) if sample else 1.0
+    pdf_count = round(planned * pdf_ratio)
+    html_count = 0 if args.no_html else planned - pdf_count
+    avg_pdf_bytes = sum(int(item.adjunct_size or 0) for item in sample_pdf) * 1024 / len(sample_pdf) if sample_pdf else 0
+    pdf_bytes = pdf_count * avg_pdf_bytes
+
+    history = crawl_plan.load_throughput(os.path.join(args.save_dir, crawl_plan.HISTORY_FILE))
+    list_delay = (args.delay_min + args.delay_max) / 2
+    download_delay = (args.download_delay_min + args.download_delay_max) / 2
+    # 随机延迟按配置区间的均值计入；请求本身的耗时没有历史数据时不计
+    seconds = max(0, list_requests - 1) * list_delay + (pdf_count + html_count) * download_delay
+    unknown = []
+    if history["list_seconds_per_request"] is not None:
+        seconds += list_requests * history["list_seconds_per_request"]
+    else:
+        unknown.append("列表请求")
+    if pdf_count and history["pdf_bytes_per_second"]:
+        seconds += pdf_bytes / history["pdf_bytes_per_second"]
+    elif pdf_count:
+        unknown.append("PDF下载")
+    if html_count and history["html_seconds_per_item"] is not None:
+        seconds += html_count * history["html_seconds_per_item"]
+    elif html_count:
+        unknown.append("网页下载")
+
+    print("\n📝 爬取计划（按服务端公告总数）")
+    print(f"   计划抓取: {planned} 条（PDF 约 {pdf_count} 份，网页 约 {html_count} 份）")
+    print(f"   列表请求: {list_requests} 次 (page_size={args.page_size})")
+    print(f"   下载请求: {pdf_count + html_count} 次，PDF 约 {pdf_bytes / 1024 / 1024:.1f} MB（按第 1 页样本平均大小）")
+    if history["runs"]:
+        print(f"   实测速率（最近 {history['runs']} 次运行）: "
+              + "，".join(part for part in (
+                  f"列表 {history['list_seconds_per_request']:.2f} 秒/次" if history["list_seconds_per_request"] is not None else "",
+                  f"PDF {history['pdf_bytes_per_second'] / 1024 / 1024:.2f} MB/秒" if history["pdf_bytes_per_second"] else "",
+                  f"网页 {history['html_seconds_per_item']:.2f} 秒/份" if history["html_seconds_per_item"] is not None else "",
+              ) if part))
+    print(f"   预计耗时: {crawl_plan.format_duration(seconds)}（含请求/下载延迟）")
+    if unknown:
+        print(f"   ⚠️ 没有{'、'.join(unknown)}的历史实测数据，这部分只计入延迟，实际耗时会更长")
+    print("   已下载的公告会被跳过，实际翻页可能多于估算、下载可能少于估算")
+
+def poll_new_announcements(stock_codes, seen_sets, args):
+    """
+    常驻模式的一次轮询：每批股票从第 1 页开始翻页，遇到已处理过的公告即停止（接口按发布时间倒序返回）
+    :param seen_sets: 已处理公告ID集合的元组（已下载ID、HTML及放弃的ID）
+    :return: 新公告列表（从新到旧）
+    """
+    batch_size = 30
+    if stock_codes:
+        batches = [stock_codes[i:i + batch_size] for i in range(0, len(stock_codes), batch_size)]
+    else:
+        batches = [None]
+
+    new_items = []
+    for batch_idx, batch in enumerate(batches):
+        for page in range(1, args.watch_max_pages + 1):
+            data = fetch_announcements(
+                stock_codes=batch,
+                page_num=page,
+                page_size=args.page_size,
+                timeout_min=args.timeout_min,
+                timeout_max=args.timeout_max,
+                max_retries=args.max_retries,
+                retry_delay=args.retry_delay,
+                days=args.days or 1,
+                category=args.category,
+                searchkey=args.searchkey,
+                api_url=args.api_url
+            )
+            reached_seen = False
+            for item in data:
+                announcement_id = item.announcement_id
+                if announcement_id and any(announcement_id in seen for seen in seen_sets):
+                    reached_seen = True
+                    break
+                new_items.append(item)
+            if reached_seen or len(data) < args.page_size:
+                break
+            time.sleep(random.uniform(args.delay_min, args.delay_max))
+        if batch_idx < len(batches) - 1:
+            time.sleep(random.uniform(args.delay_min, args.delay_max))
+    return new_items
+
+def ingest_item(item, downloaded_ids, args, index_conn=None, convert_settings=None):
+    """
+    下载单条新公告；下载成功后立即转换为 Markdown（PDF 和网页公告），并可选写入全文索引
+    :param convert_settings: process_pdf 的转换参数（见 load_convert_settings），为 None 时只下载
+    """
+    if item.is_pdf:
+        with PROFILER.stage("download.pdf"):
+            ok = download_pdf(item, args.save_dir, downloaded_ids, args.timeout_min, args.timeout_max,
+                              max_retries=args.max_retries, retry_delay=args.retry_delay, hedge=args.hedge,
+                              compression=args.compress, compression_level=args.compress_level)
+    else:
+        with PROFILER.stage("download.html"):
+            ok = download_html(item, args.save_dir, args.timeout_min, args.timeout_max,
+                               args.compress, args.compress_level)
+    if not ok:
+        return False
+    if convert_settings is None:
+        return True
+
+    from pdf2md import process_pdf, get_output_path
+    file_path = Path(get_item_filepath(item, args.save_dir, "pdf" if item.is_pdf else "html", args.compress))
+    converted = process_pdf(file_path, **convert_settings)
+    if converted and index_conn is not None:
+        with PROFILER.stage("index"):
+            output_path = get_output_path(file_path, convert_settings["output_dir"],
+                                          source_root=convert_settings["source_root"])
+            md_index.index_file(index_conn, output_path)
+            index_conn.commit()
+    return True
+
+def load_convert_settings(args):
+    """
+    常驻模式的转换参数：--convert-options 按 pdf2md.py 的命令行解析，与批量运行 pdf2md.py 的转换结果一致
+    输出目录和下载目录固定为 --convert-dir 和 --save-dir
+    """
+    # 转换依赖 pdfplumber，只在需要时导入
+    import pdf2md
+    convert_args = pdf2md.parse_args(shlex.split(args.convert_options)
+                                     + ["--output-dir", args.convert_dir, "--downloads-dir", args.save_dir])
+    return pdf2md.conversion_settings(convert_args)
+
+def watch_announcements(stock_codes, downloaded_ids, args):
+    """
+    常驻模式：定时轮询新公告，发现后直接下载并转换
+    进程常驻，连接池、orgId 映射、已下载ID集合和索引连接都保持在内存中，无需每次重新加载
+    """
+    print(f"\n👀 进入常驻模式：每 {args.poll_interval} 秒轮询一次（Ctrl+C 退出）")
+    handled_ids = set()  # HTML公告、--no-html 跳过的公告以及多次失败后放弃的公告
+    failures = {}
+    convert_settings = None if args.no_convert else load_convert_settings(args)
+    index_conn = None
+    if args.index and convert_settings is not None:
+        if convert_settings["shard_dir"]:
+            print("⚠️ 全文索引只支持散文件输出，--convert-options 含 --shards 时跳过 --index")
+        else:
+            index_conn = md_index.open_index(Path(args.index_file))
+
+    try:
+        while True:
+            cycle_start = time.time()
+            new_items = poll_new_announcements(stock_codes, (downloaded_ids, handled_ids), args)
+            if new_items:
+                print(f"\n🆕 {datetime.now().strftime('%H:%M:%S')} 发现 {len(new_items)} 条新公告")
+
+            downloaded = 0
+            for item in new_items:
+                announcement_id = item.announcement_id
+                if not item.is_pdf and args.no_html:
+                    handled_ids.add(announcement_id)
+                    continue
+                if ingest_item(item, downloaded_ids, args, index_conn, convert_settings):
+                    downloaded += 1
+                    if not item.is_pdf:
+                        handled_ids.add(announcement_id)
+                elif announcement_id:
+                    failures[announcement_id] = failures.get(announcement_id, 0) + 1
+                    if failures[announcement_id] >= WATCH_MAX_FAILURES:
+                        print(f"⚠️ 公告 {announcement_id} 连续 {WATCH_MAX_FAILURES} 轮下载失败，不再重试")
+                        handled_ids.add(announcement_id)
+                        del failures[announcement_id]
+                time.sleep(random.uniform(args.download_delay_min, args.download_delay_max))
+
+            if downloaded:
+                append_downloaded_ids(downloaded_ids)
+
+            elapsed = time.time() - cycle_start
+            time.sleep(max(0.0, args.poll_interval - elapsed))
+    except KeyboardInterrupt:
+        print("\n🛑 收到退出信号，保存状态后退出")
+    finally:
+        save_downloaded_ids(args.save_dir, downloaded_ids)
+        if index_conn is not None:
+            index_conn.close()
+
+def parse_args(argv=None):
+    """解析命令行参数，argv 为 None 时读取 sys.argv（crawl_jobs.py 为每个任务传入参数列表）"""
     parser = argparse.ArgumentParser(
         description="爬取巨潮资讯网公告（支持按股票代码筛选）",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -497,7 +1095,7 @@ def parse_args():
         # 从文件读取股票代码列表并爬取
         python main_api_1118.py --stock-file stockcodes/codes.txt --max-items-total 300 --save-dir data/announcements
         
-        # 只生成爬取计划报告，不实际执行
+        # 只生成爬取计划：读取各批公告总数，按历史实测速率估算请求数、下载量和耗时
         python main_api_1118.py --stock-file stockcodes/codes.txt --max-items-total 300 --plan-only
         
         # 只爬取PDF格式，不下载HTML
@@ -511,6 +1109,26 @@ def parse_args():
         
         # 爬取所有股票的公告（默认行为，不指定--stock-code参数）
         python main_api_1118.py --max-items-total 50
+        
+        # 只抓取年报和半年报（多个分类合并为一次查询），或按标题关键词过滤
+        python main_api_1118.py --stock-file stockcodes/codes.txt --category 年报,半年报 --max-items-total 200
+        python main_api_1118.py --stock-code 000001 --searchkey 关联交易 --days 365
+        
+        # 回填历史窗口（历史窗口的列表结果会被永久缓存，重跑时不再请求）
+        python main_api_1118.py --stock-file stockcodes/codes.txt --start-date 2025-01-01 --end-date 2025-06-30 --max-items-total 5000
+        
+        # 常驻模式：每 30 秒轮询一次新公告，下载后立即转换并写入全文索引
+        python main_api_1118.py --stock-file stockcodes/codes.txt --watch --poll-interval 30 --index
+        python main_api_1118.py --stock-file stockcodes/codes.txt --watch --convert-options "--tables --dedup --max-rss-mb 1500"
+        
+        # 下载后导出为 Parquet（按 日期/交易所 分区，需要 pyarrow）
+        python main_api_1118.py --stock-code 000001 --days 1 --export-dir export
+        
+        # 限时 10 分钟下载，新公告、问询函和小文件优先，来不及的下次运行补下载
+        python main_api_1118.py --stock-file stockcodes/codes.txt --days 7 --priority --priority-keywords 问询函:10 --deadline 600
+        
+        # 打印各阶段耗时，定位慢在网络、JSON解析还是报告生成
+        python main_api_1118.py --stock-code 000001 --max-items-total 20 --profile
         """
     )
     
@@ -529,7 +1147,14 @@ def parse_args():
     parser.add_argument(
         "--plan-only",
         action="store_true",
-        help="只生成爬取计划报告，不实际请求或下载数据"
+        help="只生成爬取计划：每批股票请求第 1 页读取公告总数，按历史实测速率估算请求数、下载量和耗时，不下载"
+    )
+
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=BASE_URL,
+        help="公告列表接口地址，可指向本地的替身服务做演练 (默认: 巨潮 hisAnnouncement/query)"
     )
 
     parser.add_argument(
@@ -560,6 +1185,18 @@ def parse_args():
         help="最大超时时间（秒） (默认: 12.0)"
     )
     
+    parser.add_argument(
+        "--no-adaptive-timeout",
+        action="store_true",
+        help="关闭自适应超时，始终在 --timeout-min ~ --timeout-max 之间随机取超时（默认按各主机观测到的耗时分位数设置，上限为 --timeout-max）"
+    )
+
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="PDF下载超过该主机 p95 耗时仍未完成时，再发一个相同请求，先完成者胜出"
+    )
+    
     parser.add_argument(
         "--delay-min",
         type=float,
@@ -601,6 +1238,53 @@ def parse_args():
         help="不下载HTML格式的网页公告，只下载PDF"
     )
     
+    parser.add_argument(
+        "--priority",
+        action="store_true",
+        help="按优先级下载：新公告、标题命中 --priority-keywords 的公告和小文件优先 (默认按列表顺序，先PDF后网页)"
+    )
+
+    parser.add_argument(
+        "--priority-keywords",
+        type=str,
+        default="",
+        help="标题关键词加分，如 \"问询函:10,董事会:3\"（未写分数记 1 分），配合 --priority"
+    )
+
+    parser.add_argument(
+        "--priority-age-weight",
+        type=float,
+        default=1.0,
+        help="发布日期每早一天扣多少分 (默认: 1.0)"
+    )
+
+    parser.add_argument(
+        "--priority-size-weight",
+        type=float,
+        default=0.5,
+        help="文件每 1MB 扣多少分 (默认: 0.5)"
+    )
+
+    parser.add_argument(
+        "--priority-deferred-bonus",
+        type=float,
+        default=10.0,
+        help="上次推迟的公告额外加多少分，避免因发布天数增加越排越后 (默认: 10.0)"
+    )
+
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="下载阶段最多用多少秒，估计来不及下载的公告推迟到 <save-dir>/.deferred.jsonl，下次运行优先补下载"
+    )
+    
+    parser.add_argument(
+        "--id-bloom",
+        action="store_true",
+        help="已下载ID查找前加一层 Bloom 过滤器（<save-dir>/.downloaded_ids.u64.bloom），ID数以千万计时减少磁盘访问"
+    )
+
     parser.add_argument(
         "--max-retries",
         type=int,
@@ -621,85 +1305,222 @@ def parse_args():
         default=None,
         help="只抓取近 N 天的公告（从今天往前推算），与 --max-items-total 配合使用"
     )
+
+    parser.add_argument(
+        "--category",
+        type=str,
+        default="",
+        help="只抓取指定分类的公告（逗号分隔），支持名称（年报、董事会）、简写（ndbg）或巨潮分类代码（category_ndbg_szsh）"
+    )
+
+    parser.add_argument(
+        "--searchkey",
+        type=str,
+        default="",
+        help="只抓取标题包含该关键词的公告（如 关联交易），由巨潮服务端过滤"
+    )
+
+    parser.add_argument(
+        "--start-date",
+        type=str,
+        default=None,
+        help="起始日期 YYYY-MM-DD，与 --end-date 组成日期窗口（优先于 --days），适合历史回填"
+    )
+
+    parser.add_argument(
+        "--end-date",
+        type=str,
+        default=None,
+        help="截止日期 YYYY-MM-DD（默认今天）；截止日期早于今天的窗口结果会被永久缓存"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="不使用公告列表的本地响应缓存"
+    )
+
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=600.0,
+        help="包含今天的日期窗口以及空列表、出错时的响应的缓存有效期（秒） (默认: 600)"
+    )
+
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=512,
+        help="响应缓存大小上限（MB），超出后按最近使用时间淘汰 (默认: 512)"
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="常驻模式：定时轮询新公告，发现后立即下载并转换为 Markdown（忽略 --max-items-total）"
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60.0,
+        help="常驻模式的轮询间隔（秒） (默认: 60)"
+    )
+
+    parser.add_argument(
+        "--watch-max-pages",
+        type=int,
+        default=5,
+        help="常驻模式每批股票每次轮询最多翻几页（遇到已处理公告会提前停止） (默认: 5)"
+    )
+
+    parser.add_argument(
+        "--no-convert",
+        action="store_true",
+        help="常驻模式下只下载，不转换为 Markdown"
+    )
+
+    parser.add_argument(
+        "--convert-dir",
+        type=str,
+        default="processed",
+        help="常驻模式下 Markdown 的输出目录；列式导出时从这里读取已转换的正文，没有时经 <convert-dir>/raw_cache 提取 (默认: processed)"
+    )
+
+    parser.add_argument(
+        "--convert-options",
+        type=str,
+        default="",
+        help="常驻模式下传给 pdf2md.py 的转换参数，如 \"--tables --dedup --chunk-threshold 300 --max-rss-mb 1500\"（输出目录和下载目录固定为 --convert-dir、--save-dir）"
+    )
+
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="常驻模式下转换后立即写入全文索引（见 md_index.py）"
+    )
+
+    parser.add_argument(
+        "--index-file",
+        type=str,
+        default="processed/index.sqlite",
+        help="全文索引数据库路径 (默认: processed/index.sqlite)"
+    )
+
+    parser.add_argument(
+        "--compress",
+        type=str,
+        default=None,
+        choices=list(storage.COMPRESSION_SUFFIXES),
+        help="压缩保存下载的PDF/HTML（.gz / .zst，zstd 需要 zstandard），pdf2md.py 可直接读取"
+    )
+
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        default=None,
+        help="压缩级别（默认 gzip 6、zstd 3），可用 python storage.py 评估不同级别的CPU开销与节省空间"
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="timing",
+        default=None,
+        choices=profiling.PROFILE_MODES,
+        help="打印各阶段（列表请求/JSON解析/下载/导出/报告）墙钟与CPU耗时；cprofile 另存每个阶段的 .prof，sample 另存采样折叠栈"
+    )
+
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=profiling.DEFAULT_PROFILE_DIR,
+        help=f"cprofile/sample 模式的输出目录 (默认: {profiling.DEFAULT_PROFILE_DIR})"
+    )
+
+    parser.add_argument(
+        "--export-dir",
+        type=str,
+        default=None,
+        help="下载完成后把公告元数据和PDF正文导出为按 日期/交易所 分区的列式文件（需要 pyarrow）"
+    )
+
+    parser.add_argument(
+        "--export-format",
+        type=str,
+        default="parquet",
+        choices=["parquet", "arrow"],
+        help="列式导出格式 (默认: parquet)"
+    )
+
+    parser.add_argument(
+        "--export-batch-size",
+        type=int,
+        default=1000,
+        help="列式导出每批写出的记录数 (默认: 1000)"
+    )
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
     args = parse_args()
-    
-    # 处理股票代码
-    stock_codes = []
-    if args.stock_code:
-        # 分割多个股票代码
-        raw_codes = [code.strip() for code in args.stock_code.split(',') if code.strip()]
+    try:
+        args.category = resolve_categories(args.category)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    args.searchkey = args.searchkey.strip()
+    try:
+        args.priority_keywords = parse_keyword_weights(args.priority_keywords)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    LATENCY.enabled = not args.no_adaptive_timeout
+    if args.compress:
         try:
-            # 标准化所有股票代码
-            stock_codes = [normalize_stock_code(code) for code in raw_codes]
-            print(f"📋 已解析股票代码: {', '.join(stock_codes)}")
-        except ValueError as e:
-            print(f"❌ 股票代码格式错误: {e}")
+            storage.check_compression(args.compress)
+        except RuntimeError as e:
+            print(f"❌ {e}")
             exit(1)
-    # 如果提供了股票文件，则读取文件中的股票代码
-    if args.stock_file:
-        if not os.path.exists(args.stock_file):
-            print(f"❌ 股票文件不存在: {args.stock_file}")
-            exit(1)
-
-        with open(args.stock_file, "r", encoding="utf-8") as f:
-            file_codes = [line.strip() for line in f if line.strip()]
-
-        if not file_codes:
-            print(f"⚠️ 股票文件 {args.stock_file} 为空")
-        else:
-            try:
-                normalized_file_codes = [normalize_stock_code(code) for code in file_codes]
-            except ValueError as e:
-                print(f"❌ 股票文件中的代码格式错误: {e}")
-                exit(1)
-
-            # 合并命令行和文件中的代码，并去重
-            merged_codes = stock_codes + normalized_file_codes
-            # 保持原有顺序的同时去重
-            seen = set()
-            stock_codes = []
-            for code in merged_codes:
-                if code not in seen:
-                    seen.add(code)
-                    stock_codes.append(code)
-
-            print(f"📋 已从文件加载股票代码: {', '.join(normalized_file_codes)}")
+    if args.profile:
+        profiling.enable(args.profile, args.profile_dir)
+    run_start = time.perf_counter()
+    
+    # 处理股票代码
+    try:
+        stock_codes = load_stock_codes(args)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
     print(f"stock_codes: {stock_codes}")
 
     requested_codes = set(stock_codes)
     total_stocks = len(stock_codes) if stock_codes else "全部股票"
-    max_items = args.max_items_total
-    page_size = args.page_size
-
-    if stock_codes:
-        estimated_total_items = total_stocks * max_items
-    else:
-        estimated_total_items = "未知（需按接口返回计算）"
-
-    estimated_pages = (
-        (estimated_total_items + page_size - 1) // page_size
-        if isinstance(estimated_total_items, int)
-        else "未知"
-    )
 
     print("\n📝 爬取计划报告")
     print(f"   股票数量: {total_stocks}")
-    print(f"   总目标: {max_items} 条")
-    print(f"   预计总公告: {estimated_total_items}")
-    print(f"   预计API页数: {estimated_pages} (page_size={page_size})")
+    print(f"   总目标: {args.max_items_total} 条")
+    if args.category:
+        print(f"   公告分类: {args.category}")
+    if args.searchkey:
+        print(f"   标题关键词: {args.searchkey}")
     print(f"   请求延迟: {args.delay_min}-{args.delay_max} 秒")
     if not args.no_html:
         print(f"   下载延迟: {args.download_delay_min}-{args.download_delay_max} 秒 (PDF + HTML)")
     else:
         print(f"   下载延迟: {args.download_delay_min}-{args.download_delay_max} 秒 (仅 PDF)")
 
+    # 指定日期窗口（优先于 --days）
+    se_date = None
+    if args.start_date or args.end_date:
+        end_date = args.end_date or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        se_date = f"{args.start_date or ''}~{end_date}"
+        print(f"📅 日期窗口: {se_date}")
+
     if args.plan_only:
-        print("\n📌 plan-only 模式开启，仅输出报告，不执行实际请求。")
+        print("\n📌 plan-only 模式开启，只请求每批的第 1 页，不下载。")
+        plan_crawl(stock_codes, args, se_date)
         exit(0)
 
     # 创建保存目录
@@ -708,9 +1529,24 @@ if __name__ == "__main__":
         print(f"📁 创建保存目录: {args.save_dir}")
     
     # 加载已下载的ID集合
-    downloaded_ids = load_downloaded_ids(args.save_dir)
+    downloaded_ids = load_downloaded_ids(args.save_dir, id_set.DEFAULT_BLOOM_BITS if args.id_bloom else 0)
     downloaded_ids_before = len(downloaded_ids)  # 记录初始数量
     print(f"📋 已加载 {downloaded_ids_before} 个已下载公告ID")
+
+    # 公告列表响应缓存（常驻模式需要实时结果，不使用缓存）
+    response_cache = None
+    if not args.no_cache and not args.watch:
+        response_cache = ResponseCache(
+            os.path.join(args.save_dir, ".http_cache"),
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            ttl=args.cache_ttl
+        )
+
+    # 常驻模式：持续轮询，不走下面的一次性抓取流程
+    if args.watch:
+        watch_announcements(stock_codes, downloaded_ids, args)
+        PROFILER.report(time.perf_counter() - run_start)
+        exit(0)
     
     # 打印配置信息
     print("\n📄 开始请求公告数据 ...")
@@ -720,154 +1556,33 @@ if __name__ == "__main__":
         print(f"   配置: 爬取所有股票，总目标{args.max_items_total}条")
     print(f"   保存到{args.save_dir}, timeout={args.timeout_min}-{args.timeout_max}秒")
     
-    all_items = []
-    
-    # 如果指定了股票代码，分批处理（每批30只）
-    if stock_codes:
-        batch_size = 30
-        total_batches = (len(stock_codes) + batch_size - 1) // batch_size
-        print(f"\n📦 将 {len(stock_codes)} 只股票分成 {total_batches} 批处理（每批 {batch_size} 只）")
-        
-        for batch_idx in range(total_batches):
-            start_idx = batch_idx * batch_size
-            end_idx = min(start_idx + batch_size, len(stock_codes))
-            batch_codes = stock_codes[start_idx:end_idx]
-            
-            print(f"\n📄 正在处理第 {batch_idx + 1}/{total_batches} 批（股票: {batch_codes[0]} ~ {batch_codes[-1]}）...")
-            
-            page = 1
-            batch_items = []
-            
-            # 对当前批次循环翻页
-            while len(all_items) < args.max_items_total:
-                print(f"   请求第 {page} 页...")
-                data = fetch_announcements(
-                    stock_codes=batch_codes,
-                    page_num=page,
-                    page_size=args.page_size,
-                    timeout_min=args.timeout_min,
-                    timeout_max=args.timeout_max,
-                    max_retries=args.max_retries,
-                    retry_delay=args.retry_delay,
-                    days=args.days 
-                )
-                
-                if not data:
-                    print(f"   ⚠️ 第 {batch_idx + 1} 批第 {page} 页没有更多数据")
-                    break
-                
-                # 过滤掉已下载的公告（基于announcementId）
-                new_items = []
-                skipped_count = 0
-                for item in data:
-                    announcement_id = item.get('announcementId')
-                    if announcement_id and announcement_id in downloaded_ids:
-                        skipped_count += 1
-                        continue
-                    new_items.append(item)
-                
-                if skipped_count > 0:
-                    print(f"   跳过已下载: {skipped_count} 条")
-                
-                # 计算还能添加多少条（只考虑未下载的）
-                remaining = args.max_items_total - len(all_items)
-                items_to_add = new_items[:remaining]
-                
-                batch_items.extend(items_to_add)
-                all_items.extend(items_to_add)
-                
-                print(f"   第 {page} 页获取到 {len(items_to_add)} 条新公告（本批累计: {len(batch_items)}，总计: {len(all_items)}）")
-                
-                if len(data) < args.page_size:
-                    break
-                
-                if len(all_items) >= args.max_items_total:
-                    print(f"   ✅ 已达到总上限 {args.max_items_total} 条，停止请求")
-                    break
-                
-                page += 1
-                time.sleep(random.uniform(args.delay_min, args.delay_max))
-            
-            print(f"   第 {batch_idx + 1} 批完成，获取 {len(batch_items)} 条新公告")
-            
-            # 批次间延迟
-            if batch_idx < total_batches - 1:
-                delay = random.uniform(args.delay_min, args.delay_max)
-                print(f"   等待 {delay:.1f} 秒后处理下一批...")
-                time.sleep(delay)
-            
-            # 如果已达到总上限，提前结束
-            if len(all_items) >= args.max_items_total:
-                print(f"\n✅ 已达到总上限，提前结束批次处理")
-                break
-    else:
-        # 未指定股票代码，使用原来的逻辑（全市场）
-        page = 1
-        while len(all_items) < args.max_items_total:
-            print(f"\n📄 正在请求第 {page} 页公告数据 ...")
-            data = fetch_announcements(
-                stock_codes=None,
-                page_num=page,
-                page_size=args.page_size,
-                timeout_min=args.timeout_min,
-                timeout_max=args.timeout_max,
-                max_retries=args.max_retries,
-                retry_delay=args.retry_delay,
-                days=args.days
-            )
-
-            if not data:
-                print("⚠️ 没有更多数据了")
-                break
-
-            # 过滤掉已下载的公告（基于announcementId）
-            new_items = []
-            skipped_count = 0
-            for item in data:
-                announcement_id = item.get('announcementId')
-                if announcement_id and announcement_id in downloaded_ids:
-                    skipped_count += 1
-                    continue
-                new_items.append(item)
-            
-            if skipped_count > 0:
-                print(f"   跳过已下载: {skipped_count} 条")
+    # 下载队列：默认按列表顺序先PDF后网页；--priority 时按打分出队，--deadline 时来不及的推迟
+    # 队列中的公告记录写入保存目录下的临时文件，内存中每条只保留一个堆条目和去重键（仍与队列长度成正比，但远小于完整记录）
+    policy = None
+    if args.priority:
+        policy = PriorityPolicy(args.priority_age_weight, args.priority_size_weight, args.priority_keywords)
+    scheduler = DownloadScheduler(policy, get_announcement_date, args.deadline,
+                                  spool_dir=args.save_dir, record_type=Announcement)
 
-            # 计算还能添加多少条（只考虑未下载的）
-            remaining = args.max_items_total - len(all_items)
-            items_to_add = new_items[:remaining]
-            all_items.extend(items_to_add)
-            
-            print(f"   第 {page} 页获取到 {len(items_to_add)} 条新公告（总计: {len(all_items)}）")
-            
-            if len(data) < args.page_size:
-                break
-            
-            if len(all_items) >= args.max_items_total:
-                print(f"   ✅ 已达到总上限 {args.max_items_total} 条，停止请求")
-                break
-            
-            page += 1
-            # 随机延迟
-            time.sleep(random.uniform(args.delay_min, args.delay_max))
+    # 逐条获取公告记录，直接加入下载队列，统计信息按累计值维护
+    stats = RunStats()
+    for item in iter_announcements(stock_codes, args, downloaded_ids, se_date, response_cache, stats):
+        stats.add_item(item)
+        if item.is_pdf or not args.no_html:
+            scheduler.push(item, 1 if item.is_pdf else 2)
 
-    print(f"\n✅ 共获取 {len(all_items)} 条公告")
-    
-    # 按股票代码分组（便于统计）
-    stock_groups = {}
-    for item in all_items:
-        sec_code = item.get('secCode', 'unknown')
-        if sec_code not in stock_groups:
-            stock_groups[sec_code] = []
-        stock_groups[sec_code].append(item)
+    print(f"\n✅ 共获取 {stats.total} 条公告")
+    if response_cache is not None:
+        print(f"🗄️ 列表缓存: 命中 {response_cache.hits} 次，未命中 {response_cache.misses} 次")
     
     print(f"📊 各股票公告数量:")
-    for sec_code, items in stock_groups.items():
-        print(f"   {sec_code}: {len(items)} 条")
+    for sec_code, (sec_pdf, sec_html, _, _) in stats.per_stock.items():
+        print(f"   {sec_code}: {sec_pdf + sec_html} 条")
 
+    # requested_codes 为 000001.SZ 格式，统计按 secCode（000001）累计
     missing_codes = sorted([
         code for code in requested_codes
-        if code not in stock_groups or len(stock_groups[code]) == 0
+        if code.split('.')[0] not in stats.per_stock
     ])
     if missing_codes:
         print("\n⚠️ 以下股票未获取到任何公告：")
@@ -875,67 +1590,93 @@ if __name__ == "__main__":
             print(f"   {code}")
     else:
         print("\n✅ 所有指定股票均获取到至少一条公告")
-    # 分别处理PDF和网页公告
-    pdf_items = [i for i in all_items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")]
-    html_items = [] if args.no_html else [i for i in all_items if i not in pdf_items]
 
-    print(f"\n准备下载 {len(pdf_items)} 份PDF公告", end="")
+    # 上次推迟的公告：不打分时排在最前；--priority 时按打分出队，另加 --priority-deferred-bonus 分
+    # 本次列表中已有的由队列按ID去重
+    deferred_file = os.path.join(args.save_dir, DEFERRED_FILE)
+    carried_over = 0
+    for item in load_deferred(deferred_file, Announcement):
+        if item.announcement_id in downloaded_ids:
+            continue
+        if not item.is_pdf and args.no_html:
+            continue
+        if scheduler.push(item, 0, args.priority_deferred_bonus):
+            stats.add_item(item)
+            carried_over += 1
+    if carried_over:
+        print(f"⏭️ 上次推迟的 {carried_over} 份公告重新加入下载队列")
+
+    print(f"\n准备下载 {stats.pdf} 份PDF公告", end="")
     if not args.no_html:
-        print(f" 和 {len(html_items)} 份网页公告", end="")
+        print(f" 和 {stats.html} 份网页公告", end="")
     print("...")
-    
-    success_pdf = 0
-    success_html = 0
-    
-    # 下载PDF公告
-    print(f"\n开始下载 {len(pdf_items)} 份PDF公告...")
-    for item in tqdm(pdf_items, desc="下载PDF", unit="份", ncols=100):
-        if download_pdf(item, args.save_dir, downloaded_ids, args.timeout_min, args.timeout_max, output_func=tqdm.write, max_retries=args.max_retries, retry_delay=args.retry_delay):
-            success_pdf += 1
+
+    print(f"\n开始下载 {len(scheduler)} 份公告...")
+    progress = tqdm(total=len(scheduler), desc="下载", unit="份", ncols=100)
+    for item in scheduler:
+        start = time.monotonic()
+        if item.is_pdf:
+            with PROFILER.stage("download.pdf"):
+                ok = download_pdf(item, args.save_dir, downloaded_ids, args.timeout_min, args.timeout_max, output_func=tqdm.write, max_retries=args.max_retries, retry_delay=args.retry_delay, hedge=args.hedge, compression=args.compress, compression_level=args.compress_level)
+        else:
+            with PROFILER.stage("download.html"):
+                ok = download_html(item, args.save_dir, args.timeout_min, args.timeout_max, args.compress, args.compress_level)
+        if ok:
+            elapsed = time.monotonic() - start
+            stats.add_success(item, elapsed)
+            scheduler.record(item, elapsed)
+        progress.update(1)
         time.sleep(random.uniform(args.download_delay_min, args.download_delay_max))
+    progress.close()
+    save_deferred(deferred_file, scheduler.iter_deferred())
     print()
     
-    # 下载网页公告
-    if not args.no_html:
-        for item in html_items:
-            if download_html(item, args.save_dir, args.timeout_min, args.timeout_max):
-                success_html += 1
-            time.sleep(random.uniform(args.download_delay_min, args.download_delay_max))
-    
     print(f"\n🎯 下载完成！")
-    print(f"   PDF: {success_pdf}/{len(pdf_items)} 份")
+    print(f"   PDF: {stats.success_pdf}/{stats.pdf} 份")
     if not args.no_html:
-        print(f"   HTML: {success_html}/{len(html_items)} 份")
-    print(f"   总计: {success_pdf + success_html}/{len(all_items)} 份")
+        print(f"   HTML: {stats.success_html}/{stats.html} 份")
+    print(f"   总计: {stats.success_pdf + stats.success_html}/{stats.total} 份")
+    if scheduler.deferred:
+        print(f"   ⏳ 超过 --deadline，推迟 {len(scheduler.deferred)} 份到 {deferred_file}（下次运行补下载）")
+    latency_summary = LATENCY.summary()
+    if latency_summary:
+        print(f"   请求耗时: {latency_summary}")
+    if args.hedge:
+        print(f"   对冲请求: 发出 {LATENCY.hedges} 次，其中 {LATENCY.hedge_wins} 次先于原请求完成")
+
+    # 列式导出
+    if args.export_dir:
+        with PROFILER.stage("export"):
+            export_items(scheduler.spooled(), args.save_dir, args.export_dir, args.export_format, args.export_batch_size,
+                         args.compress, args.convert_dir)
+    scheduler.close()
+
+    # 本次实测速率写入运行历史，供 --plan-only 估算耗时
+    if stats.list_requests:
+        crawl_plan.append_history(os.path.join(args.save_dir, crawl_plan.HISTORY_FILE), stats)
 
     # 保存已下载ID集合
     save_downloaded_ids(args.save_dir, downloaded_ids)
-    print(f"💾 已保存 {len(downloaded_ids)} 个已下载公告ID到 {os.path.join(args.save_dir, '.downloaded_ids.json')}")
+    print(f"💾 已保存 {len(downloaded_ids)} 个已下载公告ID到 {os.path.join(args.save_dir, id_set.ID_FILE)}")
     
     # 生成下载报告
-    generate_download_report(
-        save_dir=args.save_dir,
-        stock_codes=stock_codes,
-        all_items=all_items,
-        stock_groups=stock_groups,
-        success_pdf=success_pdf,
-        success_html=success_html,
-        pdf_items=pdf_items,
-        html_items=html_items,
-        requested_codes=requested_codes,
-        missing_codes=missing_codes,
-        downloaded_ids_before=downloaded_ids_before,
-        downloaded_ids_after=downloaded_ids,
-        args=args
-    )
+    with PROFILER.stage("report"):
+        generate_download_report(
+            save_dir=args.save_dir,
+            stock_codes=stock_codes,
+            stats=stats,
+            requested_codes=requested_codes,
+            missing_codes=missing_codes,
+            downloaded_ids_before=downloaded_ids_before,
+            downloaded_ids_after=downloaded_ids,
+            args=args
+        )
     
     # 打印每个股票的下载统计
     print(f"\n📈 各股票下载统计:")
-    for sec_code, items in stock_groups.items():
-        sec_pdf = len([i for i in items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")])
-        sec_html = len(items) - sec_pdf if not args.no_html else 0
-        sec_success_pdf = len([i for i in items if "adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf") and os.path.exists(os.path.join(args.save_dir, sec_code, f"{sec_code}_{get_announcement_date(i)}_{sanitize_filename(i.get('announcementTitle', 'Unknown'))}.pdf"))])
-        sec_success_html = 0
-        if not args.no_html:
-            sec_success_html = len([i for i in items if not ("adjunctUrl" in i and i["adjunctUrl"].lower().endswith(".pdf")) and os.path.exists(os.path.join(args.save_dir, sec_code, f"{sec_code}_{get_announcement_date(i)}_{sanitize_filename(i.get('announcementTitle', 'Unknown'))}.html"))])
-        print(f"   {sec_code}: PDF {sec_success_pdf}/{sec_pdf} 份, HTML {sec_success_html}/{sec_html} 份")
\ No newline at end of file
+    for sec_code, (sec_pdf, sec_html, sec_success_pdf, sec_success_html) in stats.per_stock.items():
+        if args.no_html:
+            sec_html = 0
+        print(f"   {sec_code}: PDF {sec_success_pdf}/{sec_pdf} 份, HTML {sec_success_html}/{sec_html} 份")
+
+    PROFILER.report(time.perf_counter() - run_start)
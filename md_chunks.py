@@ -0,0 +1,345 @@
+"""
+Markdown公告分块导出（供下游检索系统做向量化）
+把 processed/markdown/ 下的公告切分为大小有上限的文本块，每次运行只导出相对上次变化的块：
+  - 按章节切分：Markdown 标题和“第一节”“一、”“（一）”等中文章节标题处必定断开，
+    每个块带上所在章节的标题路径（如 "一、关联交易概述 > （二）交易各方的关联关系"）
+  - 章节内按段落累积，超过 --max-chars 前断开；PDF提取的文本按行折行，以句末标点结尾的行视为段落结束
+  - 段落累积到 --min-chars 后，是否在某段之后断开由该段内容的哈希决定（内容定义分块），
+    章节中间插入或删除一段只影响附近一两个块，后面的块边界和ID不变
+  - 块ID为 来源文件、章节路径、块文本 的 SHA-256 前 16 位，内容不变ID就不变；
+    重新转换只改变 extracted_at 等 frontmatter 时不会产生变化
+  - 每次运行把新增和删除的块写入 <输出目录>/deltas/<时间>.jsonl，没有变化时不写；
+    已导出的块ID记录在 <输出目录>/manifest.sqlite，按 mtime/大小跳过未修改的文件
+
+增量导出：
+    python md_chunks.py build
+"""
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+from md_index import parse_frontmatter
+
+DEFAULT_MARKDOWN_DIR = Path("processed/markdown")
+DEFAULT_CHUNK_DIR = Path("processed/chunks")
+MANIFEST_FILE = "manifest.sqlite"
+DELTA_DIR = "deltas"
+DEFAULT_MAX_CHARS = 1500
+DEFAULT_MIN_CHARS = 300
+# 达到 min_chars 后平均每 CUT_MODULUS 段断开一次
+CUT_MODULUS = 4
+HEADING_MAX_CHARS = 40
+# 分块规则变化时递增，所有文件重新分块
+CHUNKER_VERSION = 1
+
+# 中文章节标题，数字越小层级越高（Markdown 标题占 1-6）
+HEADING_PATTERNS = [
+    (7, re.compile(r'^第[一二三四五六七八九十百零〇\d]+[章部]')),
+    (8, re.compile(r'^第[一二三四五六七八九十百零〇\d]+节')),
+    (9, re.compile(r'^[一二三四五六七八九十]+、')),
+    (10, re.compile(r'^[（(][一二三四五六七八九十]+[）)]')),
+]
+MD_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+PARAGRAPH_END_RE = re.compile(r'[。！？!?；;：:]$')
+SENTENCE_END_RE = re.compile(r'(?<=[。！？!?；;])')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    path TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (path, chunk_id)
+) WITHOUT ROWID;
+"""
+
+def heading_level(line: str):
+    """章节标题返回 (层级, 标题文本)，否则返回 None"""
+    match = MD_HEADING_RE.match(line)
+    if match:
+        return len(match.group(1)), match.group(2).strip()
+    if len(line) > HEADING_MAX_CHARS or line.endswith("。"):
+        return None
+    for level, pattern in HEADING_PATTERNS:
+        if pattern.match(line):
+            return level, line
+    return None
+
+def split_sections(body: str) -> list:
+    """
+    按章节标题切分正文
+    :return: [(章节路径, [段落文本, ...]), ...]，段落为原文中的若干行
+    """
+    sections = []
+    stack = []
+    paragraphs = []
+    lines = []
+
+    def end_paragraph():
+        if lines:
+            paragraphs.append("\n".join(lines))
+            lines.clear()
+
+    def end_section():
+        end_paragraph()
+        if paragraphs:
+            sections.append((" > ".join(title for _, title in stack), list(paragraphs)))
+            paragraphs.clear()
+
+    in_table = False
+    for raw_line in body.split("\n"):
+        line = raw_line.strip()
+        if not line:
+            end_paragraph()
+            continue
+        # Markdown 表格整体作为一段
+        is_table = line.startswith("|")
+        if is_table != in_table:
+            end_paragraph()
+            in_table = is_table
+        heading = None if is_table else heading_level(line)
+        if heading:
+            end_section()
+            level = heading[0]
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append(heading)
+            continue
+        lines.append(line)
+        if not is_table and PARAGRAPH_END_RE.search(line):
+            end_paragraph()
+    end_section()
+    return sections
+
+def split_long(paragraph: str, max_chars: int) -> list:
+    """超过 max_chars 的段落先按句末标点、再按长度切开（表格按行）"""
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    separator = "\n" if paragraph.startswith("|") else ""
+    units = paragraph.split("\n") if separator else SENTENCE_END_RE.split(paragraph)
+    pieces = []
+    current = ""
+    for unit in units:
+        while len(unit) > max_chars:
+            unit_head, unit = unit[:max_chars], unit[max_chars:]
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(unit_head)
+        if current and len(current) + len(separator) + len(unit) > max_chars:
+            pieces.append(current)
+            current = ""
+        current = current + separator + unit if current else unit
+    if current:
+        pieces.append(current)
+    return [piece for piece in pieces if piece.strip()]
+
+def _is_cut_point(paragraph: str) -> bool:
+    digest = hashlib.blake2b(paragraph.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % CUT_MODULUS == 0
+
+def chunk_document(body: str, source: str, max_chars: int = DEFAULT_MAX_CHARS,
+                   min_chars: int = DEFAULT_MIN_CHARS) -> list:
+    """
+    把一篇公告正文切分为文本块
+    :param source: 来源标识（frontmatter 中的 source），参与块ID计算，不同公告中相同的文字得到不同的ID
+    :return: [{id, seq, heading, text}, ...]，按原文顺序
+    """
+    chunks = []
+    seen = {}
+
+    def emit(heading, parts):
+        text = "\n".join(parts)
+        digest = hashlib.sha256(f"{source}\n{heading}\n{text}".encode("utf-8")).hexdigest()[:16]
+        # 同一公告中完全相同的块（重复的声明段落等）按出现次数区分
+        count = seen.get(digest, 0)
+        seen[digest] = count + 1
+        if count:
+            digest = hashlib.sha256(f"{digest}#{count}".encode("utf-8")).hexdigest()[:16]
+        chunks.append({"id": digest, "seq": len(chunks), "heading": heading, "text": text})
+
+    for heading, paragraphs in split_sections(body):
+        parts = []
+        size = 0
+        for paragraph in paragraphs:
+            for piece in split_long(paragraph, max_chars):
+                if parts and size + 1 + len(piece) > max_chars:
+                    emit(heading, parts)
+                    parts, size = [], 0
+                parts.append(piece)
+                size += len(piece) + (1 if size else 0)
+                if size >= min_chars and _is_cut_point(piece):
+                    emit(heading, parts)
+                    parts, size = [], 0
+        if parts:
+            emit(heading, parts)
+    return chunks
+
+def open_manifest(chunk_dir: Path = DEFAULT_CHUNK_DIR) -> sqlite3.Connection:
+    """打开（必要时创建）已导出块的清单数据库"""
+    chunk_dir = Path(chunk_dir)
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(chunk_dir / MANIFEST_FILE))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _write_delta(delta_dir: Path, records: list) -> Path:
+    """写出本次运行的变更文件（先写临时文件再改名，下游只会读到完整的文件）"""
+    delta_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+    delta_path = delta_dir / f"{stamp}.jsonl"
+    tmp_path = delta_path.with_name(delta_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, delta_path)
+    return delta_path
+
+def update_chunks(markdown_dir: Path = DEFAULT_MARKDOWN_DIR, chunk_dir: Path = DEFAULT_CHUNK_DIR,
+                  max_chars: int = DEFAULT_MAX_CHARS, min_chars: int = DEFAULT_MIN_CHARS) -> dict:
+    """
+    增量分块：只重新分块新增或修改过（mtime/大小变化）的文件，与上次导出的块ID比较，写出变更文件
+    分块参数与上次不同时所有文件重新分块
+    近似重复的公告（frontmatter 带 duplicate_of）不导出，避免下游重复向量化
+    变更文件每行一条记录：
+        {"op": "add", "id", "doc", "source", "stock", "date", "title", "seq", "heading", "text"}
+        {"op": "remove", "id", "doc"}
+    变更文件写出后才提交清单，中途退出时下次运行会重新导出同样的变更（按块ID去重即可）
+    :return: 统计信息 {files, unchanged_files, added, removed, kept, delta}，delta 为变更文件路径（没有变化时为 None）
+    """
+    markdown_dir = Path(markdown_dir)
+    chunk_dir = Path(chunk_dir)
+    if min_chars > max_chars:
+        raise ValueError(f"--min-chars ({min_chars}) 不能大于 --max-chars ({max_chars})")
+    stats = {"files": 0, "unchanged_files": 0, "added": 0, "removed": 0, "kept": 0, "delta": None}
+    params = json.dumps({"version": CHUNKER_VERSION, "max_chars": max_chars, "min_chars": min_chars,
+                         "cut_modulus": CUT_MODULUS})
+    conn = open_manifest(chunk_dir)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        rechunk_all = row is not None and row[0] != params
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in conn.execute("SELECT path, mtime_ns, size FROM docs")
+        }
+        records = []
+
+        def previous_ids(doc):
+            return {chunk_id for chunk_id, in conn.execute("SELECT chunk_id FROM chunks WHERE path = ?", (doc,))}
+
+        def remove(doc, chunk_ids):
+            for chunk_id in sorted(chunk_ids):
+                records.append({"op": "remove", "id": chunk_id, "doc": doc})
+            conn.executemany("DELETE FROM chunks WHERE path = ? AND chunk_id = ?",
+                             [(doc, chunk_id) for chunk_id in chunk_ids])
+            stats["removed"] += len(chunk_ids)
+
+        for md_path in sorted(markdown_dir.rglob("*.md")):
+            doc = md_path.relative_to(markdown_dir).as_posix()
+            stat = md_path.stat()
+            stats["files"] += 1
+            entry = known.pop(doc, None)
+            if not rechunk_all and entry == (stat.st_mtime_ns, stat.st_size):
+                stats["unchanged_files"] += 1
+                continue
+            try:
+                content = md_path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"⚠️ 读取失败，跳过分块: {md_path} - {e}")
+                continue
+
+            fields, body = parse_frontmatter(content)
+            chunks = [] if fields.get("duplicate_of") else chunk_document(body, fields.get("source") or doc,
+                                                                          max_chars, min_chars)
+            old_ids = previous_ids(doc)
+            new_ids = {chunk["id"] for chunk in chunks}
+            remove(doc, old_ids - new_ids)
+            for chunk in chunks:
+                if chunk["id"] not in old_ids:
+                    records.append({
+                        "op": "add", "id": chunk["id"], "doc": doc, "source": fields.get("source", ""),
+                        "stock": fields.get("stock", ""), "date": fields.get("date", ""),
+                        "title": fields.get("title", md_path.stem), "seq": chunk["seq"],
+                        "heading": chunk["heading"], "text": chunk["text"],
+                    })
+                    stats["added"] += 1
+                else:
+                    stats["kept"] += 1
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (path, chunk_id, seq) VALUES (?, ?, ?)",
+                [(doc, chunk["id"], chunk["seq"]) for chunk in chunks]
+            )
+            conn.execute("INSERT OR REPLACE INTO docs (path, mtime_ns, size) VALUES (?, ?, ?)",
+                         (doc, stat.st_mtime_ns, stat.st_size))
+
+        # 剩下的是磁盘上已经不存在的文件
+        for doc in known:
+            remove(doc, previous_ids(doc))
+            conn.execute("DELETE FROM docs WHERE path = ?", (doc,))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (params,))
+
+        if records:
+            stats["delta"] = _write_delta(chunk_dir / DELTA_DIR, records)
+        conn.commit()
+    finally:
+        conn.close()
+    return stats
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="把转换后的 Markdown 公告切分为文本块，增量导出新增/删除的块",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 增量分块，变更写入 processed/chunks/deltas/<时间>.jsonl
+        python md_chunks.py build
+
+        # 调整块大小（与上次不同时所有文件重新分块，变更文件中包含全部旧块的删除和新块的新增）
+        python md_chunks.py build --max-chars 1000 --min-chars 200
+        """
+    )
+    parser.add_argument("--chunk-dir", type=str, default=str(DEFAULT_CHUNK_DIR),
+                        help=f"清单和变更文件目录 (默认: {DEFAULT_CHUNK_DIR})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="增量分块并写出变更文件")
+    build_parser.add_argument("--markdown-dir", type=str, default=str(DEFAULT_MARKDOWN_DIR),
+                              help=f"Markdown 根目录 (默认: {DEFAULT_MARKDOWN_DIR})")
+    build_parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS,
+                              help=f"每个块的字符数上限 (默认: {DEFAULT_MAX_CHARS})")
+    build_parser.add_argument("--min-chars", type=int, default=DEFAULT_MIN_CHARS,
+                              help=f"块累积到该字符数后才按内容选择断开位置 (默认: {DEFAULT_MIN_CHARS})")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if not Path(args.markdown_dir).exists():
+        print(f"❌ 目录不存在: {args.markdown_dir}")
+        return
+    try:
+        stats = update_chunks(Path(args.markdown_dir), Path(args.chunk_dir), args.max_chars, args.min_chars)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(f"✅ 分块完成: {stats['files']} 个文件（未修改 {stats['unchanged_files']}），"
+          f"新增 {stats['added']} 块，删除 {stats['removed']} 块，未变化 {stats['kept']} 块")
+    print(f"📂 变更文件: {stats['delta']}" if stats["delta"] else "📂 没有变化，未写变更文件")
+
+if __name__ == "__main__":
+    main()
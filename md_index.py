@@ -0,0 +1,299 @@
+"""
+Markdown公告全文索引脚本
+基于 SQLite FTS5 为 processed/markdown/ 下的公告建立增量全文索引，并提供检索命令行
+中文按字符二元组（bigram）切分，英文和数字按单词切分
+文件的 mtime/大小变化后再比较被索引内容（标题、frontmatter 字段和正文）的摘要，
+只有 extracted_at 等不参与索引的字段变化（如重新转换）时不重建索引
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+
+DEFAULT_MARKDOWN_DIR = Path("processed/markdown")
+DEFAULT_INDEX_FILE = Path("processed/index.sqlite")
+
+# 中日韩统一表意文字（含扩展A区）按二元组切分，其余按字母数字单词切分
+CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+TOKEN_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9A-Za-z]+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT,
+    title TEXT,
+    source TEXT,
+    stock TEXT,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_docs_stock_date ON docs(stock, date);
+CREATE INDEX IF NOT EXISTS idx_docs_date ON docs(date);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, tokenize='unicode61');
+"""
+
+def tokenize(text: str) -> str:
+    """把文本切分为以空格分隔的词元：中文连续片段生成重叠二元组，英文数字转小写"""
+    tokens = []
+    for run in TOKEN_RUN_RE.findall(text):
+        if CJK_RUN_RE.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return " ".join(tokens)
+
+def build_match_query(query: str) -> str:
+    """
+    把用户输入转换为 FTS5 MATCH 表达式：空格分隔的每个词作为一个短语，多个词之间为 AND
+    以单个汉字结尾的词（如“股”“A股”）切分后最后一个词元是单字，而正文中的汉字按二元组索引，
+    这时把短语改为前缀查询（"股" *），匹配以该字开头的二元组
+    """
+    phrases = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        last = tokens.rsplit(" ", 1)[-1]
+        suffix = " *" if len(last) == 1 and CJK_RUN_RE.fullmatch(last) else ""
+        phrases.append('"' + tokens + '"' + suffix)
+    return " AND ".join(phrases)
+
+def parse_frontmatter(content: str) -> tuple:
+    """解析 Markdown 顶部的 frontmatter，返回 (字段字典, 正文)"""
+    if not content.startswith("---\n"):
+        return {}, content
+    end = content.find("\n---\n", 4)
+    if end == -1:
+        return {}, content
+    fields = {}
+    for line in content[4:end].split("\n"):
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields, content[end + 5:]
+
+def open_index(index_file: Path = DEFAULT_INDEX_FILE) -> sqlite3.Connection:
+    """打开（必要时创建）索引数据库"""
+    index_file = Path(index_file)
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(index_file))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # 旧版索引没有 content_hash 列，补上后旧文档在 mtime/大小变化时重新索引
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(docs)")}
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE docs ADD COLUMN content_hash TEXT")
+    return conn
+
+def _delete_doc(conn: sqlite3.Connection, doc_id: int):
+    conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+    conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+
+def _index_doc(conn: sqlite3.Connection, md_path: Path, stat: os.stat_result = None):
+    """
+    把单个 Markdown 文件写入索引，被索引内容的摘要与已有记录相同时只更新 mtime/大小
+    :return: "added"、"updated"、"unchanged"，读取失败返回 None
+    """
+    stat = stat or md_path.stat()
+    try:
+        content = md_path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"⚠️ 读取失败，跳过索引: {md_path} - {e}")
+        return None
+
+    fields, body = parse_frontmatter(content)
+    title = fields.get("title", md_path.stem)
+    source, stock, date = fields.get("source", ""), fields.get("stock", ""), fields.get("date", "")
+    content_hash = hashlib.sha256("\0".join((title, source, stock, date, body)).encode("utf-8")).hexdigest()
+    row = conn.execute("SELECT id, content_hash FROM docs WHERE path = ?", (str(md_path),)).fetchone()
+    if row and row[1] == content_hash:
+        conn.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?", (stat.st_mtime_ns, stat.st_size, row[0]))
+        return "unchanged"
+    if row:
+        _delete_doc(conn, row[0])
+
+    cursor = conn.execute(
+        "INSERT INTO docs (path, mtime_ns, size, content_hash, title, source, stock, date)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (str(md_path), stat.st_mtime_ns, stat.st_size, content_hash, title, source, stock, date)
+    )
+    conn.execute(
+        "INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+        (cursor.lastrowid, tokenize(title), tokenize(body))
+    )
+    return "updated" if row else "added"
+
+def index_file(conn: sqlite3.Connection, md_path: Path, stat: os.stat_result = None) -> bool:
+    """把单个 Markdown 文件写入索引（已存在且内容有变化则替换），成功返回 True"""
+    return _index_doc(conn, md_path, stat) is not None
+
+def update_index(markdown_dir: Path = DEFAULT_MARKDOWN_DIR, index_file_path: Path = DEFAULT_INDEX_FILE,
+                 commit_every: int = 500) -> dict:
+    """
+    增量更新索引：只重新索引新增或内容有变化的文件（mtime/大小变化后再比较内容摘要），并移除已删除的文件
+    :param markdown_dir: Markdown 根目录
+    :param index_file_path: 索引数据库路径
+    :param commit_every: 每写入多少个文件提交一次事务
+    :return: 统计信息 {added, updated, removed, unchanged}
+    """
+    markdown_dir = Path(markdown_dir)
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    conn = open_index(index_file_path)
+    try:
+        known = {
+            path: (doc_id, mtime_ns, size)
+            for doc_id, path, mtime_ns, size in conn.execute("SELECT id, path, mtime_ns, size FROM docs")
+        }
+        pending = 0
+        for md_path in markdown_dir.rglob("*.md"):
+            stat = md_path.stat()
+            entry = known.pop(str(md_path), None)
+            if entry and entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size:
+                stats["unchanged"] += 1
+                continue
+            status = _index_doc(conn, md_path, stat)
+            if status:
+                stats[status] += 1
+                pending += 1
+            if pending >= commit_every:
+                conn.commit()
+                pending = 0
+
+        # 剩下的是磁盘上已经不存在的文件
+        for doc_id, _, _ in known.values():
+            _delete_doc(conn, doc_id)
+            stats["removed"] += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return stats
+
+def search(query: str, index_file_path: Path = DEFAULT_INDEX_FILE, stock: str = None,
+           date_from: str = None, date_to: str = None, title_only: bool = False, limit: int = 20) -> list:
+    """
+    检索公告
+    :param query: 检索词，空格分隔的多个词之间为 AND 关系
+    :param stock: 按股票代码过滤
+    :param date_from: 起始日期（含），格式 YYYY-MM-DD
+    :param date_to: 截止日期（含），格式 YYYY-MM-DD
+    :param title_only: 只检索标题
+    :param limit: 最多返回条数
+    :return: 结果列表，每项为包含 path/title/source/stock/date/score 的字典
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    if title_only:
+        match = "title : (" + match + ")"
+
+    sql = """
+        SELECT d.path, d.title, d.source, d.stock, d.date, bm25(docs_fts) AS score
+        FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid
+        WHERE docs_fts MATCH ?
+    """
+    params = [match]
+    if stock:
+        sql += " AND d.stock = ?"
+        params.append(stock)
+    if date_from:
+        sql += " AND d.date >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND d.date <= ?"
+        params.append(date_to)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    conn = open_index(index_file_path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    keys = ("path", "title", "source", "stock", "date", "score")
+    return [dict(zip(keys, row)) for row in rows]
+
+def make_snippet(md_path: str, query: str, width: int = 40) -> str:
+    """从原文件中截取第一个命中词附近的文本作为摘要"""
+    try:
+        _, body = parse_frontmatter(Path(md_path).read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError):
+        return ""
+    body = re.sub(r'\s+', ' ', body).strip()
+    for term in query.split():
+        pos = body.lower().find(term.lower())
+        if pos != -1:
+            start = max(0, pos - width)
+            return ("…" if start > 0 else "") + body[start:pos + len(term) + width] + "…"
+    return ""
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="为转换后的 Markdown 公告建立全文索引并检索",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 增量建立/更新索引
+        python md_index.py build
+
+        # 检索包含“关联交易”的公告
+        python md_index.py search 关联交易
+
+        # 按股票和日期过滤，多个词之间为 AND
+        python md_index.py search 授信 平安证券 --stock 000001 --date-from 2026-01-01
+        """
+    )
+    parser.add_argument("--index-file", type=str, default=str(DEFAULT_INDEX_FILE),
+                        help=f"索引数据库路径 (默认: {DEFAULT_INDEX_FILE})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="增量建立/更新索引")
+    build_parser.add_argument("--markdown-dir", type=str, default=str(DEFAULT_MARKDOWN_DIR),
+                              help=f"Markdown 根目录 (默认: {DEFAULT_MARKDOWN_DIR})")
+
+    search_parser = subparsers.add_parser("search", help="检索公告")
+    search_parser.add_argument("query", nargs="+", help="检索词（多个词之间为 AND）")
+    search_parser.add_argument("--stock", type=str, help="按股票代码过滤，如 000001")
+    search_parser.add_argument("--date-from", type=str, help="起始日期（含），格式 YYYY-MM-DD")
+    search_parser.add_argument("--date-to", type=str, help="截止日期（含），格式 YYYY-MM-DD")
+    search_parser.add_argument("--title-only", action="store_true", help="只检索标题")
+    search_parser.add_argument("--limit", type=int, default=20, help="最多返回条数 (默认: 20)")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if args.command == "build":
+        stats = update_index(Path(args.markdown_dir), Path(args.index_file))
+        print(f"✅ 索引更新完成: 新增 {stats['added']}，更新 {stats['updated']}，"
+              f"删除 {stats['removed']}，未变化 {stats['unchanged']}")
+        print(f"📂 索引文件: {args.index_file}")
+        return
+
+    query = " ".join(args.query)
+    if not Path(args.index_file).exists():
+        print(f"❌ 索引文件不存在: {args.index_file}，请先运行 python md_index.py build")
+        return
+    results = search(query, Path(args.index_file), stock=args.stock, date_from=args.date_from,
+                     date_to=args.date_to, title_only=args.title_only, limit=args.limit)
+    if not results:
+        print("⚠️ 未找到匹配的公告")
+        return
+    print(f"🔍 找到 {len(results)} 条结果:")
+    for result in results:
+        print(f"- [{result['stock'] or '-'}] {result['date'] or '-'} {result['title']}")
+        print(f"  {result['path']}")
+        snippet = make_snippet(result["path"], query)
+        if snippet:
+            print(f"  {snippet}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+转换结果的分片归档
+把大量小 Markdown 文件追加写入少量滚动分片，减少目录遍历、备份和同步时的单文件开销：
+  - 分片文件 shard-<运行标识>-<序号>.jsonl.zst（未安装 zstandard 时为 .jsonl.gz），
+    每条记录是一行 JSON（key/content/written_at），单独压缩为一个帧；
+    帧可以直接拼接解压，zstd -dc / zcat 整个分片即得到 JSONL
+  - 每个分片旁有 <分片>.idx 偏移索引（key、偏移、长度、写入时间），按 key 随机读取只需一次 seek
+  - 同一 key 重复写入时以最后一次为准
+依赖 zstandard（可选）：pip install zstandard
+"""
+import os
+import sys
+import gzip
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，未安装时使用 gzip
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # 非 Unix 平台不复用未写满的分片
+    fcntl = None
+
+DEFAULT_SHARD_DIR = Path("processed/shards")
+DEFAULT_SHARD_MB = 256
+INDEX_SUFFIX = ".idx"
+
+def compress_frame(data: bytes, suffix: str) -> bytes:
+    if suffix == ".zst":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def decompress_frame(data: bytes, suffix: str) -> bytes:
+    if suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 分片需要 zstandard，请先执行 pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class ShardWriter:
+    """
+    追加写入滚动分片
+    每个分片同一时间只由一个进程写入（flock 加锁）；多进程各自写自己的分片，
+    打开时优先复用未写满且未被占用的分片，避免进程频繁重启时产生大量小分片
+    """
+
+    def __init__(self, shard_dir=DEFAULT_SHARD_DIR, max_shard_mb=DEFAULT_SHARD_MB, compression=None):
+        """
+        :param compression: zstd 或 gzip，默认有 zstandard 时用 zstd
+        """
+        compression = compression or ("zstd" if zstandard is not None else "gzip")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd 分片需要 zstandard，请先执行 pip install zstandard")
+        if compression not in ("zstd", "gzip"):
+            raise ValueError(f"不支持的分片压缩格式: {compression}（支持 zstd、gzip）")
+        self.shard_dir = Path(shard_dir)
+        self.max_shard_bytes = max_shard_mb * 1024 * 1024
+        self.suffix = ".zst" if compression == "zstd" else ".gz"
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+        self.seq = 0
+        self.shard_file = None
+        self.index_file = None
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    def _open_shard(self):
+        self.close()
+        # 复用未写满、且没有其他进程正在写入的分片
+        if fcntl is not None:
+            for path in sorted(self.shard_dir.glob(f"shard-*.jsonl{self.suffix}")):
+                if path.stat().st_size >= self.max_shard_bytes:
+                    continue
+                shard_file = open(path, "ab")
+                try:
+                    fcntl.flock(shard_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    shard_file.close()
+                    continue
+                self.shard_file = shard_file
+                break
+        if self.shard_file is None:
+            path = self.shard_dir / f"shard-{self.run_id}-{self.seq:05d}.jsonl{self.suffix}"
+            self.seq += 1
+            self.shard_file = open(path, "ab")
+            if fcntl is not None:
+                fcntl.flock(self.shard_file, fcntl.LOCK_EX)
+        self.index_file = open(str(self.shard_file.name) + INDEX_SUFFIX, "a", encoding="utf-8")
+
+    def write(self, key: str, content: str) -> tuple:
+        """
+        写入一条记录
+        :param key: 记录键（转换结果相对输出目录的路径，如 markdown/downloads/000001/xxx.md）
+        :return: (分片文件名, 偏移, 长度)
+        """
+        if self.shard_file is None or self.shard_file.tell() >= self.max_shard_bytes:
+            self._open_shard()
+        written_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+        line = json.dumps({"key": key, "content": content, "written_at": written_at}, ensure_ascii=False) + "\n"
+        frame = compress_frame(line.encode("utf-8"), self.suffix)
+
+        offset = self.shard_file.seek(0, os.SEEK_END)
+        self.shard_file.write(frame)
+        self.shard_file.flush()
+        # 数据写完后再追加索引行，中途退出时索引不会指向不完整的记录
+        self.index_file.write(f"{key}\t{offset}\t{len(frame)}\t{written_at}\n")
+        self.index_file.flush()
+        return Path(self.shard_file.name).name, offset, len(frame)
+
+    def close(self):
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+        if self.shard_file is not None:
+            self.shard_file.close()
+            self.shard_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ShardReader:
+    """按 key 随机读取分片中的记录；打开时加载全部偏移索引到内存"""
+
+    def __init__(self, shard_dir=DEFAULT_SHARD_DIR):
+        self.shard_dir = Path(shard_dir)
+        # key -> (分片文件名, 偏移, 长度, 写入时间)
+        self.locations = {}
+        for index_path in sorted(self.shard_dir.glob(f"shard-*{INDEX_SUFFIX}")):
+            shard_name = index_path.name[:-len(INDEX_SUFFIX)]
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4:
+                        continue
+                    key, offset, length, written_at = parts
+                    current = self.locations.get(key)
+                    if current is None or written_at >= current[3]:
+                        self.locations[key] = (shard_name, int(offset), int(length), written_at)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, key):
+        return key in self.locations
+
+    def keys(self):
+        return sorted(self.locations)
+
+    def get_record(self, key: str) -> dict:
+        """返回记录（key/content/written_at），不存在时抛出 KeyError"""
+        shard_name, offset, length, _ = self.locations[key]
+        with open(self.shard_dir / shard_name, "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        return json.loads(decompress_frame(frame, Path(shard_name).suffix))
+
+    def get(self, key: str) -> str:
+        """返回记录正文，不存在时抛出 KeyError"""
+        return self.get_record(key)["content"]
+
+    def iter_records(self, prefix: str = ""):
+        """按分片、偏移顺序逐条产出记录（顺序读取每个分片），只产出 key 以 prefix 开头的最新版本"""
+        by_shard = {}
+        for key, (shard_name, offset, length, _) in self.locations.items():
+            if key.startswith(prefix):
+                by_shard.setdefault(shard_name, []).append((offset, length))
+        for shard_name in sorted(by_shard):
+            suffix = Path(shard_name).suffix
+            with open(self.shard_dir / shard_name, "rb") as f:
+                for offset, length in sorted(by_shard[shard_name]):
+                    f.seek(offset)
+                    yield json.loads(decompress_frame(f.read(length), suffix))
+
+def export_loose(shard_dir, output_dir, prefix: str = "") -> int:
+    """
+    把分片中的记录还原为散文件：output_dir/<key>
+    :return: 导出的文件数
+    """
+    output_dir = Path(output_dir)
+    count = 0
+    for record in ShardReader(shard_dir).iter_records(prefix):
+        output_path = output_dir / record["key"]
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(record["content"])
+        count += 1
+    return count
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="查看、读取分片归档中的转换结果，或还原为散文件",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 列出归档中的记录
+        python md_shards.py list --prefix markdown/downloads/000001/
+
+        # 读取单条记录
+        python md_shards.py get markdown/downloads/000001/000001_2025-11-28_独立董事提名人声明.md
+
+        # 还原为 processed/markdown/... 散文件
+        python md_shards.py export --output-dir processed
+        """
+    )
+    parser.add_argument("--shard-dir", type=str, default=str(DEFAULT_SHARD_DIR),
+                        help=f"分片目录 (默认: {DEFAULT_SHARD_DIR})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="列出记录")
+    list_parser.add_argument("--prefix", type=str, default="", help="只列出 key 以该前缀开头的记录")
+
+    get_parser = subparsers.add_parser("get", help="输出单条记录的正文")
+    get_parser.add_argument("key", help="记录键，如 markdown/downloads/000001/xxx.md")
+
+    export_parser = subparsers.add_parser("export", help="还原为散文件")
+    export_parser.add_argument("--output-dir", type=str, default="processed", help="输出目录 (默认: processed)")
+    export_parser.add_argument("--prefix", type=str, default="", help="只导出 key 以该前缀开头的记录")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if args.command == "list":
+        reader = ShardReader(args.shard_dir)
+        for key in reader.keys():
+            if key.startswith(args.prefix):
+                print(key)
+    elif args.command == "get":
+        try:
+            sys.stdout.write(ShardReader(args.shard_dir).get(args.key))
+        except KeyError:
+            print(f"❌ 记录不存在: {args.key}")
+            sys.exit(1)
+    elif args.command == "export":
+        count = export_loose(args.shard_dir, args.output_dir, args.prefix)
+        print(f"✅ 已还原 {count} 个文件到 {args.output_dir}/")
+
+if __name__ == "__main__":
+    main()
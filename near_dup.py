@@ -0,0 +1,201 @@
+"""
+公告近似重复检测
+cninfo 经常把公告以“更正后”、重新披露等形式再发布一次，正文几乎相同：
+  - 对提取的正文计算 64 位 SimHash（去掉空白和标点后按字符三元组切分，按出现次数加权）
+  - 指纹按 16 位一段分成 4 段建立 LSH 索引：海明距离不超过 3 的两个指纹至少有一段完全相同，
+    查询时只比较与当前指纹某一段相同的候选，不需要与全部已处理的公告逐一比较
+  - 只在同一股票代码的公告之间比较，避免不同公司的模板化公告（股东大会通知等）被误判
+  - 索引保存在 SQLite（默认 processed/near_dup.sqlite），多进程并行转换时通过写事务串行查询和登记
+
+查看已发现的重复公告：
+    python near_dup.py list
+"""
+import re
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from collections import Counter
+
+DEFAULT_DEDUP_FILE = Path("processed/near_dup.sqlite")
+SHINGLE_SIZE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+MAX_DISTANCE = BANDS - 1
+# 正文太短时指纹不可靠，不参与检测
+MIN_CHARS = 50
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    stock TEXT NOT NULL,
+    simhash INTEGER NOT NULL,
+    duplicate_of TEXT
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    fingerprint_id INTEGER NOT NULL,
+    PRIMARY KEY (band, value, fingerprint_id)
+) WITHOUT ROWID;
+"""
+
+def simhash(text: str):
+    """
+    计算正文的 64 位 SimHash，正文过短时返回 None
+    每个三元组的 blake2b 摘要按字节累加权重，最后再展开到 64 位，避免逐特征逐位循环
+    """
+    text = NON_WORD_RE.sub("", text)
+    if len(text) < MIN_CHARS:
+        return None
+    shingles = Counter(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+    # byte_weights[i][b]：第 i 个字节取值为 b 的特征总权重
+    byte_weights = [[0] * 256 for _ in range(8)]
+    for shingle, weight in shingles.items():
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for i, byte in enumerate(digest):
+            byte_weights[i][byte] += weight
+
+    total = sum(shingles.values())
+    fingerprint = 0
+    for i, weights in enumerate(byte_weights):
+        for bit in range(8):
+            ones = sum(weight for byte, weight in enumerate(weights) if byte >> bit & 1)
+            if ones * 2 > total:
+                fingerprint |= 1 << (i * 8 + bit)
+    return fingerprint
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def band_values(fingerprint: int) -> list:
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+def _to_signed(value: int) -> int:
+    # SQLite 的 INTEGER 是有符号 64 位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+class NearDupIndex:
+    """已处理公告的 SimHash 指纹及 LSH 分段索引"""
+
+    def __init__(self, index_file=DEFAULT_DEDUP_FILE):
+        index_file = Path(index_file)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        # 手动管理事务，check_and_add 用 BEGIN IMMEDIATE 与其他进程互斥
+        self.conn = sqlite3.connect(str(index_file), timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _find_original(self, fingerprint: int, stock: str, own_id):
+        """返回与指纹海明距离不超过 MAX_DISTANCE、且比 own_id 更早登记的最早一篇公告的 key"""
+        best = None
+        for band, value in band_values(fingerprint):
+            rows = self.conn.execute(
+                "SELECT f.id, f.key, f.simhash, f.duplicate_of FROM bands b "
+                "JOIN fingerprints f ON f.id = b.fingerprint_id "
+                "WHERE b.band = ? AND b.value = ? AND f.stock = ?",
+                (band, value, stock)
+            )
+            for row_id, key, other, duplicate_of in rows:
+                if own_id is not None and row_id >= own_id:
+                    continue
+                if hamming(fingerprint, _to_unsigned(other)) > MAX_DISTANCE:
+                    continue
+                if best is None or row_id < best[0]:
+                    # 候选本身是副本时指向它的原件，避免形成重复链
+                    best = (row_id, duplicate_of or key)
+        return best[1] if best else None
+
+    def check_and_add(self, key: str, text: str, stock: str = ""):
+        """
+        登记一篇公告，并返回它近似重复的更早公告的 key（不重复或正文过短时返回 None）
+        同一 key 再次登记时保留原先的登记顺序，重新转换不会把原件反过来判为副本
+        :param key: 公告标识（如源文件相对路径）
+        :param stock: 股票代码，只与同一代码的公告比较
+        """
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT id FROM fingerprints WHERE key = ?", (key,)).fetchone()
+            own_id = row[0] if row else None
+            duplicate_of = self._find_original(fingerprint, stock, own_id)
+            if own_id is None:
+                own_id = self.conn.execute(
+                    "INSERT INTO fingerprints (key, stock, simhash, duplicate_of) VALUES (?, ?, ?, ?)",
+                    (key, stock, _to_signed(fingerprint), duplicate_of)
+                ).lastrowid
+            else:
+                self.conn.execute(
+                    "UPDATE fingerprints SET stock = ?, simhash = ?, duplicate_of = ? WHERE id = ?",
+                    (stock, _to_signed(fingerprint), duplicate_of, own_id)
+                )
+                self.conn.execute("DELETE FROM bands WHERE fingerprint_id = ?", (own_id,))
+            self.conn.executemany(
+                "INSERT INTO bands (band, value, fingerprint_id) VALUES (?, ?, ?)",
+                [(band, value, own_id) for band, value in band_values(fingerprint)]
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return duplicate_of
+
+    def duplicates(self) -> list:
+        """返回 [(副本 key, 原件 key), ...]"""
+        return self.conn.execute(
+            "SELECT key, duplicate_of FROM fingerprints WHERE duplicate_of IS NOT NULL ORDER BY duplicate_of, id"
+        ).fetchall()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="查看近似重复公告检测结果（由 pdf2md.py --dedup 生成）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 列出所有被判为近似重复的公告及其原件
+        python near_dup.py list
+
+        # 指定索引文件
+        python near_dup.py --dedup-file processed/near_dup.sqlite list
+        """
+    )
+    parser.add_argument("--dedup-file", type=str, default=str(DEFAULT_DEDUP_FILE),
+                        help=f"近似重复索引路径 (默认: {DEFAULT_DEDUP_FILE})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="列出近似重复的公告")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if not Path(args.dedup_file).exists():
+        print(f"❌ 索引不存在: {args.dedup_file}")
+        return
+    index = NearDupIndex(args.dedup_file)
+    try:
+        pairs = index.duplicates()
+        for key, original in pairs:
+            print(f"{key}\t→ {original}")
+        print(f"📊 已登记 {len(index)} 篇公告，其中近似重复 {len(pairs)} 篇")
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+扫描件OCR后端
+后端是一个接收页面图像（PIL.Image）并返回识别文本的函数，可通过 --ocr-backend 指定：
+  - tesseract：内置，依赖 pytesseract 和本地 tesseract（含 chi_sim 语言包）
+  - module:function：任意可导入的函数，如 my_ocr:recognize
+"""
+import importlib
+
+try:
+    import pytesseract
+except ImportError:  # pytesseract 为可选依赖，仅使用 tesseract 后端时需要
+    pytesseract = None
+
+def tesseract_backend(image) -> str:
+    """使用本地 tesseract 识别简体中文+英文"""
+    if pytesseract is None:
+        raise RuntimeError("tesseract 后端需要 pytesseract，请先执行 pip install pytesseract 并安装 tesseract")
+    return pytesseract.image_to_string(image, lang="chi_sim+eng")
+
+BUILTIN_BACKENDS = {
+    "tesseract": tesseract_backend,
+}
+
+def load_backend(spec: str):
+    """
+    根据名称或 module:function 加载OCR后端
+    :param spec: 内置后端名称，或 "模块:函数"
+    :return: 可调用对象 backend(image) -> str
+    """
+    if spec in BUILTIN_BACKENDS:
+        return BUILTIN_BACKENDS[spec]
+    module_name, sep, func_name = spec.partition(":")
+    if not sep or not module_name or not func_name:
+        raise ValueError(f"无效的OCR后端: {spec}（支持 {', '.join(BUILTIN_BACKENDS)} 或 module:function）")
+    backend = getattr(importlib.import_module(module_name), func_name, None)
+    if not callable(backend):
+        raise ValueError(f"OCR后端不可调用: {spec}")
+    return backend
@@ -1,38 +1,449 @@
 """
 PDF公告文本提取脚本
-将 downloads/ 目录下的 PDF 提取为 txt/md 文件到 processed/ 目录
+将 downloads/ 目录下的 PDF（以及网页公告 HTML）提取为 txt/md 文件到 processed/ 目录
 """
 import os
 import re
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import multiprocessing.util
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 import pdfplumber
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """从PDF中提取文本"""
-    text = ""
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+import html2md
+import md_index
+import md_chunks
+import md_shards
+import near_dup
+import ocr_backends
+import storage
+import profiling
+import raw_cache
+from profiling import PROFILER
+
+OCR_QUEUE_FILE = "ocr_queue.txt"
+# 页数超过该值的PDF按页范围分块提取
+DEFAULT_CHUNK_THRESHOLD = 200
+DEFAULT_CHUNK_PAGES = 50
+# 文件级并行时，每个工作进程处理多少个文件后重启，防止内存碎片累积
+WORKER_MAX_TASKS = 50
+# --skip-duplicates 时近似重复公告代替正文保存的说明
+DUPLICATE_STUB = "（正文与 {} 近似重复，未保存）\n"
+
+class ScannedPDFError(Exception):
+    """PDF 没有文本层（扫描件），应转入OCR队列"""
+
+def is_scanned_pdf(pdf, sample_pages: int = 3, min_chars_per_page: int = 10) -> bool:
+    """
+    抽查前几页：超过半数页面含有图片且几乎没有文字（没有文本层）时判定为扫描件
+    只有封面图、签章页等个别图片页的文本PDF不会被误判
+    """
+    pages = pdf.pages[:sample_pages]
+    if not pages:
+        return False
+    image_only = sum(1 for page in pages if page.images and len(page.chars) < min_chars_per_page)
+    return image_only * 2 > len(pages)
+
+# 页眉页脚检测：每页只看开头/结尾几行，出现在足够多页面上的视为页眉页脚
+HEADER_EDGE_LINES = 3
+HEADER_MIN_RATIO = 0.4
+HEADER_MIN_PAGES = 3
+HEADER_MAX_CHARS = 60
+HEADER_NUMBERED_MAX_CHARS = 20
+DIGITS_RE = re.compile(r'\d+')
+
+def header_key(line: str) -> str:
+    """
+    页眉页脚比较用的键：去掉空白；短行中的数字统一替换（"第 3 页"与"第 12 页"视为同一行），
+    较长的行只按原文比较，避免只有数字不同的正文被误判
+    """
+    key = ''.join(line.split())
+    if len(key) <= HEADER_NUMBERED_MAX_CHARS:
+        return DIGITS_RE.sub('#', key)
+    return key
+
+def strip_repeated_lines(pages: list) -> list:
+    """
+    去掉跨页重复的页眉页脚
+    第一遍统计每页开头/结尾 HEADER_EDGE_LINES 行的键出现在多少页上，
+    第二遍只在页面边缘删除出现页数达到 HEADER_MIN_RATIO 的行；总开销与行数成正比
+    只有不超过 HEADER_MAX_CHARS 字的短行才作为候选，Markdown 表格行（续表重复的表头）不参与判断
+    :param pages: 各页文本
+    :return: 清理后的各页文本
+    """
+    page_lines = [page.split('\n') if page else [] for page in pages]
+    if sum(1 for lines in page_lines if lines) < HEADER_MIN_PAGES:
+        return pages
+
+    def edge_indexes(lines):
+        content = [i for i, line in enumerate(lines)
+                   if line.strip() and len(line) <= HEADER_MAX_CHARS and not line.lstrip().startswith('|')]
+        return set(content[:HEADER_EDGE_LINES] + content[-HEADER_EDGE_LINES:])
+
+    counts = {}
+    page_edges = []
+    for lines in page_lines:
+        edges = edge_indexes(lines)
+        page_edges.append(edges)
+        for key in {header_key(lines[i]) for i in edges}:
+            counts[key] = counts.get(key, 0) + 1
+
+    threshold = max(HEADER_MIN_PAGES, HEADER_MIN_RATIO * len(pages))
+    repeated = {key for key, count in counts.items() if count >= threshold}
+    if not repeated:
+        return pages
+
+    cleaned = []
+    for lines, edges in zip(page_lines, page_edges):
+        cleaned.append('\n'.join(
+            line for i, line in enumerate(lines) if i not in edges or header_key(line) not in repeated
+        ))
+    return cleaned
+
+def join_pages(pages: list, strip_headers: bool = False) -> str:
+    """按页序拼接各页文本（页间空一行），strip_headers 为 True 时先去掉跨页重复的页眉页脚"""
+    if strip_headers:
+        with PROFILER.stage("pdf.headers"):
+            pages = strip_repeated_lines(pages)
+    return "".join(page + "\n\n" for page in pages if page)
+
+def read_pages(pdf, pages: list, tables: list, extract_tables: bool = False):
+    """
+    从已打开的PDF逐页提取原始文本（未去页眉页脚）追加到 pages，表格单元格数据追加到 tables
+    中途出错时已提取的部分保留在 pages/tables 中
+    :param extract_tables: 表格感知模式，每页只做一次表格检测
+    """
+    for page_number, page in enumerate(pdf.pages, start=1):
+        if extract_tables:
+            page_text, page_tables = extract_page_with_tables(page, page_number)
+            tables.extend(page_tables)
+        else:
+            page_text = page.extract_text() or ""
+        # 及时释放页面对象缓存，避免大文件内存持续增长
+        page.close()
+        pages.append(page_text)
+
+def extract_pages_from_pdf(pdf_path: str, scan_check_pages: int = 0, extract_tables: bool = False) -> tuple:
+    """
+    逐页提取原始文本（未去页眉页脚），scan_check_pages>0 时先抽查前几页，扫描件抛出 ScannedPDFError
+    :return: (各页文本, 表格单元格数据, 是否完整提取)；中途出错时返回已提取的部分
+    """
+    return extract_pdf_pages(pdf_path, extract_tables, scan_check_pages)
+
+def extract_text_from_pdf(pdf_path: str, scan_check_pages: int = 0, strip_headers: bool = False) -> str:
+    """从PDF中提取文本（scan_check_pages>0 时先抽查前几页，扫描件抛出 ScannedPDFError）"""
+    pages, _, _ = extract_pages_from_pdf(pdf_path, scan_check_pages)
+    return join_pages(pages, strip_headers)
+
+def table_to_markdown(rows: list) -> str:
+    """把表格单元格（二维列表，首行为表头）渲染为 Markdown 表格"""
+    width = max(len(row) for row in rows)
+    cells = [
+        [(cell or "").replace("\n", " ").replace("|", "\\|").strip() for cell in row] + [""] * (width - len(row))
+        for row in rows
+    ]
+    lines = ["| " + " | ".join(cells[0]) + " |", "|" + "|".join([" --- "] * width) + "|"]
+    lines.extend("| " + " | ".join(row) + " |" for row in cells[1:])
+    return "\n".join(lines)
+
+def extract_page_with_tables(page, page_number: int) -> tuple:
+    """
+    提取单页文本并把表格渲染为 Markdown 表格
+    没有任何线条/矩形（即不可能有带框线的表格）的页面直接走纯文本快速路径，不做表格检测
+    :return: (页面文本, 表格列表)，表格为 {page, index, bbox, rows} 字典
+    """
+    if not page.lines and not page.rects:
+        return page.extract_text() or "", []
+
+    tables = [t for t in page.find_tables() if t.bbox[3] > t.bbox[1]]
+    if not tables:
+        return page.extract_text() or "", []
+
+    # 表格区域内的字符不再参与正文提取，避免重复
+    text_page = page
+    for table in tables:
+        text_page = text_page.outside_bbox(table.bbox)
+
+    x0, top, x1, bottom = page.bbox
+    parts = []
+    page_tables = []
+    cursor = top
+    for index, table in enumerate(sorted(tables, key=lambda t: t.bbox[1])):
+        table_top, table_bottom = max(table.bbox[1], cursor), min(table.bbox[3], bottom)
+        if table_top > cursor:
+            band_text = text_page.crop((x0, cursor, x1, table_top)).extract_text()
+            if band_text:
+                parts.append(band_text)
+        rows = [row for row in table.extract() if any(cell for cell in row)]
+        if rows:
+            parts.append(table_to_markdown(rows))
+            page_tables.append({
+                "page": page_number,
+                "index": index,
+                "bbox": [round(v, 2) for v in table.bbox],
+                "rows": rows,
+            })
+        cursor = max(cursor, table_bottom)
+    if cursor < bottom:
+        band_text = text_page.crop((x0, cursor, x1, bottom)).extract_text()
+        if band_text:
+            parts.append(band_text)
+    return "\n\n".join(parts), page_tables
+
+def extract_text_and_tables_from_pdf(pdf_path: str, scan_check_pages: int = 0, strip_headers: bool = False) -> tuple:
+    """表格感知模式：每页只做一次表格检测，返回 (Markdown文本, 全部表格单元格数据)"""
+    pages, tables, _ = extract_pages_from_pdf(pdf_path, scan_check_pages, extract_tables=True)
+    return join_pages(pages, strip_headers), tables
+
+def current_rss_mb():
+    """返回当前进程常驻内存（MB），无法获取时返回 None"""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    # 非 Linux 平台退而使用峰值内存（macOS 单位为字节，其他为 KB）
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def extract_page_range(pdf_path: str, start: int, end: int, extract_tables: bool = False, max_rss_mb: int = 0) -> tuple:
+    """
+    提取第 [start, end) 页（从 0 开始），只加载该范围内的页面，每页处理完立即释放缓存
+    内存超过 max_rss_mb 时提前结束，由调用方重新打开文件继续（至少处理一页，保证有进展）
+    :return: (start, 实际处理到的下一页, 各页文本列表, 表格列表)
+    """
+    texts = []
+    tables = []
+    next_page = start
+    with pdfplumber.open(storage.open_source(pdf_path), pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            if extract_tables:
+                page_text, page_tables = extract_page_with_tables(page, next_page + 1)
+                tables.extend(page_tables)
+            else:
+                page_text = page.extract_text() or ""
+            page.close()
+            texts.append(page_text)
+            next_page += 1
+            if max_rss_mb and next_page < end:
+                rss = current_rss_mb()
+                if rss is not None and rss > max_rss_mb:
+                    break
+    return start, next_page, texts, tables
+
+def _can_spawn_workers() -> bool:
+    """文件级并行的工作进程是守护进程，不能再创建子进程"""
+    return not multiprocessing.current_process().daemon
+
+def extract_pages_chunked(pdf_path: str, total_pages: int, chunk_pages: int = DEFAULT_CHUNK_PAGES, workers: int = 1,
+                          extract_tables: bool = False, max_rss_mb: int = 0) -> tuple:
+    """
+    按页范围分块提取大文件，可分发到多个进程，最后按页序拼接
+    多进程时每个块在新启动（spawn）的短命子进程中处理，进程退出即归还全部内存，内存上限按子进程自身计算；
+    单进程时块在当前进程内处理，某块因内存上限提前结束后，剩余页范围改为逐块在短命子进程中继续
+    （在当前进程内重新打开文件并不能把内存还给系统）；当前进程已是文件级并行的工作进程、无法再创建子进程时，
+    剩余页范围不再受内存上限约束、一次处理完，由工作进程定期重启回收内存
+    :return: (各页文本, 表格列表, 是否完整提取)
+    """
+    pending = [(s, min(s + chunk_pages, total_pages)) for s in range(0, total_pages, chunk_pages)]
+    results = {}
+    isolate = workers > 1
+    try:
+        while pending:
+            tasks = [(pdf_path, s, e, extract_tables, max_rss_mb) for s, e in pending]
+            if isolate:
+                ctx = multiprocessing.get_context("spawn")
+                with ctx.Pool(max(1, min(workers, len(tasks))), maxtasksperchild=1) as pool:
+                    outputs = pool.starmap(extract_page_range, tasks)
+            else:
+                outputs = []
+                for i, task in enumerate(tasks):
+                    output = extract_page_range(*task)
+                    outputs.append(output)
+                    if output[1] < task[2]:
+                        # 已超过内存上限：本轮剩余分块原样留到下一轮
+                        outputs.extend((s, s, [], []) for _, s, _, _, _ in tasks[i + 1:])
+                        break
+
+            next_pending = []
+            stalled = False
+            for (_, end), (start, next_page, texts, tables) in zip(pending, outputs):
+                if texts:
+                    results[start] = (texts, tables)
+                if next_page < end:
+                    next_pending.append((next_page, end))
+                    stalled = stalled or (isolate and next_page - start <= 1)
+            if not next_pending:
+                break
+            if stalled:
+                # 新进程处理一页后即超过上限，说明上限低于进程本身的基础内存，继续重新调度不会有进展
+                print(f"   ⚠️ 新进程处理一页即超过 {max_rss_mb}MB，内存上限过低，剩余页面不再受上限约束")
+                max_rss_mb = 0
+            elif isolate:
+                print(f"   ♻️ 内存超过 {max_rss_mb}MB，{len(next_pending)} 个分块将在新进程中继续")
+            elif _can_spawn_workers():
+                isolate = True
+                print(f"   ♻️ 内存超过 {max_rss_mb}MB，剩余 {len(next_pending)} 个分块改在短命子进程中提取")
+            else:
+                print(f"   ⚠️ 内存超过 {max_rss_mb}MB，文件级工作进程无法再创建子进程，剩余页面一次提取完"
+                      f"（工作进程处理 {WORKER_MAX_TASKS} 个文件后重启回收内存）")
+                max_rss_mb = 0
+            pending = next_pending
     except Exception as e:
         print(f"❌ 提取失败: {pdf_path} - {e}")
-    return text
+        return [], [], False
+
+    pages = []
+    tables = []
+    for start in sorted(results):
+        texts, chunk_tables = results[start]
+        pages.extend(texts)
+        tables.extend(chunk_tables)
+    return pages, tables, True
+
+def extract_pdf_pages(pdf_path: str, extract_tables: bool = False, scan_check_pages: int = 0,
+                      chunk_threshold: int = 0, chunk_pages: int = DEFAULT_CHUNK_PAGES, chunk_workers: int = 1,
+                      max_rss_mb: int = 0) -> tuple:
+    """
+    按配置选择提取方式，返回 (各页原始文本, 表格列表, 是否完整提取)，扫描件抛出 ScannedPDFError
+    :param chunk_threshold: 页数超过该值时按页范围分块提取，0 表示不分块
+    :param chunk_pages: 每块页数
+    :param chunk_workers: 分块提取使用的进程数
+    :param max_rss_mb: 单个工作进程的内存上限（MB），0 表示不限制
+    """
+    pages = []
+    tables = []
+    try:
+        # 扫描件检查、页数判断和不分块的提取共用同一次打开
+        with pdfplumber.open(storage.open_source(pdf_path)) as pdf:
+            if scan_check_pages and is_scanned_pdf(pdf, scan_check_pages):
+                raise ScannedPDFError(pdf_path)
+            total_pages = len(pdf.pages)
+            if not chunk_threshold or total_pages <= chunk_threshold:
+                read_pages(pdf, pages, tables, extract_tables)
+                return pages, tables, True
+    except ScannedPDFError:
+        raise
+    except Exception as e:
+        print(f"❌ 提取失败: {pdf_path} - {e}")
+        return pages, tables, False
+
+    print(f"   📚 共 {total_pages} 页，按每块 {chunk_pages} 页分块提取")
+    return extract_pages_chunked(pdf_path, total_pages, chunk_pages, chunk_workers, extract_tables, max_rss_mb)
+
+def extract_pdf(pdf_path: str, extract_tables: bool = False, scan_check_pages: int = 0,
+                chunk_threshold: int = 0, chunk_pages: int = DEFAULT_CHUNK_PAGES, chunk_workers: int = 1,
+                max_rss_mb: int = 0, strip_headers: bool = False, raw_cache=None) -> tuple:
+    """
+    按配置提取PDF，返回 (文本, 表格列表)，扫描件抛出 ScannedPDFError
+    提取参数见 extract_pdf_pages；页眉页脚在全部页面（含分块）拼接后统一检测，统计覆盖整份文件
+    :param strip_headers: 去掉跨页重复的页眉页脚（见 strip_repeated_lines）
+    :param raw_cache: RawExtractionCache（见 raw_cache.py），指定时内容相同的PDF直接复用逐页原始文本，不再解析
+    """
+    digest = None
+    variant = "tables" if extract_tables else "text"
+    if raw_cache is not None:
+        with PROFILER.stage("pdf.raw_cache"):
+            digest = raw_cache.content_hash(pdf_path)
+            cached = raw_cache.get(digest, variant)
+        if cached is not None:
+            print("   ♻️ 命中原始提取缓存，跳过PDF解析")
+            return join_pages(cached["pages"], strip_headers), cached["tables"]
+
+    pages, tables, complete = extract_pdf_pages(pdf_path, extract_tables, scan_check_pages, chunk_threshold,
+                                                chunk_pages, chunk_workers, max_rss_mb)
+    # 中途出错的不缓存，下次重新提取
+    if raw_cache is not None and complete:
+        with PROFILER.stage("pdf.raw_cache"):
+            raw_cache.put(digest, variant, pages, tables)
+    return join_pages(pages, strip_headers), tables
+
+def extract_html(html_path) -> str:
+    """提取网页公告正文（Markdown），失败时返回空字符串"""
+    try:
+        return html2md.html_file_to_text(html_path, table_to_markdown)
+    except Exception as e:
+        print(f"❌ 提取失败: {html_path} - {e}")
+        return ""
+
+def ocr_pdf(pdf_path: str, backend, resolution: int = 300, strip_headers: bool = False) -> str:
+    """把每页渲染为图像后交给OCR后端识别"""
+    pages = []
+    try:
+        with pdfplumber.open(storage.open_source(pdf_path)) as pdf:
+            for page in pdf.pages:
+                image = page.to_image(resolution=resolution).original
+                pages.append(backend(image) or "")
+    except Exception as e:
+        print(f"❌ OCR失败: {pdf_path} - {e}")
+    return join_pages(pages, strip_headers)
+
+def load_ocr_queue(queue_file: Path) -> list:
+    """读取待OCR的PDF路径列表"""
+    if not queue_file.exists():
+        return []
+    with open(queue_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def enqueue_ocr(queue_file: Path, pdf_path: Path) -> bool:
+    """把扫描件加入OCR队列（已在队列中则跳过），新加入返回 True"""
+    entry = str(pdf_path)
+    if entry in load_ocr_queue(queue_file):
+        return False
+    queue_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(queue_file, 'a', encoding='utf-8') as f:
+        f.write(entry + "\n")
+    return True
+
+# 下载文件名格式：股票代码_公告日期_公告标题
+ANNOUNCEMENT_NAME_RE = re.compile(r'^(\d{6})_(\d{4}-\d{2}-\d{2})_(.+)$')
+
+def parse_announcement_name(name: str) -> dict:
+    """从文件名中解析股票代码、公告日期和标题，无法解析的字段返回空字符串"""
+    match = ANNOUNCEMENT_NAME_RE.match(name)
+    if not match:
+        return {"stock": "", "date": "", "title": name}
+    stock, date, title = match.groups()
+    return {"stock": stock, "date": date, "title": title}
 
 def sanitize_filename(filename: str) -> str:
     """清理文件名，移除非法字符"""
     illegal_chars = r'[<>:"/\\|?*]'
     return re.sub(illegal_chars, '_', filename)
 
-def convert_to_markdown(text: str, pdf_path: str, output_dir: Path) -> str:
-    """将文本转换为Markdown格式"""
+def relative_source(pdf_path, source_root: Path = None) -> Path:
+    """
+    源文件的相对路径，决定输出位置、frontmatter 的 source 和近似重复索引的键
+    在当前工作目录下时相对工作目录；否则相对下载目录 source_root 的上一级（输出布局与在工作目录下运行时相同）
+    """
+    pdf_path = Path(pdf_path).resolve()
+    try:
+        return pdf_path.relative_to(Path.cwd())
+    except ValueError:
+        if source_root is None:
+            raise ValueError(f"{pdf_path} 不在当前工作目录下，需要指定下载目录") from None
+        source_root = Path(source_root).resolve()
+        return Path(source_root.name) / pdf_path.relative_to(source_root)
+
+def convert_to_markdown(text: str, pdf_path: str, output_dir: Path, duplicate_of: str = None,
+                        source_root: Path = None) -> str:
+    """将文本转换为Markdown格式，duplicate_of 为近似重复公告的原件（源文件路径），写入 frontmatter"""
     # 从PDF路径提取信息
-    pdf_name = Path(pdf_path).stem
-    # 修复：转为绝对路径后再计算相对路径
-    pdf_absolute = Path(pdf_path).resolve()
-    pdf_relative = pdf_absolute.relative_to(Path.cwd())
+    pdf_name = storage.logical_path(pdf_path).stem
+    pdf_relative = relative_source(pdf_path, source_root)
+    meta = parse_announcement_name(pdf_name)
     
     # 清理文本中的多余空行
     lines = text.split('\n')
@@ -47,12 +458,15 @@ def convert_to_markdown(text: str, pdf_path: str, output_dir: Path) -> str:
         cleaned_lines.append(line)
     
     text_clean = '\n'.join(cleaned_lines)
+    duplicate_line = f"duplicate_of: {duplicate_of}\n" if duplicate_of else ""
     
     # 构建Markdown
     md_content = f"""---
 title: {pdf_name}
 source: {pdf_relative}
-extracted_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+stock: {meta['stock']}
+date: {meta['date']}
+{duplicate_line}extracted_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 ---
 
 # {pdf_name}
@@ -61,76 +475,551 @@ extracted_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
     return md_content
 
-def process_pdf(pdf_path: Path, output_dir: Path, use_markdown: bool = True):
-    """处理单个PDF文件"""
+def get_output_path(pdf_path: Path, output_dir: Path, use_markdown: bool = True, source_root: Path = None) -> Path:
+    """返回 PDF 对应的输出路径：output_dir/(markdown|text)/<相对路径>/<文件名>.(md|txt)，相对路径见 relative_source"""
     # 修复：转为绝对路径
     pdf_path = pdf_path.resolve()
-    
-    # 构建输出路径
-    relative_path = pdf_path.relative_to(Path.cwd())
-    relative_dir = relative_path.parent
-    
-    # 构建目标路径
+    relative_dir = relative_source(pdf_path, source_root).parent
+    stem = storage.logical_path(pdf_path).stem
     if use_markdown:
-        output_subdir = output_dir / "markdown" / relative_dir
-        output_path = output_subdir / f"{pdf_path.stem}.md"
-    else:
-        output_subdir = output_dir / "text" / relative_dir
-        output_path = output_subdir / f"{pdf_path.stem}.txt"
+        return output_dir / "markdown" / relative_dir / f"{stem}.md"
+    return output_dir / "text" / relative_dir / f"{stem}.txt"
+
+# 每个进程为每个分片目录保持一个写入器，进程退出时关闭
+_SHARD_WRITERS = {}
+# 已注册退出关闭的进程号（fork 出的工作进程会清空继承来的 Finalize 登记，需要重新注册）
+_SHARD_FINALIZER_PID = None
+
+def close_shard_writers():
+    """关闭本进程的全部分片写入器，释放分片锁"""
+    for writer in _SHARD_WRITERS.values():
+        writer.close()
+    _SHARD_WRITERS.clear()
+
+def get_shard_writer(shard_dir: Path, max_shard_mb: int = md_shards.DEFAULT_SHARD_MB):
+    global _SHARD_FINALIZER_PID
+    key = str(Path(shard_dir).resolve())
+    if key not in _SHARD_WRITERS:
+        if _SHARD_FINALIZER_PID != os.getpid():
+            # Pool 工作进程按 maxtasksperchild 退出时不执行 atexit，但会执行带 exitpriority 的 Finalize；
+            # 主进程中 Finalize 同样在解释器退出时执行
+            multiprocessing.util.Finalize(None, close_shard_writers, exitpriority=10)
+            _SHARD_FINALIZER_PID = os.getpid()
+        _SHARD_WRITERS[key] = md_shards.ShardWriter(shard_dir, max_shard_mb)
+    return _SHARD_WRITERS[key]
+
+# 每个进程为每个近似重复索引文件保持一个连接
+_DEDUP_INDEXES = {}
+
+def get_dedup_index(dedup_file: Path):
+    key = str(Path(dedup_file).resolve())
+    if key not in _DEDUP_INDEXES:
+        _DEDUP_INDEXES[key] = near_dup.NearDupIndex(dedup_file)
+    return _DEDUP_INDEXES[key]
+
+# 每个进程为每个原始提取缓存目录保持一个实例
+_RAW_CACHES = {}
+
+def get_raw_cache(cache_dir: Path):
+    key = str(Path(cache_dir).resolve())
+    if key not in _RAW_CACHES:
+        _RAW_CACHES[key] = raw_cache.RawExtractionCache(cache_dir, pdfplumber.__version__)
+    return _RAW_CACHES[key]
+
+def check_duplicate(pdf_path: Path, text: str, dedup_file: Path, source_root: Path = None):
+    """在近似重复索引中登记公告正文，返回它重复的更早公告的源文件路径（不重复返回 None）"""
+    relative_path = storage.logical_path(relative_source(pdf_path, source_root))
+    stock = parse_announcement_name(relative_path.stem)["stock"]
+    with PROFILER.stage("dedup"):
+        return get_dedup_index(dedup_file).check_and_add(relative_path.as_posix(), text, stock)
+
+def save_output(pdf_path: Path, text: str, output_dir: Path, use_markdown: bool = True, shard_writer=None,
+                duplicate_of: str = None, source_root: Path = None) -> Path:
+    """
+    把提取的文本保存到 output_dir 下与 PDF 相对路径对应的位置，返回输出路径
+    指定 shard_writer 时不写散文件，以输出路径相对 output_dir 的部分为 key 追加到分片归档
+    duplicate_of 为近似重复的原件，写入 Markdown 的 frontmatter
+    """
+    pdf_path = pdf_path.resolve()
+    output_path = get_output_path(pdf_path, output_dir, use_markdown, source_root)
+    with PROFILER.stage("pdf.markdown"):
+        content = (convert_to_markdown(text, str(pdf_path), output_dir, duplicate_of, source_root)
+                   if use_markdown else text)
     
-    # 创建目录
-    output_subdir.mkdir(parents=True, exist_ok=True)
+    with PROFILER.stage("pdf.write"):
+        if shard_writer is not None:
+            shard_writer.write(output_path.relative_to(output_dir).as_posix(), content)
+            return output_path
+
+        # 创建目录
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    return output_path
+
+def process_pdf(pdf_path: Path, output_dir: Path, use_markdown: bool = True, extract_tables: bool = False,
+                scan_check_pages: int = 0, ocr_queue_file: Path = None, chunk_threshold: int = 0,
+                chunk_pages: int = DEFAULT_CHUNK_PAGES, chunk_workers: int = 1, max_rss_mb: int = 0,
+                shard_dir: Path = None, shard_max_mb: int = md_shards.DEFAULT_SHARD_MB, strip_headers: bool = False,
+                dedup_file: Path = None, skip_duplicates: bool = False, raw_cache_dir: Path = None,
+                source_root: Path = None):
+    """
+    处理单个PDF文件（网页公告 .html 也走这里，转换为同样格式的 Markdown）
+    :param extract_tables: 为 True 时输出 Markdown 表格并另存 <文件名>.tables.json
+    :param scan_check_pages: 抽查前 N 页判断是否为扫描件，0 表示不检查
+    :param ocr_queue_file: 扫描件写入的OCR队列文件，默认 output_dir/ocr_queue.txt
+    :param chunk_threshold/chunk_pages/chunk_workers/max_rss_mb: 大文件分块提取参数，见 extract_pdf
+    :param shard_dir: 指定时结果追加写入该目录下的分片归档（见 md_shards.py），不生成散文件
+    :param strip_headers: 去掉跨页重复的页眉页脚
+    :param dedup_file: 指定时在该近似重复索引中检测（见 near_dup.py），副本的 frontmatter 带 duplicate_of
+    :param skip_duplicates: 副本只保存 frontmatter 和指向原件的说明，不保存正文和表格数据
+    :param raw_cache_dir: 指定时按PDF内容缓存逐页原始提取结果（见 raw_cache.py），内容未变的PDF不再解析
+    :param source_root: 下载目录，源文件不在当前工作目录下时按它计算相对路径（见 relative_source）
+    """
+    # 修复：转为绝对路径
+    pdf_path = pdf_path.resolve()
+    relative_path = relative_source(pdf_path, source_root)
     
     # 提取文本
     print(f"📄 处理: {pdf_path}")
-    text = extract_text_from_pdf(str(pdf_path))
+    try:
+        if storage.logical_path(pdf_path).suffix.lower() == ".html":
+            with PROFILER.stage("html.extract"):
+                text, tables = extract_html(pdf_path), []
+        else:
+            with PROFILER.stage("pdf.extract"):
+                text, tables = extract_pdf(str(pdf_path), extract_tables, scan_check_pages,
+                                           chunk_threshold, chunk_pages, chunk_workers, max_rss_mb, strip_headers,
+                                           get_raw_cache(raw_cache_dir) if raw_cache_dir else None)
+    except ScannedPDFError:
+        # 扫描件不在主流程中做完整解析，转入OCR队列单独处理
+        queue_file = ocr_queue_file or output_dir / OCR_QUEUE_FILE
+        # 不在工作目录下的文件记录绝对路径，处理队列时才能找到
+        enqueue_ocr(queue_file, relative_path if Path.cwd() / relative_path == pdf_path else pdf_path)
+        print(f"   🖼️ 扫描件（无文本层），已加入OCR队列: {queue_file}")
+        return False
     
     if not text.strip():
         print(f"   ⚠️ 警告: {pdf_path} 提取内容为空")
         return False
     
+    duplicate_of = check_duplicate(pdf_path, text, dedup_file, source_root) if dedup_file else None
+    if duplicate_of:
+        print(f"   🔁 与已处理公告近似重复: {duplicate_of}")
+        if skip_duplicates:
+            text, tables = DUPLICATE_STUB.format(duplicate_of), []
+    
     # 保存
-    if use_markdown:
-        content = convert_to_markdown(text, str(pdf_path), output_dir)
-        output_path = output_subdir / f"{pdf_path.stem}.md"
-    else:
-        content = text
-        output_path = output_subdir / f"{pdf_path.stem}.txt"
+    shard_writer = get_shard_writer(shard_dir, shard_max_mb) if shard_dir else None
+    output_path = save_output(pdf_path, text, output_dir, use_markdown, shard_writer, duplicate_of, source_root)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    # 表格单元格数据另存为 JSON，下游无需再次解析表格
+    if tables:
+        tables_path = output_path.with_name(f"{output_path.stem}.tables.json")
+        tables_json = json.dumps({"source": str(relative_path), "tables": tables}, ensure_ascii=False, indent=2)
+        if shard_writer is not None:
+            shard_writer.write(tables_path.relative_to(output_dir).as_posix(), tables_json)
+        else:
+            with open(tables_path, 'w', encoding='utf-8') as f:
+                f.write(tables_json)
+        print(f"   📊 表格数据: {tables_path}（{len(tables)} 个表格）")
     
-    print(f"   ✅ 已保存: {output_path}")
+    if shard_writer is not None:
+        print(f"   ✅ 已写入分片归档: {output_path.relative_to(output_dir).as_posix()}")
+    else:
+        print(f"   ✅ 已保存: {output_path}")
     return True
 
+def process_ocr_queue(queue_file: Path, output_dir: Path, backend, resolution: int = 300, shard_writer=None,
+                      strip_headers: bool = False, dedup_file: Path = None, skip_duplicates: bool = False,
+                      source_root: Path = None) -> tuple:
+    """
+    处理OCR队列中的扫描件，识别成功的从队列移除
+    dedup_file/skip_duplicates/source_root 同 process_pdf
+    :return: (成功数, 队列总数)
+    """
+    queue = load_ocr_queue(queue_file)
+    remaining = []
+    success = 0
+    for entry in queue:
+        pdf_path = Path(entry)
+        if not pdf_path.exists():
+            print(f"⚠️ 文件不存在，移出队列: {entry}")
+            continue
+        print(f"🖼️ OCR: {entry}")
+        with PROFILER.stage("pdf.ocr"):
+            text = ocr_pdf(str(pdf_path), backend, resolution, strip_headers)
+        if not text.strip():
+            print(f"   ⚠️ 警告: {entry} OCR结果为空，保留在队列中")
+            remaining.append(entry)
+            continue
+        duplicate_of = check_duplicate(pdf_path, text, dedup_file, source_root) if dedup_file else None
+        if duplicate_of:
+            print(f"   🔁 与已处理公告近似重复: {duplicate_of}")
+            if skip_duplicates:
+                text = DUPLICATE_STUB.format(duplicate_of)
+        output_path = save_output(pdf_path, text, output_dir, shard_writer=shard_writer, duplicate_of=duplicate_of,
+                                  source_root=source_root)
+        print(f"   ✅ 已保存: {output_path}")
+        success += 1
+
+    with open(queue_file, 'w', encoding='utf-8') as f:
+        f.write("".join(entry + "\n" for entry in remaining))
+    return success, len(queue)
+
+def convert_and_collect_profile(pdf_path: Path, convert) -> tuple:
+    """在工作进程中执行转换，并把本进程累计的阶段计时随结果交回主进程汇总"""
+    ok = convert(pdf_path)
+    return ok, PROFILER.drain()
+
+def update_index_stage(output_dir: Path, index_file: Path):
+    """全文索引阶段：增量更新 output_dir/markdown 的索引"""
+    with PROFILER.stage("index"):
+        stats = md_index.update_index(output_dir / "markdown", index_file)
+    print(f"🔍 索引更新: 新增 {stats['added']}，更新 {stats['updated']}，删除 {stats['removed']}，未变化 {stats['unchanged']}")
+
+def update_chunks_stage(output_dir: Path, chunk_dir: Path, max_chars: int):
+    """分块导出阶段：增量切分 output_dir/markdown，把新增/删除的块写入变更文件"""
+    with PROFILER.stage("chunks"):
+        try:
+            stats = md_chunks.update_chunks(output_dir / "markdown", chunk_dir, max_chars,
+                                            min(md_chunks.DEFAULT_MIN_CHARS, max_chars))
+        except ValueError as e:
+            print(f"❌ 分块导出失败: {e}")
+            return
+    print(f"🧩 分块导出: 新增 {stats['added']} 块，删除 {stats['removed']} 块，未变化 {stats['kept']} 块"
+          + (f"，变更文件: {stats['delta']}" if stats["delta"] else "，没有变化"))
+
+def parse_args(argv=None):
+    """解析命令行参数，argv 为 None 时读取 sys.argv（main_api_1118.py --watch 传入 --convert-options 的参数列表）"""
+    parser = argparse.ArgumentParser(
+        description="将 downloads/ 目录下的 PDF 和网页公告提取为 Markdown",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 转换全部PDF
+        python pdf2md.py
+
+        # 转换后增量更新全文索引
+        python pdf2md.py --index
+
+        # 表格感知模式：输出 Markdown 表格，并另存 .tables.json 单元格数据
+        python pdf2md.py --tables
+
+        # 4 个进程并行转换，单进程内存上限 1500MB，超过 300 页的文件每 50 页分块提取
+        python pdf2md.py --workers 4 --max-rss-mb 1500 --chunk-threshold 300 --chunk-pages 50
+
+        # 检测近似重复公告（更正后重新发布等），重复的只保存 frontmatter 和指向原件的说明
+        python pdf2md.py --skip-duplicates --index
+
+        # 转换后增量分块，只把新增/删除的文本块写入 processed/chunks/deltas/，下游只需向量化变化的块
+        python pdf2md.py --md-chunks
+
+        # 缓存逐页原始提取结果，之后调整 --strip-page-headers 等下游参数重新转换时不再解析PDF
+        python pdf2md.py --raw-cache
+
+        # 单独处理扫描件OCR队列（主流程只做检测和入队）
+        python pdf2md.py --process-ocr-queue --ocr-backend tesseract
+
+        # 转换结果写入分片归档（大量小文件时减少目录遍历和备份开销），需要时再还原为散文件
+        python pdf2md.py --shards
+        python md_shards.py export --output-dir processed
+
+        # 打印各阶段（提取/Markdown清理/写文件/索引）耗时，并为每个阶段保存 cProfile 数据
+        python pdf2md.py --profile cprofile --profile-dir profile
+        """
+    )
+    parser.add_argument(
+        "--downloads-dir",
+        type=str,
+        default="downloads",
+        help="PDF 所在目录 (默认: downloads)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="processed",
+        help="输出目录 (默认: processed)"
+    )
+    parser.add_argument(
+        "--skip-html",
+        action="store_true",
+        help="只转换PDF，跳过网页公告（.html）"
+    )
+    parser.add_argument(
+        "--tables",
+        action="store_true",
+        help="表格感知提取：把表格输出为 Markdown 表格，并另存 <文件名>.tables.json 单元格数据"
+    )
+    parser.add_argument(
+        "--strip-page-headers",
+        action="store_true",
+        help="删除跨页重复的页眉页脚：出现在 40%% 以上页面开头/结尾的重复行，如公司名称、报告标题、第 N 页（默认保留）"
+    )
+    parser.add_argument(
+        "--scan-check-pages",
+        type=int,
+        default=0,
+        help="抽查前 N 页判断是否为扫描件（超过半数页面只有图片、没有文本层），扫描件跳过完整解析并加入OCR队列 (默认: 0，不检查)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="并行转换的进程数 (默认: 1)"
+    )
+    parser.add_argument(
+        "--chunk-threshold",
+        type=int,
+        default=DEFAULT_CHUNK_THRESHOLD,
+        help=f"页数超过该值的PDF按页范围分块提取，0 表示不分块 (默认: {DEFAULT_CHUNK_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--chunk-pages",
+        type=int,
+        default=DEFAULT_CHUNK_PAGES,
+        help=f"分块提取时每块的页数 (默认: {DEFAULT_CHUNK_PAGES})"
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=1,
+        help="单个大文件分块提取使用的进程数，仅在 --workers 1 时生效 (默认: 1)"
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=int,
+        default=0,
+        help="单个工作进程的内存上限（MB），分块提取中超过上限后剩余页范围改在短命子进程中继续，0 表示不限制 (默认: 0)"
+    )
+    parser.add_argument(
+        "--process-ocr-queue",
+        action="store_true",
+        help="处理OCR队列（<output-dir>/ocr_queue.txt）中的扫描件，需配合 --ocr-backend"
+    )
+    parser.add_argument(
+        "--ocr-backend",
+        type=str,
+        default=None,
+        help="OCR后端：tesseract（需 pytesseract）或 module:function（接收页面图像，返回文本）"
+    )
+    parser.add_argument(
+        "--ocr-resolution",
+        type=int,
+        default=300,
+        help="OCR时页面渲染分辨率 DPI (默认: 300)"
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="转换完成后增量更新 Markdown 全文索引（见 md_index.py）"
+    )
+    parser.add_argument(
+        "--index-file",
+        type=str,
+        default="processed/index.sqlite",
+        help="全文索引数据库路径 (默认: processed/index.sqlite)"
+    )
+    parser.add_argument(
+        "--md-chunks",
+        action="store_true",
+        help="转换完成后把 Markdown 切分为文本块，增量导出新增/删除的块供下游向量化（见 md_chunks.py）"
+    )
+    parser.add_argument(
+        "--md-chunk-dir",
+        type=str,
+        default=None,
+        help="分块清单和变更文件目录 (默认: <output-dir>/chunks)"
+    )
+    parser.add_argument(
+        "--md-chunk-max-chars",
+        type=int,
+        default=md_chunks.DEFAULT_MAX_CHARS,
+        help=f"每个文本块的字符数上限 (默认: {md_chunks.DEFAULT_MAX_CHARS})"
+    )
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="把转换结果追加写入滚动分片归档（<output-dir>/shards/），不生成散文件；用 md_shards.py 读取或还原"
+    )
+    parser.add_argument(
+        "--shard-max-mb",
+        type=int,
+        default=md_shards.DEFAULT_SHARD_MB,
+        help=f"单个分片的大小上限（MB），写满后滚动到新分片 (默认: {md_shards.DEFAULT_SHARD_MB})"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="检测与已处理公告（同一股票代码）近似重复的公告，在 frontmatter 中标记 duplicate_of"
+    )
+    parser.add_argument(
+        "--skip-duplicates",
+        action="store_true",
+        help="近似重复的公告只保存 frontmatter 和指向原件的说明，不保存正文和表格数据（隐含 --dedup）"
+    )
+    parser.add_argument(
+        "--dedup-file",
+        type=str,
+        default=None,
+        help="近似重复索引路径 (默认: <output-dir>/near_dup.sqlite)"
+    )
+    parser.add_argument(
+        "--raw-cache",
+        action="store_true",
+        help="按PDF内容缓存逐页原始提取结果，调整下游参数后重新转换时内容未变的PDF不再解析（见 raw_cache.py）"
+    )
+    parser.add_argument(
+        "--raw-cache-dir",
+        type=str,
+        default=None,
+        help="原始提取缓存目录 (默认: <output-dir>/raw_cache)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="timing",
+        default=None,
+        choices=profiling.PROFILE_MODES,
+        help="打印各阶段墙钟/CPU耗时；cprofile 另存每个阶段的 .prof，sample 另存采样折叠栈 (默认: timing)"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=profiling.DEFAULT_PROFILE_DIR,
+        help=f"cprofile/sample 模式的输出目录 (默认: {profiling.DEFAULT_PROFILE_DIR})"
+    )
+    return parser.parse_args(argv)
+
+def conversion_settings(args) -> dict:
+    """由命令行参数得到 process_pdf 的转换参数（批量转换与 main_api_1118.py --watch 的即时转换共用）"""
+    output_dir = Path(args.output_dir)
+    dedup_file = None
+    if args.dedup or args.skip_duplicates:
+        dedup_file = Path(args.dedup_file) if args.dedup_file else output_dir / near_dup.DEFAULT_DEDUP_FILE.name
+    raw_cache_dir = None
+    if args.raw_cache:
+        raw_cache_dir = Path(args.raw_cache_dir) if args.raw_cache_dir else output_dir / raw_cache.DEFAULT_CACHE_DIR.name
+    return {
+        "output_dir": output_dir,
+        "use_markdown": True,
+        "extract_tables": args.tables,
+        "scan_check_pages": args.scan_check_pages,
+        "ocr_queue_file": output_dir / OCR_QUEUE_FILE,
+        "chunk_threshold": args.chunk_threshold,
+        "chunk_pages": args.chunk_pages,
+        # 文件级并行时工作进程不能再创建子进程，大文件分块改为在进程内顺序执行
+        "chunk_workers": args.chunk_workers if args.workers <= 1 else 1,
+        "max_rss_mb": args.max_rss_mb,
+        "shard_dir": output_dir / "shards" if args.shards else None,
+        "shard_max_mb": args.shard_max_mb,
+        "strip_headers": args.strip_page_headers,
+        "dedup_file": dedup_file,
+        "skip_duplicates": args.skip_duplicates,
+        "raw_cache_dir": raw_cache_dir,
+        "source_root": Path(args.downloads_dir),
+    }
+
 def main():
     """主函数"""
-    downloads_dir = Path("downloads")
-    output_dir = Path("processed")
+    args = parse_args()
+    if args.profile:
+        profiling.enable(args.profile, args.profile_dir)
+    start = time.perf_counter()
+    try:
+        run(args)
+    finally:
+        PROFILER.report(time.perf_counter() - start)
+
+def run(args):
+    """按命令行参数执行转换或OCR队列处理"""
+    downloads_dir = Path(args.downloads_dir)
+    settings = conversion_settings(args)
+    output_dir = settings["output_dir"]
+    ocr_queue_file = settings["ocr_queue_file"]
+    shard_dir = settings["shard_dir"]
+    dedup_file = settings["dedup_file"]
+    if shard_dir and args.index:
+        print("⚠️ 全文索引只支持散文件输出，--shards 模式下跳过 --index")
+        args.index = False
+    if shard_dir and args.md_chunks:
+        print("⚠️ 分块导出只支持散文件输出，--shards 模式下跳过 --md-chunks")
+        args.md_chunks = False
+    md_chunk_dir = Path(args.md_chunk_dir) if args.md_chunk_dir else output_dir / md_chunks.DEFAULT_CHUNK_DIR.name
+
+    # OCR队列模式：只处理扫描件
+    if args.process_ocr_queue:
+        if not args.ocr_backend:
+            print("❌ 处理OCR队列需要指定 --ocr-backend")
+            return
+        try:
+            backend = ocr_backends.load_backend(args.ocr_backend)
+        except (ValueError, ImportError) as e:
+            print(f"❌ 加载OCR后端失败: {e}")
+            return
+        shard_writer = get_shard_writer(shard_dir, args.shard_max_mb) if shard_dir else None
+        success, total = process_ocr_queue(ocr_queue_file, output_dir, backend, args.ocr_resolution, shard_writer,
+                                           args.strip_page_headers, dedup_file, args.skip_duplicates,
+                                           downloads_dir)
+        print(f"✅ OCR完成: {success}/{total} 个扫描件处理成功")
+        if args.index:
+            update_index_stage(output_dir, Path(args.index_file))
+        if args.md_chunks:
+            update_chunks_stage(output_dir, md_chunk_dir, args.md_chunk_max_chars)
+        return
     
     if not downloads_dir.exists():
-        print("❌ downloads 目录不存在")
+        print(f"❌ {downloads_dir} 目录不存在")
         return
     
     # 查找所有PDF文件
-    pdf_files = list(downloads_dir.rglob("*.pdf"))
+    with PROFILER.stage("pdf.discover"):
+        pdf_files = storage.find_files(downloads_dir, ".pdf")
+        if not args.skip_html:
+            pdf_files += storage.find_files(downloads_dir, ".html")
     
     if not pdf_files:
-        print("❌ 未找到PDF文件")
+        print("❌ 未找到PDF或网页公告文件")
         return
     
-    print(f"📁 找到 {len(pdf_files)} 个PDF文件")
+    print(f"📁 找到 {len(pdf_files)} 个文件（PDF与网页公告）")
     print("=" * 50)
     
     # 处理每个PDF
-    success = 0
-    for pdf_path in pdf_files:
-        if process_pdf(pdf_path, output_dir, use_markdown=True):
-            success += 1
+    convert = partial(process_pdf, **settings)
+    if args.workers > 1:
+        pool_kwargs = {"maxtasksperchild": WORKER_MAX_TASKS}
+        task = convert
+        if PROFILER.enabled:
+            # 工作进程只做阶段计时，计时结果随每个文件的转换结果返回
+            pool_kwargs.update(initializer=profiling.enable, initargs=("timing",))
+            task = partial(convert_and_collect_profile, convert=convert)
+        success = 0
+        with multiprocessing.Pool(args.workers, **pool_kwargs) as pool:
+            for result in pool.imap_unordered(task, pdf_files):
+                if PROFILER.enabled:
+                    result, stage_stats = result
+                    PROFILER.merge(stage_stats)
+                if result:
+                    success += 1
+    else:
+        success = sum(1 for pdf_path in pdf_files if convert(pdf_path))
     
     print("=" * 50)
     print(f"✅ 完成: {success}/{len(pdf_files)} 个文件处理成功")
-    print(f"📂 输出目录: {output_dir}/(markdown|text)/")
+    print(f"📂 输出目录: {shard_dir}/" if shard_dir else f"📂 输出目录: {output_dir}/(markdown|text)/")
+    queued = len(load_ocr_queue(ocr_queue_file))
+    if queued:
+        print(f"🖼️ OCR队列中有 {queued} 个扫描件，可运行 python pdf2md.py --process-ocr-queue --ocr-backend <后端> 处理")
+
+    # 全文索引阶段
+    if args.index:
+        update_index_stage(output_dir, Path(args.index_file))
+
+    # 分块导出阶段
+    if args.md_chunks:
+        update_chunks_stage(output_dir, md_chunk_dir, args.md_chunk_max_chars)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+分阶段性能剖析（--profile）
+  - timing：记录每个阶段的调用次数、墙钟时间和CPU时间，结束时打印汇总表
+  - cprofile：在计时之外为每个阶段收集 cProfile 数据，保存为 <profile-dir>/<阶段>.prof，
+    可用 python -m pstats 或 snakeviz 查看
+  - sample：后台线程按固定间隔对主线程调用栈采样，按阶段保存为折叠栈文本 <profile-dir>/<阶段>.folded，
+    可直接导入 speedscope 或用 flamegraph.pl 生成火焰图
+未开启时 stage() 直接返回共享的空上下文，不做任何计时
+"""
+import sys
+import json
+import time
+import cProfile
+import threading
+import contextlib
+from pathlib import Path
+from collections import Counter
+
+PROFILE_MODES = ("timing", "cprofile", "sample")
+DEFAULT_PROFILE_DIR = "profile"
+SAMPLE_INTERVAL = 0.005
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class StageProfiler:
+    """按阶段名称累计耗时；阶段可以嵌套，外层阶段的时间包含内层"""
+
+    def __init__(self):
+        self.enabled = False
+        self.mode = "timing"
+        self.profile_dir = Path(DEFAULT_PROFILE_DIR)
+        # 阶段名称 -> [调用次数, 墙钟时间, CPU时间]
+        self.stats = {}
+        self.profiles = {}
+        self.samples = {}
+        self._stack = []
+        self._profiling = False
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+
+    def configure(self, mode="timing", profile_dir=DEFAULT_PROFILE_DIR):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的剖析模式: {mode}（支持 {', '.join(PROFILE_MODES)}）")
+        self.enabled = True
+        self.mode = mode
+        self.profile_dir = Path(profile_dir)
+        # fork 出的工作进程会继承主进程已有的计时，开启时清空，避免重复累计
+        self.stats = {}
+        if mode == "sample" and self._sampler is None:
+            self._start_sampler()
+
+    def stage(self, name):
+        """返回一个阶段的上下文管理器：with PROFILER.stage("pdf.extract"): ..."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._stage(name)
+
+    @contextlib.contextmanager
+    def _stage(self, name):
+        # cProfile 同一时间只能有一个在运行，嵌套阶段的函数计入外层阶段的 .prof
+        profile = None
+        if self.mode == "cprofile" and not self._profiling:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            profile.enable()
+        self._stack.append(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._stack.pop()
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+
+    def _start_sampler(self):
+        main_id = threading.main_thread().ident
+
+        def run():
+            while not self._sampler_stop.wait(SAMPLE_INTERVAL):
+                current = self._stack[-1:]
+                if not current:
+                    continue
+                stage_name = current[0]
+                frame = sys._current_frames().get(main_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                counter = self.samples.setdefault(stage_name, Counter())
+                counter[";".join(reversed(stack))] += 1
+
+        self._sampler = threading.Thread(target=run, name="stage-sampler", daemon=True)
+        self._sampler.start()
+
+    def drain(self) -> dict:
+        """取出并清空当前累计的阶段计时（工作进程把结果交回主进程时使用）"""
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def merge(self, stats: dict):
+        """合并其他进程的阶段计时"""
+        for name, (count, wall, cpu) in stats.items():
+            entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += wall
+            entry[2] += cpu
+
+    def report(self, total_wall: float = None):
+        """打印阶段汇总，并按模式保存 .prof / .folded 文件"""
+        if not self.enabled:
+            return
+        if self._sampler is not None:
+            self._sampler_stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+        print("\n⏱️ 阶段耗时（外层阶段包含内层，多进程时为各进程累计）")
+        print(f"   {'阶段':<20} {'次数':>8} {'墙钟(秒)':>10} {'CPU(秒)':>10} {'CPU占比':>8}")
+        for name, (count, wall, cpu) in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            cpu_ratio = f"{cpu / wall:.0%}" if wall > 0 else "-"
+            print(f"   {name:<20} {count:>8} {wall:>10.3f} {cpu:>10.3f} {cpu_ratio:>8}")
+        if total_wall is not None:
+            print(f"   总墙钟时间: {total_wall:.3f} 秒")
+
+        if self.mode == "timing":
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.profile_dir / "stages.json", "w", encoding="utf-8") as f:
+            json.dump({name: {"count": count, "wall": wall, "cpu": cpu}
+                       for name, (count, wall, cpu) in self.stats.items()}, f, ensure_ascii=False, indent=2)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(str(self.profile_dir / f"{name}.prof"))
+        for name, counter in self.samples.items():
+            with open(self.profile_dir / f"{name}.folded", "w", encoding="utf-8") as f:
+                f.write("".join(f"{stack} {count}\n" for stack, count in counter.most_common()))
+        print(f"   剖析数据已保存到: {self.profile_dir}/")
+
+PROFILER = StageProfiler()
+
+def enable(mode="timing", profile_dir=DEFAULT_PROFILE_DIR):
+    """开启全局剖析器（也用作多进程池的 initializer）"""
+    PROFILER.configure(mode, profile_dir)
@@ -0,0 +1,85 @@
+"""
+PDF原始提取结果缓存（pdf2md.py --raw-cache）
+PDF解析是转换中最耗时的部分，而调整页眉页脚过滤、Markdown格式、分片输出等下游参数后重新转换时，
+逐页提取出的原始文本并不会变化：
+  - 以PDF内容（压缩保存的按解压后内容）的 SHA-256 为键，缓存逐页原始文本（未去页眉页脚）和表格单元格数据
+  - 纯文本模式与表格感知模式的提取结果不同，分别缓存
+  - 缓存文件为 <缓存目录>/<摘要前两位>/<摘要>.<模式>.v<版本>.json.zst（未安装 zstandard 时为 .json.gz），
+    先写临时文件再替换，多进程并行写同一条目也不会损坏
+  - 记录写入时的 pdfplumber 版本，版本变化后旧条目视为未命中
+内容相同的PDF（重复下载、改名移动）同样命中缓存；清理缓存直接删除缓存目录即可
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import storage
+
+DEFAULT_CACHE_DIR = Path("processed/raw_cache")
+# 缓存格式变化时递增，旧条目自动失效
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class RawExtractionCache:
+    """按PDF内容摘要缓存逐页原始提取结果"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, extractor_version: str = ""):
+        """
+        :param cache_dir: 缓存目录
+        :param extractor_version: 提取器版本（pdfplumber.__version__），与条目记录的不一致时视为未命中
+        """
+        self.cache_dir = Path(cache_dir)
+        self.extractor_version = extractor_version
+        self.compression = "zstd" if storage.zstandard is not None else "gzip"
+
+    @staticmethod
+    def content_hash(pdf_path) -> str:
+        """PDF内容的 SHA-256（压缩保存的文件按解压后的内容计算）"""
+        digest = hashlib.sha256()
+        with storage.open_read(pdf_path) as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, digest: str, variant: str) -> Path:
+        name = f"{digest}.{variant}.v{CACHE_VERSION}.json"
+        return Path(storage.stored_path(self.cache_dir / digest[:2] / name, self.compression))
+
+    def get(self, digest: str, variant: str):
+        """
+        读取缓存条目，未命中时返回 None
+        :param variant: "text"（纯文本模式）或 "tables"（表格感知模式）
+        :return: {"pages": [各页文本], "tables": [表格数据]}
+        """
+        path = self._entry_path(digest, variant)
+        try:
+            entry = json.loads(storage.read_bytes(path).decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f"⚠️ 原始提取缓存条目损坏，重新提取: {path} - {e}")
+            return None
+        if entry.get("extractor_version") != self.extractor_version:
+            return None
+        return entry
+
+    def put(self, digest: str, variant: str, pages: list, tables: list):
+        """写入缓存条目，写入失败只提示不中断转换"""
+        path = self._entry_path(digest, variant)
+        entry = {"extractor_version": self.extractor_version, "pages": pages, "tables": tables}
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with storage.open_write(tmp_path, self.compression) as f:
+                f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 写入原始提取缓存失败: {path} - {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
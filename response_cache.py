@@ -0,0 +1,144 @@
+"""
+公告列表接口的本地响应缓存
+按规范化后的请求参数做键，把响应 JSON 保存到磁盘：
+  - seDate 截止日期早于今天的历史窗口结果不会再变化，公告列表非空的响应视为永久有效
+  - 包含今天（或不限日期）的窗口，以及空列表、限流或出错时的响应只在 TTL 内有效，不会让以后的运行一直读到坏结果
+缓存总大小超过上限时按最近使用时间（LRU）淘汰
+"""
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from datetime import date, datetime, timezone
+
+class ResponseCache:
+    """磁盘响应缓存，文件为 <cache_dir>/<键前两位>/<键>.json"""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, ttl=600):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总大小上限（字节）
+        :param ttl: 包含今天的日期窗口以及不完整响应（见 is_complete）的有效期（秒）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 键 -> (文件大小, 最近使用时间)，启动时扫描一次，之后在内存中维护
+        self.entries = {}
+        for path in self.cache_dir.glob("*/*.json"):
+            stat = path.stat()
+            self.entries[path.stem] = (stat.st_size, stat.st_mtime)
+        self.total_bytes = sum(size for size, _ in self.entries.values())
+
+    @staticmethod
+    def normalize_params(params):
+        """规范化请求参数：值统一为去空白的字符串，stock 中的多只股票按代码排序"""
+        normalized = {key: str(value).strip() for key, value in params.items()}
+        if normalized.get("stock"):
+            normalized["stock"] = ";".join(sorted(normalized["stock"].split(";")))
+        return normalized
+
+    def make_key(self, params):
+        payload = json.dumps(self.normalize_params(params), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_immutable(params):
+        """seDate 截止日期早于今天（UTC，与 fetch_announcements 一致）时结果不会再变化；日期无法解析的不算"""
+        se_date = str(params.get("seDate", "")).strip()
+        if "~" not in se_date:
+            return False
+        try:
+            end_date = date.fromisoformat(se_date.split("~", 1)[1].strip())
+        except ValueError:
+            return False
+        return end_date < datetime.now(timezone.utc).date()
+
+    @staticmethod
+    def is_complete(payload):
+        """响应是否为正常返回的非空公告列表；空列表、限流或出错时的响应体不永久缓存"""
+        if not isinstance(payload, dict):
+            return False
+        announcements = payload.get("announcements")
+        return isinstance(announcements, list) and len(announcements) > 0
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, params):
+        """命中且未过期时返回缓存的响应 JSON，否则返回 None"""
+        key = self.make_key(params)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        immutable = entry.get("immutable") and self.is_complete(entry.get("payload"))
+        if not immutable and time.time() - entry.get("fetched_at", 0) > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        # 更新最近使用时间，供 LRU 淘汰使用
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self.entries[key] = (self.entries[key][0], now)
+        self.hits += 1
+        return entry["payload"]
+
+    def put(self, params, payload):
+        """写入缓存，必要时淘汰最久未使用的条目"""
+        key = self.make_key(params)
+        entry = {
+            "params": self.normalize_params(params),
+            "fetched_at": time.time(),
+            "immutable": self.is_immutable(params) and self.is_complete(payload),
+            "payload": payload,
+        }
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 写入响应缓存失败: {e}")
+            return
+
+        if key in self.entries:
+            self.total_bytes -= self.entries[key][0]
+        size = path.stat().st_size
+        self.entries[key] = (size, time.time())
+        self.total_bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        size, _ = self.entries.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda kv: kv[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
@@ -37,10 +37,22 @@ while [[ $# -gt 0 ]]; do
             SAVE_DIR="$2"
             shift 2
             ;;
+        --category)
+            CATEGORY="$2"
+            shift 2
+            ;;
+        --searchkey)
+            SEARCHKEY="$2"
+            shift 2
+            ;;
         --no-convert)
             NO_CONVERT=true
             shift
             ;;
+        --watch)
+            WATCH=true
+            shift
+            ;;
         *)
             echo "未知参数: $1"
             exit 1
@@ -64,6 +76,24 @@ if [ -n "$DAYS" ]; then
     CMD="$CMD --days $DAYS"
 fi
 
+if [ -n "$CATEGORY" ]; then
+    CMD="$CMD --category $CATEGORY"
+fi
+
+if [ -n "$SEARCHKEY" ]; then
+    CMD="$CMD --searchkey $SEARCHKEY"
+fi
+
+# 常驻模式：爬虫进程内直接完成下载和转换，不再执行步骤2
+if [ "$WATCH" = "true" ]; then
+    CMD="$CMD --watch"
+    if [ "$NO_CONVERT" = "true" ]; then
+        CMD="$CMD --no-convert"
+    fi
+    echo "执行: $CMD"
+    exec $CMD
+fi
+
 echo "执行: $CMD"
 $CMD
 
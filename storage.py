@@ -0,0 +1,191 @@
+"""
+下载文件的压缩存储
+--compress gzip|zstd 时PDF/HTML保存为 <文件名>.pdf.gz / <文件名>.pdf.zst，写入时流式压缩；
+pdf2md.py 等读取时在内存中解压，不写临时文件
+依赖 zstandard（可选）：pip install zstandard
+
+评估压缩算法和级别的CPU开销与节省空间：
+    python storage.py --dir downloads --sample 100
+"""
+import io
+import gzip
+import time
+import argparse
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，仅 zstd 压缩时需要
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+BENCH_LEVELS = {"gzip": [1, 6, 9], "zstd": [1, 3, 9, 19]}
+
+def check_compression(compression):
+    """检查压缩算法是否可用，不可用时抛出 ValueError / RuntimeError"""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"不支持的压缩算法: {compression}（支持 {', '.join(COMPRESSION_SUFFIXES)}）")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstd 压缩需要 zstandard，请先执行 pip install zstandard")
+
+def stored_path(path, compression=None) -> str:
+    """返回文件实际保存的路径：压缩时追加 .gz / .zst 后缀"""
+    return str(path) + COMPRESSION_SUFFIXES[compression] if compression else str(path)
+
+def logical_path(path) -> Path:
+    """去掉压缩后缀后的路径，如 xxx.pdf.gz -> xxx.pdf，用于取文件名、类型等"""
+    path = Path(path)
+    if path.suffix in COMPRESSION_SUFFIXES.values():
+        return path.with_suffix("")
+    return path
+
+def find_files(root, ext: str) -> list:
+    """在 root 下递归查找扩展名为 ext（如 .pdf）的文件，包括压缩保存的 .pdf.gz / .pdf.zst"""
+    root = Path(root)
+    files = list(root.rglob(f"*{ext}"))
+    for suffix in COMPRESSION_SUFFIXES.values():
+        files.extend(root.rglob(f"*{ext}{suffix}"))
+    return sorted(files)
+
+class _ZstdWriter:
+    """zstd 流式写入，关闭时同时关闭底层文件"""
+
+    def __init__(self, path, level):
+        self.file = open(path, "wb")
+        self.writer = zstandard.ZstdCompressor(level=level).stream_writer(self.file)
+
+    def write(self, data):
+        return self.writer.write(data)
+
+    def close(self):
+        self.writer.flush(zstandard.FLUSH_FRAME)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def open_write(path, compression=None, level=None):
+    """
+    以二进制写方式打开文件，compression 为 gzip/zstd 时边写边压缩
+    :param path: 实际保存路径（见 stored_path）
+    :param level: 压缩级别，默认 gzip 6、zstd 3
+    """
+    if not compression:
+        return open(path, "wb")
+    check_compression(compression)
+    level = level if level is not None else DEFAULT_LEVELS[compression]
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=level)
+    return _ZstdWriter(path, level)
+
+def read_bytes(path) -> bytes:
+    """读取文件内容，压缩保存的文件在内存中解压"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 文件需要 zstandard，请先执行 pip install zstandard")
+        chunks = []
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            while True:
+                chunk = reader.read(1024 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b"".join(chunks)
+    with open(path, "rb") as f:
+        return f.read()
+
+def open_read(path):
+    """以二进制读方式打开文件，压缩保存的文件边读边解压"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 文件需要 zstandard，请先执行 pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+def open_source(path):
+    """供 pdfplumber.open 使用：未压缩时返回路径本身，压缩时返回内存中解压后的 BytesIO"""
+    if Path(path).suffix in COMPRESSION_SUFFIXES.values():
+        return io.BytesIO(read_bytes(path))
+    return path
+
+def benchmark(files: list) -> list:
+    """
+    对样本文件逐一测试各算法/级别
+    :return: [(算法, 级别, 原始字节, 压缩后字节, 压缩CPU秒, 解压CPU秒), ...]
+    """
+    blobs = [read_bytes(path) for path in files]
+    original = sum(len(blob) for blob in blobs)
+    results = []
+    for compression, levels in BENCH_LEVELS.items():
+        if compression == "zstd" and zstandard is None:
+            continue
+        for level in levels:
+            start = time.process_time()
+            if compression == "gzip":
+                compressed = [gzip.compress(blob, compresslevel=level) for blob in blobs]
+            else:
+                compressor = zstandard.ZstdCompressor(level=level)
+                compressed = [compressor.compress(blob) for blob in blobs]
+            compress_cpu = time.process_time() - start
+
+            start = time.process_time()
+            if compression == "gzip":
+                for blob in compressed:
+                    gzip.decompress(blob)
+            else:
+                decompressor = zstandard.ZstdDecompressor()
+                for blob in compressed:
+                    decompressor.decompress(blob)
+            decompress_cpu = time.process_time() - start
+            results.append((compression, level, original, sum(len(blob) for blob in compressed),
+                            compress_cpu, decompress_cpu))
+    return results
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="评估下载文件在不同压缩算法/级别下的CPU开销与节省空间",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+    使用示例:
+        # 从 downloads/ 中各取最多 100 个PDF和HTML做样本
+        python storage.py --dir downloads --sample 100
+        """
+    )
+    parser.add_argument("--dir", type=str, default="downloads", help="样本目录 (默认: downloads)")
+    parser.add_argument("--sample", type=int, default=100, help="每种文件类型最多取多少个样本 (默认: 100)")
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    for ext in (".pdf", ".html"):
+        files = find_files(args.dir, ext)[:args.sample]
+        if not files:
+            continue
+        print(f"\n📊 {ext} 样本 {len(files)} 个")
+        print(f"   {'算法':<6} {'级别':>4} {'压缩率':>8} {'节省(MB)':>10} {'压缩MB/s':>10} {'解压MB/s':>10}")
+        for compression, level, original, compressed, compress_cpu, decompress_cpu in benchmark(files):
+            original_mb = original / 1024 / 1024
+            saved_mb = (original - compressed) / 1024 / 1024
+            compress_speed = original_mb / compress_cpu if compress_cpu > 0 else float("inf")
+            decompress_speed = original_mb / decompress_cpu if decompress_cpu > 0 else float("inf")
+            print(f"   {compression:<6} {level:>4} {compressed / original:>8.1%} {saved_mb:>10.2f} "
+                  f"{compress_speed:>10.1f} {decompress_speed:>10.1f}")
+    if zstandard is None:
+        print("\n(未安装 zstandard，仅测试 gzip)")
+
+if __name__ == "__main__":
+    main()
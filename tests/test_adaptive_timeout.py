@@ -0,0 +1,132 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from adaptive_timeout import ConnectTimingAdapter, LatencyTracker, hedged_get, read_content
+
+URL = "https://static.example.com/finalpage/a.PDF"
+
+
+def test_timeouts_fall_back_to_random_until_enough_samples():
+    tracker = LatencyTracker(min_samples=3)
+    timeout = tracker.timeouts(URL, 8, 12)
+    assert isinstance(timeout, float) and 8 <= timeout <= 12
+    tracker.enabled = False
+    for _ in range(3):
+        tracker.record(URL, 1.0, 0.5)
+    assert isinstance(tracker.timeouts(URL, 8, 12), float)
+
+
+def test_read_timeout_follows_headers_and_chunk_gaps_not_total_time():
+    tracker = LatencyTracker(min_samples=3, read_factor=3.0, min_timeout=0.1)
+    for _ in range(3):
+        # 大文件完整耗时很长，但每次读取的等待都很短
+        tracker.record(URL, 30.0, headers_seconds=0.2, gap_seconds=0.5)
+    connect, read = tracker.timeouts(URL, 8, 12)
+    assert read == pytest.approx(1.5)
+    # 还没有连接样本时连接超时取上限
+    assert connect == 12
+    assert tracker.hedge_delay(URL) == 30.0
+
+
+def test_connect_timeout_follows_connect_samples():
+    tracker = LatencyTracker(min_samples=3, connect_factor=3.0, min_timeout=0.1)
+    for _ in range(3):
+        tracker.record_connect("static.example.com", 0.1)
+    connect, read = tracker.timeouts(URL, 8, 12)
+    assert connect == pytest.approx(0.3)
+    assert read == 12
+
+
+def test_timeout_only_records_the_phase_that_timed_out():
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record_timeout(URL, (2.0, 5.0))
+    assert tracker.percentile(URL, 95, "read") == 5.0
+    assert tracker.percentile(URL, 95, "connect") is None
+    assert tracker.percentile(URL, 95) is None
+
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record_timeout(URL, (2.0, 5.0), connect=True)
+    assert tracker.percentile(URL, 95, "connect") == 2.0
+    assert tracker.percentile(URL, 95, "read") is None
+
+
+class FakeResponse:
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_content_measures_largest_gap():
+    resp = FakeResponse([b"ab", b"cd", b"ef"], 0.02)
+    content, gap = read_content(resp)
+    assert content == b"abcdef" and resp.closed
+    assert 0.015 <= gap < 0.5
+
+    cancelled = threading.Event()
+    cancelled.set()
+    assert read_content(FakeResponse([b"ab"], 0), cancelled=cancelled)[0] is None
+
+
+@pytest.fixture
+def server():
+    """本地 HTTP 服务器：/slow 先发一半正文再停顿，其余立即返回"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = b"%PDF-1.4 " + b"x" * 1000
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:500])
+            self.wfile.flush()
+            if self.path == "/slow" and not Handler.served_slow:
+                Handler.served_slow = True
+                time.sleep(1.0)
+            self.wfile.write(body[500:])
+
+        def log_message(self, *args):
+            pass
+
+    Handler.served_slow = False
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_adapter_records_new_connections_only(server):
+    tracker = LatencyTracker(min_samples=1)
+    session = requests.Session()
+    session.mount("http://", ConnectTimingAdapter(tracker))
+    for _ in range(3):
+        session.get(server + "/fast", timeout=5).content
+    # 连接池复用连接，只建立一次连接
+    assert len(tracker.samples["connect"]["127.0.0.1"]) == 1
+    assert tracker.percentile(server + "/fast", 95, "connect") < 1.0
+
+
+def test_hedged_get_returns_first_finished(server):
+    tracker = LatencyTracker(min_samples=1)
+    session = requests.Session()
+    start = time.monotonic()
+    resp, content = hedged_get(session, server + "/slow", 5, hedge_after=0.1, tracker=tracker)
+    assert content.startswith(b"%PDF") and len(content) == 1009
+    assert time.monotonic() - start < 0.9
+    assert tracker.hedges == 1 and tracker.hedge_wins == 1
+    assert tracker.percentile(server + "/slow", 95, "read") < 0.9
@@ -0,0 +1,89 @@
+import importlib
+import json
+from pathlib import Path
+
+import pytest
+
+import id_set
+from adaptive_timeout import ConnectTimingAdapter
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def crawl_jobs(monkeypatch):
+    """main_api_1118 导入时按相对路径读取 stockcodes/stock_orgids.json"""
+    monkeypatch.chdir(REPO_ROOT)
+    return importlib.import_module("crawl_jobs")
+
+
+def write_jobs(tmp_path, *job_args):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({"jobs": [{"args": args} for args in job_args]}), encoding="utf-8")
+    return path
+
+
+def test_load_jobs_rejects_process_options_and_bad_compression(crawl_jobs, tmp_path):
+    name, args = crawl_jobs.load_jobs(write_jobs(tmp_path, {"days": 1, "compress": "gzip"}))[0]
+    assert name == "job1" and args.compress == "gzip"
+    with pytest.raises(ValueError, match="no-adaptive-timeout"):
+        crawl_jobs.load_jobs(write_jobs(tmp_path, {"days": 1}, {"no-adaptive-timeout": True}))
+    with pytest.raises(ValueError, match="job2"):
+        crawl_jobs.load_jobs(write_jobs(tmp_path, {"days": 1}, {"compress": "lz4"}))
+
+
+def test_budgeted_session_records_connect_time(crawl_jobs):
+    session = crawl_jobs.BudgetedSession(crawl_jobs.RateBudget(), pool_size=4)
+    adapter = session.get_adapter("https://www.cninfo.com.cn/")
+    assert isinstance(adapter, ConnectTimingAdapter) and adapter.tracker is crawl_jobs.crawler.LATENCY
+
+
+def test_ledger_union_is_merged_on_disk(crawl_jobs, tmp_path):
+    crawler = crawl_jobs.crawler
+    ledger_dir, first, second = tmp_path / "ledger", tmp_path / "a", tmp_path / "b"
+    for path in (ledger_dir, first, second):
+        path.mkdir()
+    ids = crawler.load_downloaded_ids(ledger_dir)
+    ids.update(["5", "1"])
+    ids.save()
+    ids.add("9")
+    ids.append_journal()
+    ids.close()
+    other = crawler.load_downloaded_ids(first)
+    other.update(["3", "5", "url-id"])
+    other.save()
+    other.close()
+    # 只有旧版 JSON 的目录在加载时迁移
+    (second / id_set.LEGACY_FILE).write_text(json.dumps({"downloaded_ids": ["7", "1"]}), encoding="utf-8")
+
+    id_sets = [crawler.load_downloaded_ids(path) for path in (ledger_dir, first, second)]
+    path = ledger_dir / id_set.ID_FILE
+    assert id_set.write_union(id_sets, path) == 6
+    assert not Path(str(path) + id_set.JOURNAL_SUFFIX).exists()
+
+    merged = crawler.load_downloaded_ids(ledger_dir)
+    assert sorted(merged) == ["1", "3", "5", "7", "9", "url-id"]
+    # 并集全部在磁盘数组中，内存中的新增部分和待写日志为空
+    assert not merged.added and not merged.unjournaled
+
+
+def test_scheduler_is_closed_when_job_fails(crawl_jobs, tmp_path, monkeypatch):
+    crawler = crawl_jobs.crawler
+    closed = []
+
+    class Scheduler(crawl_jobs.DownloadScheduler):
+        def close(self):
+            closed.append(True)
+            super().close()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("列表请求失败")
+        yield
+
+    monkeypatch.setattr(crawl_jobs, "DownloadScheduler", Scheduler)
+    monkeypatch.setattr(crawler, "load_stock_codes", lambda args: [])
+    monkeypatch.setattr(crawler, "iter_announcements", fail)
+    _, args = crawl_jobs.load_jobs(write_jobs(tmp_path, {"save-dir": str(tmp_path / "dl"), "no-cache": True}))[0]
+    with pytest.raises(RuntimeError):
+        crawl_jobs.run_job("job1", args, crawl_jobs.SharedLedger(id_set.CompactIdSet()))
+    assert closed
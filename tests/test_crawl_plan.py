@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+from crawl_plan import append_history, format_duration, list_requests_for, load_throughput
+
+
+def run_stats(list_requests=10, list_seconds=5.0, pdf=4, pdf_bytes=4_000_000, pdf_seconds=2.0, html=2, html_seconds=1.0):
+    return SimpleNamespace(list_requests=list_requests, list_seconds=list_seconds, success_pdf=pdf,
+                           pdf_bytes=pdf_bytes, pdf_seconds=pdf_seconds, success_html=html, html_seconds=html_seconds)
+
+
+def test_list_requests_for():
+    assert list_requests_for(45, 1000, 30) == 2
+    # 最后一页恰好满页时还要请求一个空页才停止
+    assert list_requests_for(60, 1000, 30) == 3
+    # 受上限截断时取满即停
+    assert list_requests_for(100, 60, 30) == 2
+    assert list_requests_for(60, 60, 30) == 2
+    # 总数为 0 仍请求第 1 页；已达上限时不请求
+    assert list_requests_for(0, 1000, 30) == 1
+    assert list_requests_for(45, 0, 30) == 0
+
+
+def test_throughput_from_recent_runs(tmp_path):
+    path = tmp_path / ".run_history.jsonl"
+    assert load_throughput(path) == {"runs": 0, "list_seconds_per_request": None,
+                                     "pdf_bytes_per_second": None, "html_seconds_per_item": None}
+    append_history(path, run_stats(list_seconds=100.0))
+    append_history(path, run_stats())
+    append_history(path, run_stats(list_requests=30, list_seconds=45.0, pdf_bytes=8_000_000))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("不完整的行\n")
+    assert json.loads(path.read_text(encoding="utf-8").splitlines()[0])["pdf_downloads"] == 4
+
+    # 只取最近 2 次，损坏的行跳过
+    throughput = load_throughput(path, runs=2)
+    assert throughput["runs"] == 2
+    assert throughput["list_seconds_per_request"] == 50.0 / 40
+    assert throughput["pdf_bytes_per_second"] == 12_000_000 / 4.0
+    assert throughput["html_seconds_per_item"] == 2.0 / 4
+
+
+def test_throughput_without_downloads(tmp_path):
+    path = tmp_path / ".run_history.jsonl"
+    append_history(path, run_stats(pdf=0, pdf_bytes=0, pdf_seconds=0.0, html=0, html_seconds=0.0))
+    throughput = load_throughput(path)
+    assert throughput["list_seconds_per_request"] == 0.5
+    assert throughput["pdf_bytes_per_second"] is None and throughput["html_seconds_per_item"] is None
+
+
+def test_format_duration():
+    assert format_duration(42.4) == "42秒"
+    assert format_duration(125) == "2分5秒"
+    assert format_duration(3 * 3600 + 61) == "3小时1分"
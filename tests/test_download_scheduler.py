@@ -0,0 +1,125 @@
+from collections import namedtuple
+
+import pytest
+
+from download_scheduler import (
+    DownloadScheduler, PriorityPolicy, load_deferred, parse_keyword_weights, save_deferred,
+)
+
+# 与 main_api_1118.Announcement 字段一致
+Announcement = namedtuple("Announcement", [
+    "announcement_id", "sec_code", "sec_name", "org_id", "title",
+    "announcement_time", "adjunct_url", "adjunct_size",
+])
+
+
+def make(announcement_id, title="公告", adjunct_size=0, adjunct_url=None, announcement_time="2024-01-10"):
+    if adjunct_url is None:
+        adjunct_url = f"finalpage/{announcement_id}.PDF"
+    return Announcement(announcement_id, "000001", "平安银行", "gssz0000001", title,
+                        announcement_time, adjunct_url, adjunct_size)
+
+
+def by_date(item):
+    return item.announcement_time
+
+
+def test_parse_keyword_weights():
+    assert parse_keyword_weights("问询函:10，董事会:3, 年报") == {"问询函": 10.0, "董事会": 3.0, "年报": 1.0}
+    assert parse_keyword_weights("") == {}
+    assert parse_keyword_weights(None) == {}
+    with pytest.raises(ValueError):
+        parse_keyword_weights("问询函:十")
+
+
+def test_policy_score_keywords_age_and_size():
+    policy = PriorityPolicy(age_weight=1.0, size_weight=0.5, keyword_weights={"问询函": 10}, today="2024-01-10")
+    assert policy.score(make("1", title="关于问询函的回复"), "2024-01-10") == 10
+    assert policy.score(make("2"), "2024-01-07") == -3
+    assert policy.score(make("3", adjunct_size=2048), "") == -1
+    # 未来日期和无法解析的日期不扣分
+    assert policy.score(make("4"), "2024-02-01") == 0
+    assert policy.score(make("5"), "2024/01/01") == 0
+
+
+def test_orders_by_score_then_group_then_insertion():
+    policy = PriorityPolicy(keyword_weights={"问询函": 10}, today="2024-01-10")
+    scheduler = DownloadScheduler(policy, by_date)
+    scheduler.push(make("html", adjunct_url="finalpage/a.html"), group=2)
+    scheduler.push(make("pdf1"), group=1)
+    scheduler.push(make("old", announcement_time="2024-01-01"), group=1)
+    scheduler.push(make("pdf2"), group=1)
+    scheduler.push(make("deferred"), group=0)
+    scheduler.push(make("hot", title="问询函", announcement_time="2024-01-01"), group=2)
+    assert [item.announcement_id for item in scheduler] == ["hot", "deferred", "pdf1", "pdf2", "html", "old"]
+
+
+def test_deferred_bonus_only_applies_with_policy():
+    policy = PriorityPolicy(today="2024-01-10")
+    scheduler = DownloadScheduler(policy, by_date)
+    scheduler.push(make("fresh"), group=1)
+    # 上次推迟的公告已早 5 天，加 10 分后仍排在当天公告前面；加 3 分则排在后面
+    scheduler.push(make("deferred", announcement_time="2024-01-05"), group=0, bonus=10)
+    scheduler.push(make("stale", announcement_time="2024-01-05"), group=0, bonus=3)
+    assert [item.announcement_id for item in scheduler] == ["deferred", "fresh", "stale"]
+
+    # 不打分时按分组出队，bonus 不影响顺序
+    scheduler = DownloadScheduler()
+    scheduler.push(make("pdf"), group=1, bonus=100)
+    scheduler.push(make("deferred"), group=0)
+    assert [item.announcement_id for item in scheduler] == ["deferred", "pdf"]
+
+
+def test_push_dedupes_by_id_then_url():
+    scheduler = DownloadScheduler()
+    assert scheduler.push(make("1"))
+    assert not scheduler.push(make("1", adjunct_url="other.PDF"))
+    assert scheduler.push(make("", adjunct_url="a.PDF"))
+    assert not scheduler.push(make("", adjunct_url="a.PDF"))
+    # 既没有ID也没有地址时不去重
+    assert scheduler.push(make("", adjunct_url=""))
+    assert scheduler.push(make("", adjunct_url=""))
+    assert len(scheduler) == 4
+
+
+def test_spool_mode_reads_records_back(tmp_path):
+    items = [make(str(i), title=f"公告{i}") for i in range(5)]
+    with DownloadScheduler(spool_dir=tmp_path, record_type=Announcement) as scheduler:
+        for item in items:
+            scheduler.push(item, group=1)
+        assert all(isinstance(ref, int) for _, _, _, ref in scheduler.heap)
+        assert list(scheduler) == items
+        assert list(scheduler.spooled()) == items
+    assert scheduler.spool is None
+
+
+def test_zero_deadline_defers_everything(tmp_path):
+    items = [make(str(i)) for i in range(3)]
+    for spool_dir in (None, tmp_path):
+        scheduler = DownloadScheduler(deadline=0, spool_dir=spool_dir, record_type=Announcement)
+        for item in items:
+            scheduler.push(item)
+        assert list(scheduler) == []
+        assert list(scheduler.iter_deferred()) == items
+        scheduler.close()
+
+
+def test_defers_files_that_do_not_fit():
+    scheduler = DownloadScheduler(deadline=10)
+    scheduler.push(make("big", adjunct_size=100 * 1024))
+    scheduler.push(make("small", adjunct_size=1024))
+    # 已实测 1MB/s
+    scheduler.record(make("done", adjunct_size=1024), 1.0)
+    assert [item.announcement_id for item in scheduler] == ["small"]
+    assert [item.announcement_id for item in scheduler.iter_deferred()] == ["big"]
+
+
+def test_save_and_load_deferred(tmp_path):
+    path = tmp_path / ".deferred.jsonl"
+    items = [make("1", title="第一"), make("2", adjunct_size=12)]
+    assert save_deferred(path, iter(items)) == 2
+    assert load_deferred(path, Announcement) == items
+
+    assert save_deferred(path, []) == 0
+    assert not path.exists()
+    assert load_deferred(path, Announcement) == []
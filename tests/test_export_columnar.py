@@ -0,0 +1,96 @@
+import importlib
+from collections import namedtuple
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+import export_columnar  # noqa: E402
+from export_columnar import ColumnarExporter, exchange_of, make_record, record_from_file  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class Announcement(namedtuple("Announcement", [
+    "announcement_id", "sec_code", "sec_name", "org_id", "title",
+    "announcement_time", "adjunct_url", "adjunct_size",
+])):
+    @property
+    def is_pdf(self):
+        return self.adjunct_url.lower().endswith(".pdf")
+
+
+def make_item(announcement_id, sec_code="000001", org_id="gssz0000001", url="finalpage/2024-03-01/1.PDF"):
+    return Announcement(announcement_id, sec_code, "平安银行", org_id, "年度报告", 1709251200000, url, 100)
+
+
+def test_exchange_of_uses_org_id_prefix_then_code():
+    assert exchange_of("000001", "gssz0000001") == "SZ"
+    assert exchange_of("600000", "gssh0600000") == "SH"
+    assert exchange_of("830799", "gfbj0830799") == "BJ"
+    # orgId 中间出现 sh/sz 等字样不影响判断
+    assert exchange_of("000001", "9900sh0001") == "SZ"
+    assert exchange_of("688001", "") == "SH"
+    assert exchange_of("920001", None) == "BJ"
+    assert exchange_of("", "") == ""
+
+
+def test_record_key_shared_by_crawl_and_backfill(tmp_path):
+    item = make_item("1")
+    pdf = tmp_path / "000001" / "000001_2024-03-01_年度报告.pdf.gz"
+    crawled = make_record(item, "2024-03-01", pdf)
+    backfilled = record_from_file(pdf)
+    assert crawled["exchange"] == backfilled["exchange"] == "SZ"
+    assert ColumnarExporter.record_key(crawled) == ColumnarExporter.record_key(backfilled)
+    assert ColumnarExporter.record_key(crawled).endswith("年度报告.pdf")
+    assert ColumnarExporter.record_key(make_record(item, "2024-03-01")) == "1"
+
+
+def test_exporter_partitions_and_skips_exported(tmp_path):
+    export_dir = tmp_path / "export"
+    with ColumnarExporter(export_dir, batch_size=2) as exporter:
+        assert exporter.add(make_record(make_item("1"), "2024-03-01", tmp_path / "a.pdf", "正文一"))
+        assert not exporter.add(make_record(make_item("1"), "2024-03-01", tmp_path / "a.pdf", "正文一"))
+        assert exporter.add(make_record(make_item("2", "600000", "gssh0600000"), "2024-03-02", tmp_path / "b.pdf"))
+        assert exporter.add(make_record(make_item("3"), "", tmp_path / "c.pdf"))
+    parts = sorted(p.relative_to(export_dir).parent.as_posix() for p in export_dir.rglob("*.parquet"))
+    assert parts == ["date=2024-03-01/exchange=SZ", "date=2024-03-02/exchange=SH", "date=unknown/exchange=SZ"]
+    table = pq.read_table(next((export_dir / "date=2024-03-01").rglob("*.parquet")))
+    assert table.column("text").to_pylist() == ["正文一"]
+
+    # 台账持久化，重新打开后不再重复追加
+    with ColumnarExporter(export_dir) as exporter:
+        assert not exporter.add(make_record(make_item("1"), "2024-03-01", tmp_path / "a.pdf"))
+        assert exporter.written_files == []
+
+
+def test_export_items_reuses_converted_markdown(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    crawler = importlib.import_module("main_api_1118")
+    import pdf2md
+
+    save_dir = tmp_path / "downloads"
+    convert_dir = tmp_path / "processed"
+    item = crawler.Announcement.from_item({
+        "announcementId": "1", "secCode": "000001", "secName": "平安银行", "orgId": "gssz0000001",
+        "announcementTitle": "年度报告", "announcementTime": 1709251200000,
+        "adjunctUrl": "finalpage/2024-03-01/1.PDF", "adjunctSize": 100,
+    })
+    pdf_path = Path(crawler.get_item_filepath(item, str(save_dir), "pdf"))
+    pdf_path.parent.mkdir(parents=True)
+    pdf_path.write_bytes(b"%PDF-1.4")
+    md_path = pdf2md.get_output_path(pdf_path, convert_dir, source_root=save_dir)
+    md_path.parent.mkdir(parents=True)
+    md_path.write_text("---\ntitle: x\n---\n\n# x\n\n已转换的正文\n", encoding="utf-8")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("已有转换结果时不应再解析PDF")
+    monkeypatch.setattr(pdf2md, "extract_pdf", fail)
+
+    export_dir = tmp_path / "export"
+    assert crawler.export_items([item], str(save_dir), export_dir, convert_dir=str(convert_dir)) == 1
+    table = pq.read_table(next(export_dir.rglob("*.parquet")))
+    assert table.column("text").to_pylist() == ["\n# x\n\n已转换的正文\n"]
+    assert export_columnar.LEDGER_FILE in {p.name for p in export_dir.iterdir()}
@@ -0,0 +1,75 @@
+import codecs
+
+import html2md
+from html2md import MarkdownHTMLParser, html_file_to_text, sniff_charset
+
+
+def render_table(rows):
+    return "\n".join("| " + " | ".join(row) + " |" for row in rows)
+
+
+def convert(html):
+    parser = MarkdownHTMLParser(render_table)
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def test_sniff_charset():
+    assert sniff_charset(codecs.BOM_UTF8 + b"<html>") == "utf-8-sig"
+    assert sniff_charset(b"<html>", "text/html; charset=GBK") == "gb18030"
+    assert sniff_charset(b'<meta http-equiv="Content-Type" content="text/html; charset=gb2312">') == "gb18030"
+    assert sniff_charset(b'<meta charset="utf-8">') == "utf-8"
+    # 未知编码忽略，继续按后面的规则判断
+    assert sniff_charset(b"<p>abc</p>", "text/html; charset=x-unknown") == "utf-8"
+    assert sniff_charset("<p>公告</p>".encode("gbk")) == html2md.FALLBACK_ENCODING
+    # 开头片段截断在多字节字符中间仍判为 UTF-8
+    assert sniff_charset("公告".encode("utf-8")[:-1]) == "utf-8"
+
+
+def test_skips_head_text_script_and_style():
+    text = convert(
+        "<html><head><title>标题栏</title><style>p {color: red}</style>"
+        "<script>var a = 1;</script></head>"
+        "<body><h2>关于召开股东大会的通知</h2><p>本公司董事会\n  决定召开会议。</p></body></html>"
+    )
+    assert text == "## 关于召开股东大会的通知\n\n本公司董事会 决定召开会议。\n"
+
+
+def test_missing_head_end_tag_keeps_body():
+    text = convert("<html><head><title>标题栏<body><p>正文内容</p></body></html>")
+    assert "正文内容" in text and "标题栏" not in text
+
+
+def test_lists_line_breaks_and_tables():
+    text = convert(
+        "<p>第一行<br>第二行</p><ul><li>甲</li><li>乙</li></ul>"
+        "<table><tr><th>项目</th><th>金额</th></tr><tr><td>营业<br>收入</td><td>100</td></tr>"
+        "<tr><td></td><td></td></tr></table>"
+    )
+    assert "第一行\n第二行" in text
+    assert "- 甲\n- 乙" in text
+    assert "| 项目 | 金额 |\n| 营业 收入 | 100 |" in text
+    assert "|  |  |" not in text
+
+
+def test_html_file_to_text_decodes_gbk(tmp_path, monkeypatch):
+    path = tmp_path / "notice.html"
+    body = "<p>" + "董事会决议公告。" * 50 + "</p>"
+    path.write_bytes(('<html><head><meta charset="gbk"></head><body>' + body + "</body></html>").encode("gbk"))
+    # 块边界落在多字节字符中间也能正确解码
+    monkeypatch.setattr(html2md, "READ_CHUNK", 7)
+    assert html_file_to_text(path, lambda rows: "") == "董事会决议公告。" * 50 + "\n"
+
+
+def test_tables_with_omitted_end_tags():
+    # 省略 </td>、</tr>：新单元格、新行和 </table> 结束上一个单元格和行
+    text = convert("<table><tr><td>a<td>b<tr><td>c<td>d</table><p>x</p>")
+    assert text == "| a | b |\n| c | d |\n\nx\n"
+    # 省略 <tr> 的单元格自成一行
+    assert convert("<table><td>a</td><td>b</td></table>") == "| a | b |\n"
+
+
+def test_nested_table_text_stays_in_outer_cell():
+    text = convert("<table><tr><td>外<table><tr><td>内</td></tr></table><td>右</td></tr></table>")
+    assert text == "| 外 内 | 右 |\n"
@@ -0,0 +1,113 @@
+import os
+
+import id_set
+from id_set import CompactIdSet, BloomFilter
+
+
+def test_add_contains_and_len():
+    ids = CompactIdSet()
+    ids.update(["3", "1", "2", "1"])
+    ids.add("abc")
+    ids.add("007")  # 前导零按字符串保存
+    assert "1" in ids and "3" in ids and "abc" in ids and "007" in ids
+    assert "7" not in ids and "4" not in ids
+    assert len(ids) == 5
+
+
+def test_save_and_reload(tmp_path):
+    path = tmp_path / id_set.ID_FILE
+    ids = CompactIdSet(path)
+    ids.update(str(i) for i in range(100, 0, -1))
+    ids.add("x-1")
+    ids.save()
+    # 保存后重新映射，新增部分已归并进磁盘数组
+    assert not ids.added
+    assert "50" in ids and "x-1" in ids
+
+    reloaded = CompactIdSet(path)
+    assert len(reloaded) == 101
+    assert sorted(int(i) for i in reloaded if i.isdigit()) == list(range(1, 101))
+    reloaded.add("1000")
+    reloaded.save()
+    assert "1000" in CompactIdSet(path)
+
+
+def test_journal_append_and_merge(tmp_path):
+    path = tmp_path / id_set.ID_FILE
+    ids = CompactIdSet(path)
+    ids.update(["1", "2"])
+    ids.save()
+
+    ids.add("3")
+    ids.add("2")  # 已存在，不写日志
+    assert ids.append_journal() == 1
+    assert ids.append_journal() == 0
+    journal = str(path) + id_set.JOURNAL_SUFFIX
+    with open(journal, encoding="utf-8") as f:
+        assert f.read() == "3\n"
+
+    # 中途退出：重新加载时日志中的ID并入集合
+    restarted = CompactIdSet(path)
+    assert "3" in restarted and len(restarted) == 3
+    restarted.save()
+    assert not os.path.exists(journal)
+    assert len(CompactIdSet(path)) == 3
+
+
+def test_bloom_filter_has_no_false_negatives(tmp_path):
+    path = tmp_path / id_set.ID_FILE
+    ids = CompactIdSet(path, bloom_bits=id_set.DEFAULT_BLOOM_BITS)
+    ids.update(str(i) for i in range(1, 2000, 2))
+    ids.save()
+    assert os.path.exists(str(path) + id_set.BLOOM_SUFFIX)
+
+    reloaded = CompactIdSet(path, bloom_bits=id_set.DEFAULT_BLOOM_BITS)
+    assert reloaded.bloom is not None
+    assert all(str(i) in reloaded for i in range(1, 2000, 2))
+    assert not any(str(i) in reloaded for i in range(2, 2000, 2))
+
+
+def test_stale_bloom_is_rebuilt(tmp_path):
+    path = tmp_path / id_set.ID_FILE
+    ids = CompactIdSet(path, bloom_bits=10)
+    ids.update(["1", "2"])
+    ids.save()
+    # 过滤器与数组不一致（只记录了一个ID）时不能使用
+    stale = BloomFilter.for_capacity(1)
+    stale.add(1)
+    stale.save(str(path) + id_set.BLOOM_SUFFIX)
+
+    reloaded = CompactIdSet(path, bloom_bits=10)
+    assert "1" in reloaded and "2" in reloaded
+
+
+def test_failed_replace_keeps_new_ids(tmp_path, monkeypatch):
+    path = tmp_path / id_set.ID_FILE
+    ids = CompactIdSet(path)
+    ids.update(["1", "2"])
+    ids.save()
+    ids.add("3")
+
+    real_replace = os.replace
+
+    def locked_replace(src, dst):
+        if str(dst) == str(path):
+            raise PermissionError("locked")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", locked_replace)
+    try:
+        ids.save()
+    except PermissionError:
+        pass
+    monkeypatch.setattr(os, "replace", real_replace)
+    # 替换失败后仍映射原文件，新增的ID保留在内存中
+    assert "1" in ids and "3" in ids
+    ids.save()
+    assert len(CompactIdSet(path)) == 3
+
+
+def test_load_legacy_json(tmp_path):
+    legacy = tmp_path / id_set.LEGACY_FILE
+    legacy.write_text('{"downloaded_ids": ["5", "6"]}', encoding="utf-8")
+    assert id_set.load_legacy_json(legacy) == ["5", "6"]
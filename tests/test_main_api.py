@@ -0,0 +1,44 @@
+import importlib
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def crawler(monkeypatch):
+    """main_api_1118 导入时按相对路径读取 stockcodes/stock_orgids.json"""
+    monkeypatch.chdir(REPO_ROOT)
+    return importlib.import_module("main_api_1118")
+
+
+@pytest.fixture
+def posted(crawler, monkeypatch):
+    """替换列表接口请求，记录每次提交的参数"""
+    calls = []
+
+    def post(url, data=None, timeout=None):
+        calls.append(dict(data))
+        return SimpleNamespace(raise_for_status=lambda: None, elapsed=timedelta(seconds=0.01),
+                               json=lambda: {"announcements": [], "totalAnnouncement": 0})
+    monkeypatch.setattr(crawler.HTTP_SESSION, "post", post)
+    return calls
+
+
+def test_resolve_categories(crawler):
+    assert crawler.resolve_categories("") == ""
+    assert crawler.resolve_categories("年报, ndbg,category_bndbg_szsh") == "category_ndbg_szsh;category_bndbg_szsh"
+    with pytest.raises(ValueError):
+        crawler.resolve_categories("年报,不存在的分类")
+
+
+def test_category_and_searchkey_are_sent_to_server(crawler, posted):
+    crawler.fetch_announcement_page(["000001.SZ"], se_date="2024-01-01~2024-01-31", max_retries=0,
+                                    category="category_ndbg_szsh;category_bndbg_szsh", searchkey="关联交易")
+    assert posted[0]["category"] == "category_ndbg_szsh;category_bndbg_szsh"
+    assert posted[0]["searchkey"] == "关联交易"
+    assert posted[0]["stock"].startswith("000001,")
+
@@ -0,0 +1,104 @@
+import json
+
+import md_chunks
+from md_chunks import chunk_document, split_sections, split_long, heading_level, update_chunks
+
+
+def test_heading_level():
+    assert heading_level("## 概述") == (2, "概述")
+    assert heading_level("第一节 重要提示") == (8, "第一节 重要提示")
+    assert heading_level("一、关联交易概述") == (9, "一、关联交易概述")
+    assert heading_level("（二）交易各方") == (10, "（二）交易各方")
+    assert heading_level("一、这是一句以句号结尾的正文。") is None
+    assert heading_level("普通正文") is None
+
+
+def test_split_sections_builds_heading_path():
+    body = "一、关联交易概述\n（一）基本情况\n本次交易金额为一亿元。\n二、其他事项\n无。"
+    sections = split_sections(body)
+    assert sections == [
+        ("一、关联交易概述 > （一）基本情况", ["本次交易金额为一亿元。"]),
+        ("二、其他事项", ["无。"]),
+    ]
+
+
+def test_split_long_respects_max_chars():
+    paragraph = "这是一个句子。" * 50
+    pieces = split_long(paragraph, 40)
+    assert all(len(piece) <= 40 for piece in pieces)
+    assert "".join(pieces) == paragraph
+
+
+def test_chunk_ids_are_stable_and_local():
+    paragraphs = [f"第{i}段的内容说明了公司在本期的经营情况和财务状况。" * 3 for i in range(30)]
+    body = "\n\n".join(paragraphs)
+    chunks = chunk_document(body, "a.pdf", max_chars=300, min_chars=100)
+    assert all(len(chunk["text"]) <= 300 for chunk in chunks)
+    assert [chunk["seq"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunk_document(body, "a.pdf", max_chars=300, min_chars=100) == chunks
+
+    # 在中间插入一段，只影响附近的块
+    edited = "\n\n".join(paragraphs[:15] + ["新增的一段说明。"] + paragraphs[15:])
+    edited_ids = {chunk["id"] for chunk in chunk_document(edited, "a.pdf", max_chars=300, min_chars=100)}
+    unchanged = sum(1 for chunk in chunks if chunk["id"] in edited_ids)
+    assert unchanged >= len(chunks) - 3
+
+    # 来源不同，ID不同
+    other_ids = {chunk["id"] for chunk in chunk_document(body, "b.pdf", max_chars=300, min_chars=100)}
+    assert not other_ids & {chunk["id"] for chunk in chunks}
+
+
+def test_duplicate_chunks_get_distinct_ids():
+    body = "特此公告。\n\n" * 3
+    chunks = chunk_document(body, "a.pdf", max_chars=5, min_chars=1)
+    assert len(chunks) == 3
+    assert len({chunk["id"] for chunk in chunks}) == 3
+
+
+def _write_md(path, body, extracted_at="2026-01-01 00:00:00", **fields):
+    front = "".join(f"{key}: {value}\n" for key, value in fields.items())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\ntitle: {path.stem}\n{front}extracted_at: {extracted_at}\n---\n\n{body}", encoding="utf-8")
+
+
+def _read_delta(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_update_chunks_writes_only_changes(tmp_path):
+    markdown_dir = tmp_path / "markdown"
+    chunk_dir = tmp_path / "chunks"
+    doc = markdown_dir / "000001" / "a.md"
+    _write_md(doc, "一、概述\n本次交易金额为一亿元。\n二、其他\n无其他事项。", source="downloads/a.pdf")
+
+    stats = update_chunks(markdown_dir, chunk_dir, max_chars=200, min_chars=50)
+    assert stats["added"] == 2 and stats["removed"] == 0
+    assert {record["op"] for record in _read_delta(stats["delta"])} == {"add"}
+
+    # 只改 extracted_at：块ID不变，不写变更文件
+    _write_md(doc, "一、概述\n本次交易金额为一亿元。\n二、其他\n无其他事项。", extracted_at="2026-02-01 00:00:00",
+              source="downloads/a.pdf")
+    stats = update_chunks(markdown_dir, chunk_dir, max_chars=200, min_chars=50)
+    assert stats["delta"] is None and stats["kept"] == 2
+
+    # 删除文件：对应的块全部移除
+    doc.unlink()
+    stats = update_chunks(markdown_dir, chunk_dir, max_chars=200, min_chars=50)
+    records = _read_delta(stats["delta"])
+    assert stats["removed"] == 2 and {record["op"] for record in records} == {"remove"}
+
+
+def test_update_chunks_skips_duplicates(tmp_path):
+    markdown_dir = tmp_path / "markdown"
+    _write_md(markdown_dir / "b.md", "正文内容。", duplicate_of="downloads/a.pdf")
+    stats = update_chunks(markdown_dir, tmp_path / "chunks", max_chars=200, min_chars=50)
+    assert stats["added"] == 0 and stats["delta"] is None
+
+
+def test_update_chunks_rejects_bad_params(tmp_path):
+    try:
+        update_chunks(tmp_path / "markdown", tmp_path / "chunks", max_chars=10, min_chars=md_chunks.DEFAULT_MIN_CHARS)
+    except ValueError:
+        return
+    raise AssertionError("min_chars > max_chars 应抛出 ValueError")
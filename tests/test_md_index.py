@@ -0,0 +1,75 @@
+import os
+import sqlite3
+
+import md_index
+
+
+def write_md(path, title, body, stock="000001", date="2024-03-01", extracted_at="2024-03-02 10:00:00"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        f"---\ntitle: {title}\nsource: {path.stem}.pdf\nstock: {stock}\ndate: {date}\n"
+        f"extracted_at: {extracted_at}\n---\n\n{body}\n",
+        encoding="utf-8",
+    )
+
+
+def test_tokenize_and_match_query():
+    assert md_index.tokenize("董事会决议 Q3 Report") == "董事 事会 会决 决议 q3 report"
+    assert md_index.build_match_query("董事会 决议") == '"董事 事会" AND "决议"'
+    # 以单个汉字结尾时改为前缀查询
+    assert md_index.build_match_query("股") == '"股" *'
+    assert md_index.build_match_query("A股") == '"a 股" *'
+    assert md_index.build_match_query("  ,, ") == ""
+
+
+def test_parse_frontmatter():
+    fields, body = md_index.parse_frontmatter("---\ntitle: 年报\nstock: 000001\n---\n正文")
+    assert fields == {"title": "年报", "stock": "000001"}
+    assert body == "正文"
+    assert md_index.parse_frontmatter("正文") == ({}, "正文")
+    assert md_index.parse_frontmatter("---\ntitle: 未闭合\n正文") == ({}, "---\ntitle: 未闭合\n正文")
+
+
+def test_update_index_is_incremental(tmp_path):
+    md_dir = tmp_path / "markdown"
+    index = tmp_path / "index.sqlite"
+    write_md(md_dir / "a.md", "年度报告", "本公司营业收入增长。")
+    write_md(md_dir / "b.md", "董事会决议公告", "会议审议通过利润分配方案。", stock="000002")
+    assert md_index.update_index(md_dir, index) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert md_index.update_index(md_dir, index)["unchanged"] == 2
+
+    # 只有 extracted_at 变化（重新转换）时不重建索引
+    write_md(md_dir / "a.md", "年度报告", "本公司营业收入增长。", extracted_at="2024-04-01 08:00:00")
+    os.utime(md_dir / "a.md", ns=(1, 1))
+    # 正文变化时重新索引
+    write_md(md_dir / "b.md", "董事会决议公告", "会议审议通过回购方案。", stock="000002")
+    stats = md_index.update_index(md_dir, index)
+    assert stats == {"added": 0, "updated": 1, "removed": 0, "unchanged": 1}
+
+    (md_dir / "a.md").unlink()
+    assert md_index.update_index(md_dir, index)["removed"] == 1
+
+
+def test_search_filters_and_single_character_prefix(tmp_path):
+    md_dir = tmp_path / "markdown"
+    index = tmp_path / "index.sqlite"
+    write_md(md_dir / "a.md", "年度报告", "公司A股股票将于近日复牌。", date="2024-01-05")
+    write_md(md_dir / "b.md", "董事会决议公告", "会议审议通过利润分配方案。", stock="000002", date="2024-02-10")
+    md_index.update_index(md_dir, index)
+
+    assert [r["title"] for r in md_index.search("利润分配", index)] == ["董事会决议公告"]
+    assert [r["title"] for r in md_index.search("A股", index)] == ["年度报告"]
+    assert md_index.search("利润分配", index, stock="000001") == []
+    assert md_index.search("公告", index, title_only=True)[0]["stock"] == "000002"
+    assert md_index.search("会议", index, date_to="2024-01-31") == []
+
+
+def test_open_index_adds_content_hash_to_old_schema(tmp_path):
+    index = tmp_path / "old.sqlite"
+    conn = sqlite3.connect(str(index))
+    conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER NOT NULL,"
+                 " size INTEGER NOT NULL, title TEXT, source TEXT, stock TEXT, date TEXT)")
+    conn.close()
+    conn = md_index.open_index(index)
+    assert "content_hash" in {row[1] for row in conn.execute("PRAGMA table_info(docs)")}
+    conn.close()
@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import pytest
+
+from md_shards import ShardWriter, ShardReader, export_loose
+
+
+def test_write_then_read_by_key(tmp_path):
+    with ShardWriter(tmp_path, compression="gzip") as writer:
+        shard_name, offset, length = writer.write("markdown/a.md", "# 甲\n")
+        writer.write("markdown/b.md", "# 乙\n")
+    reader = ShardReader(tmp_path)
+    assert len(reader) == 2 and "markdown/a.md" in reader
+    assert reader.get("markdown/b.md") == "# 乙\n"
+    # 索引中的偏移、长度与写入时返回的一致
+    assert reader.locations["markdown/a.md"][:3] == (shard_name, offset, length)
+    with pytest.raises(KeyError):
+        reader.get("markdown/missing.md")
+
+
+def test_latest_write_wins(tmp_path):
+    with ShardWriter(tmp_path, compression="gzip") as writer:
+        writer.write("markdown/a.md", "旧")
+        writer.write("markdown/a.md", "新")
+    reader = ShardReader(tmp_path)
+    assert reader.get("markdown/a.md") == "新"
+    assert [record["content"] for record in reader.iter_records()] == ["新"]
+
+
+def test_shard_is_concatenated_jsonl(tmp_path):
+    with ShardWriter(tmp_path, compression="gzip") as writer:
+        writer.write("markdown/a.md", "甲")
+        writer.write("markdown/b.md", "乙")
+    shard_path, = tmp_path.glob("shard-*.jsonl.gz")
+    # 多个 gzip 帧直接拼接，整体解压即为 JSONL
+    lines = gzip.decompress(shard_path.read_bytes()).decode("utf-8").splitlines()
+    assert [json.loads(line)["key"] for line in lines] == ["markdown/a.md", "markdown/b.md"]
+
+
+def test_rolls_over_and_reuses_open_shard(tmp_path):
+    with ShardWriter(tmp_path, max_shard_mb=0, compression="gzip") as writer:
+        writer.write("markdown/a.md", "甲")
+        writer.write("markdown/b.md", "乙")
+    assert len(list(tmp_path.glob("shard-*.jsonl.gz"))) == 2
+    assert ShardReader(tmp_path).keys() == ["markdown/a.md", "markdown/b.md"]
+
+    # 未写满的分片在下次打开时被复用
+    with ShardWriter(tmp_path, compression="gzip") as writer:
+        first, _, _ = writer.write("markdown/c.md", "丙")
+    with ShardWriter(tmp_path, compression="gzip") as writer:
+        second, _, _ = writer.write("markdown/d.md", "丁")
+    assert first == second
+
+
+def test_export_loose_with_prefix(tmp_path):
+    shard_dir = tmp_path / "shards"
+    with ShardWriter(shard_dir, compression="gzip") as writer:
+        writer.write("markdown/downloads/000001/a.md", "甲")
+        writer.write("markdown/downloads/000002/b.md", "乙")
+    output_dir = tmp_path / "out"
+    assert export_loose(shard_dir, output_dir, prefix="markdown/downloads/000001/") == 1
+    assert (output_dir / "markdown/downloads/000001/a.md").read_text(encoding="utf-8") == "甲"
+    assert not (output_dir / "markdown/downloads/000002").exists()
+
+
+def test_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ShardWriter(tmp_path, compression="lz4")
@@ -0,0 +1,45 @@
+import near_dup
+from near_dup import NearDupIndex, simhash, hamming
+
+BASE_TEXT = "".join(
+    f"第{i}项议案：会议审议通过了关于第{i}项事项的议案，表决结果为同意九票、反对零票、弃权零票。"
+    for i in range(1, 21)
+)
+
+
+def test_simhash_short_text_is_none():
+    assert simhash("太短") is None
+
+
+def test_simhash_near_duplicates_are_close():
+    corrected = BASE_TEXT.replace("二元", "二点一元")
+    assert hamming(simhash(BASE_TEXT), simhash(corrected)) <= near_dup.MAX_DISTANCE
+    # 空白和标点不影响指纹
+    assert simhash(BASE_TEXT) == simhash(BASE_TEXT.replace("，", " "))
+
+
+def test_check_and_add_finds_earlier_original(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dup.sqlite")
+    try:
+        assert index.check_and_add("a.pdf", BASE_TEXT, "000001") is None
+        assert index.check_and_add("b.pdf", BASE_TEXT + "特此公告。", "000001") == "a.pdf"
+        # 副本的副本指向最早的原件
+        assert index.check_and_add("c.pdf", BASE_TEXT + "特此公告。", "000001") == "a.pdf"
+        # 不同股票之间不比较
+        assert index.check_and_add("d.pdf", BASE_TEXT, "600000") is None
+        # 重新登记原件不会把它判为副本
+        assert index.check_and_add("a.pdf", BASE_TEXT, "000001") is None
+        assert len(index) == 4
+    finally:
+        index.close()
+
+
+def test_unrelated_text_is_not_duplicate(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dup.sqlite")
+    try:
+        index.check_and_add("a.pdf", BASE_TEXT, "000001")
+        other = "关于召开二〇二六年第一次临时股东大会的通知。会议时间为二〇二六年三月十日下午两点三十分，" \
+                "会议地点为公司总部大楼会议室，股权登记日为三月三日，请各位股东按时参会并携带身份证明。"
+        assert index.check_and_add("e.pdf", other, "000001") is None
+    finally:
+        index.close()
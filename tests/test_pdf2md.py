@@ -0,0 +1,163 @@
+import importlib
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import pdf2md
+
+
+class FakePage:
+    def __init__(self, text="", chars=None, images=0):
+        self.text = text
+        self.chars = [None] * (len(text) if chars is None else chars)
+        self.images = [None] * images
+
+    def extract_text(self):
+        return self.text
+
+    def close(self):
+        pass
+
+
+class FakePDF:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_open(monkeypatch):
+    """替换 pdfplumber.open，记录打开次数"""
+    opened = []
+
+    def install(pages):
+        def fake(source, **kwargs):
+            opened.append(source)
+            return FakePDF(pages)
+        monkeypatch.setattr(pdf2md.pdfplumber, "open", fake)
+        return opened
+    return install
+
+
+def test_is_scanned_pdf_needs_most_pages_without_text():
+    text_page = FakePage("本公司董事会及全体董事保证公告内容真实、准确和完整。")
+    scanned_page = FakePage("", images=1)
+    # 封面图或签章页不会让文本PDF被判为扫描件
+    assert not pdf2md.is_scanned_pdf(SimpleNamespace(pages=[scanned_page, text_page, text_page]))
+    assert not pdf2md.is_scanned_pdf(SimpleNamespace(pages=[text_page, text_page, scanned_page]))
+    assert pdf2md.is_scanned_pdf(SimpleNamespace(pages=[scanned_page, scanned_page, text_page]))
+    assert pdf2md.is_scanned_pdf(SimpleNamespace(pages=[scanned_page]))
+    # 没有图片的空白页不是扫描件
+    assert not pdf2md.is_scanned_pdf(SimpleNamespace(pages=[FakePage(""), FakePage("")]))
+    assert not pdf2md.is_scanned_pdf(SimpleNamespace(pages=[]))
+
+
+def test_scan_check_is_off_by_default():
+    args = pdf2md.parse_args([])
+    assert args.scan_check_pages == 0
+    assert pdf2md.conversion_settings(args)["scan_check_pages"] == 0
+
+
+def test_extract_pdf_pages_opens_once(fake_open):
+    opened = fake_open([FakePage("第一页"), FakePage("第二页")])
+    pages, tables, complete = pdf2md.extract_pdf_pages("a.pdf", scan_check_pages=3, chunk_threshold=200)
+    assert (pages, tables, complete) == (["第一页", "第二页"], [], True)
+    assert len(opened) == 1
+
+
+def test_extract_pdf_pages_raises_for_scanned(fake_open):
+    fake_open([FakePage("", images=1)] * 3)
+    with pytest.raises(pdf2md.ScannedPDFError):
+        pdf2md.extract_pdf_pages("a.pdf", scan_check_pages=3)
+    # 不检查时照常提取（文本为空）
+    assert pdf2md.extract_pdf_pages("a.pdf") == (["", "", ""], [], True)
+
+
+def fake_page_range(pdf_path, start, end, extract_tables=False, max_rss_mb=0):
+    """模拟内存上限：设置上限时每块只处理一页就提前结束"""
+    stop = start + 1 if max_rss_mb and end - start > 1 else end
+    return start, stop, [f"p{i}" for i in range(start, stop)], []
+
+
+def test_chunked_continues_in_process_when_workers_cannot_spawn(monkeypatch):
+    monkeypatch.setattr(pdf2md, "extract_page_range", fake_page_range)
+    monkeypatch.setattr(pdf2md, "_can_spawn_workers", lambda: False)
+    pages, tables, complete = pdf2md.extract_pages_chunked("a.pdf", 10, chunk_pages=4, max_rss_mb=100)
+    assert complete and tables == []
+    assert pages == [f"p{i}" for i in range(10)]
+
+
+def test_chunked_without_ceiling_keeps_page_order(monkeypatch):
+    monkeypatch.setattr(pdf2md, "extract_page_range", fake_page_range)
+    assert pdf2md.extract_pages_chunked("a.pdf", 7, chunk_pages=3)[0] == [f"p{i}" for i in range(7)]
+
+
+def test_chunked_subprocesses_match_single_pass():
+    pdf_path = str(next(Path(__file__).resolve().parent.parent.glob("downloads/*/*.pdf")))
+    expected, _, _ = pdf2md.extract_pages_from_pdf(pdf_path)
+    pages, _, complete = pdf2md.extract_pages_chunked(pdf_path, len(expected), chunk_pages=2, workers=2)
+    assert complete and pages == expected
+
+
+def test_output_path_for_downloads_outside_cwd(tmp_path, monkeypatch):
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    save_dir = tmp_path / "data" / "downloads"
+    pdf_path = save_dir / "000001" / "000001_2024-03-01_年度报告.pdf.gz"
+    assert pdf2md.relative_source(pdf_path, save_dir) == Path("downloads/000001/000001_2024-03-01_年度报告.pdf.gz")
+    assert (pdf2md.get_output_path(pdf_path, Path("processed"), source_root=save_dir)
+            == Path("processed/markdown/downloads/000001/000001_2024-03-01_年度报告.md"))
+    with pytest.raises(ValueError):
+        pdf2md.relative_source(pdf_path)
+    # 在工作目录下时与以前一样相对工作目录
+    assert pdf2md.relative_source(work / "downloads" / "a.pdf", save_dir) == Path("downloads/a.pdf")
+
+
+def test_watch_mode_uses_pdf2md_options(monkeypatch):
+    monkeypatch.chdir(Path(__file__).resolve().parent.parent)
+    crawler = importlib.import_module("main_api_1118")
+    args = crawler.parse_args(["--watch", "--convert-options", "--tables --dedup",
+                               "--convert-dir", "out", "--save-dir", "dl"])
+    settings = crawler.load_convert_settings(args)
+    assert settings == pdf2md.conversion_settings(
+        pdf2md.parse_args(["--tables", "--dedup", "--output-dir", "out", "--downloads-dir", "dl"]))
+    assert settings["extract_tables"] and settings["output_dir"] == Path("out")
+    assert settings["dedup_file"] == Path("out") / pdf2md.near_dup.DEFAULT_DEDUP_FILE.name
+    assert settings["source_root"] == Path("dl")
+
+
+BODIES = ["重要提示", "公司简介和主要财务指标", "管理层讨论与分析", "公司治理", "财务报告"]
+
+
+def make_report_pages(count):
+    return [f"平安银行股份有限公司\n2025 年年度报告\n{BODIES[i - 1]}\n第 {i} 页 共 {count} 页" for i in range(1, count + 1)]
+
+
+def test_strip_repeated_lines_removes_headers_and_page_numbers():
+    assert pdf2md.strip_repeated_lines(make_report_pages(5)) == BODIES
+
+
+def test_strip_repeated_lines_keeps_body_and_tables():
+    pages = make_report_pages(5)
+    # 只在少数页出现的行、Markdown 表格行（续表表头）、页数太少的文件都不删除
+    pages[0] += "\n| 项目 | 金额 |"
+    pages[1] += "\n| 项目 | 金额 |"
+    pages[2] += "\n附注一"
+    cleaned = pdf2md.strip_repeated_lines(pages)
+    assert cleaned[0].endswith("| 项目 | 金额 |") and cleaned[2].endswith("附注一")
+    assert pdf2md.strip_repeated_lines(pages[:2]) == pages[:2]
+
+
+def test_page_headers_are_kept_by_default():
+    pages = make_report_pages(5)
+    assert pdf2md.join_pages(pages) == "".join(page + "\n\n" for page in pages)
+    assert "平安银行股份有限公司" not in pdf2md.join_pages(pages, strip_headers=True)
+    assert pdf2md.conversion_settings(pdf2md.parse_args([]))["strip_headers"] is False
+    assert pdf2md.conversion_settings(pdf2md.parse_args(["--strip-page-headers"]))["strip_headers"] is True
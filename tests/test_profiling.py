@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from profiling import StageProfiler
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler()
+    with profiler.stage("list.request"):
+        pass
+    assert profiler.stats == {}
+    profiler.report()
+
+
+def test_nested_stages_accumulate():
+    profiler = StageProfiler()
+    profiler.configure("timing")
+    for _ in range(2):
+        with profiler.stage("download"):
+            with profiler.stage("download.pdf"):
+                time.sleep(0.01)
+    assert profiler.stats["download"][0] == 2 and profiler.stats["download.pdf"][0] == 2
+    # 外层阶段包含内层
+    assert profiler.stats["download"][1] >= profiler.stats["download.pdf"][1] >= 0.02
+
+
+def test_drain_and_merge():
+    worker = StageProfiler()
+    worker.configure("timing")
+    with worker.stage("pdf.extract"):
+        pass
+    stats = worker.drain()
+    assert worker.stats == {}
+
+    main = StageProfiler()
+    main.configure("timing")
+    main.merge(stats)
+    main.merge(stats)
+    assert main.stats["pdf.extract"][0] == 2
+
+
+def test_cprofile_mode_writes_files(tmp_path, capsys):
+    profiler = StageProfiler()
+    profiler.configure("cprofile", tmp_path)
+    with profiler.stage("export"):
+        sum(range(1000))
+    profiler.report(0.1)
+    assert (tmp_path / "export.prof").exists() and (tmp_path / "stages.json").exists()
+    assert "export" in capsys.readouterr().out
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        StageProfiler().configure("perf")
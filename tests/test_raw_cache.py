@@ -0,0 +1,61 @@
+import gzip
+
+import pdf2md
+import raw_cache
+from raw_cache import RawExtractionCache
+
+DIGEST = "ab" + "0" * 62
+
+
+def test_put_then_get(tmp_path):
+    cache = RawExtractionCache(tmp_path, "0.11.0")
+    assert cache.get(DIGEST, "text") is None
+    cache.put(DIGEST, "text", ["第一页", ""], [])
+    entry = cache.get(DIGEST, "text")
+    assert entry["pages"] == ["第一页", ""] and entry["tables"] == []
+    # 纯文本与表格感知模式分别缓存；条目按摘要前两位分目录，不留临时文件
+    assert cache.get(DIGEST, "tables") is None
+    assert [path.name for path in (tmp_path / "ab").iterdir()] == [cache._entry_path(DIGEST, "text").name]
+
+
+def test_extractor_or_format_change_misses(tmp_path, monkeypatch):
+    RawExtractionCache(tmp_path, "0.10.0").put(DIGEST, "text", ["旧版本"], [])
+    assert RawExtractionCache(tmp_path, "0.11.0").get(DIGEST, "text") is None
+    monkeypatch.setattr(raw_cache, "CACHE_VERSION", raw_cache.CACHE_VERSION + 1)
+    assert RawExtractionCache(tmp_path, "0.10.0").get(DIGEST, "text") is None
+
+
+def test_corrupt_entry_is_a_miss(tmp_path, capsys):
+    cache = RawExtractionCache(tmp_path, "0.11.0")
+    path = cache._entry_path(DIGEST, "text")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"not compressed")
+    assert cache.get(DIGEST, "text") is None
+    assert "损坏" in capsys.readouterr().out
+    # 重新写入后恢复命中
+    cache.put(DIGEST, "text", ["重新提取"], [])
+    assert cache.get(DIGEST, "text")["pages"] == ["重新提取"]
+
+
+def test_content_hash_ignores_storage_compression(tmp_path):
+    plain = tmp_path / "a.pdf"
+    plain.write_bytes(b"%PDF-1.4 content")
+    compressed = tmp_path / "b.pdf.gz"
+    compressed.write_bytes(gzip.compress(b"%PDF-1.4 content"))
+    assert RawExtractionCache.content_hash(plain) == RawExtractionCache.content_hash(compressed)
+
+
+def test_extract_pdf_reuses_cached_pages(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    cache = RawExtractionCache(tmp_path / "cache", "0.11.0")
+    calls = []
+
+    def extract_pages(*args):
+        calls.append(args)
+        return ["第一页", "第二页"], [], True
+    monkeypatch.setattr(pdf2md, "extract_pdf_pages", extract_pages)
+    first = pdf2md.extract_pdf(str(pdf_path), raw_cache=cache)
+    second = pdf2md.extract_pdf(str(pdf_path), raw_cache=cache)
+    assert first == second == ("第一页\n\n第二页\n\n", [])
+    assert len(calls) == 1
@@ -0,0 +1,108 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from response_cache import ResponseCache
+
+HISTORY = {"stock": "000002,gssz0000002;000001,gssz0000001", "seDate": "2020-01-01~2020-01-31", "pageNum": 1}
+
+
+def test_put_get_counts_hits_and_misses(tmp_path):
+    cache = ResponseCache(tmp_path)
+    assert cache.get(HISTORY) is None
+    cache.put(HISTORY, {"announcements": [1, 2]})
+    assert cache.get(HISTORY) == {"announcements": [1, 2]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 重新打开时扫描已有条目
+    reopened = ResponseCache(tmp_path)
+    assert reopened.get(HISTORY) == {"announcements": [1, 2]}
+
+
+def test_normalize_params_sorts_stocks_and_strips_values(tmp_path):
+    params = {"stock": "000002,gssz0000002;000001,gssz0000001", "pageNum": 1, "searchkey": " 年报 "}
+    normalized = ResponseCache.normalize_params(params)
+    assert normalized["stock"] == "000001,gssz0000001;000002,gssz0000002"
+    assert normalized["pageNum"] == "1" and normalized["searchkey"] == "年报"
+
+    cache = ResponseCache(tmp_path)
+    swapped = dict(params, stock="000001,gssz0000001;000002,gssz0000002")
+    assert cache.make_key(params) == cache.make_key(swapped)
+
+
+def test_is_immutable_only_for_past_windows():
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    assert ResponseCache.is_immutable({"seDate": "2020-01-01~2020-01-31"})
+    assert not ResponseCache.is_immutable({"seDate": f"2020-01-01~{today}"})
+    assert not ResponseCache.is_immutable({"seDate": ""})
+    assert not ResponseCache.is_immutable({"seDate": "2020-01-01~"})
+    # 格式不对的日期不按字符串比较，不算历史窗口
+    assert not ResponseCache.is_immutable({"seDate": "2020-01-01~2020/01/31"})
+    assert not ResponseCache.is_immutable({"seDate": "2020-01-01~1.5"})
+    assert not ResponseCache.is_immutable({})
+
+
+def test_ttl_expires_only_mutable_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, ttl=60)
+    current = {"seDate": "", "pageNum": 1}
+    cache.put(current, {"announcements": [1]})
+    cache.put(HISTORY, {"announcements": [2]})
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get(current) is None
+    assert cache.get(HISTORY) == {"announcements": [2]}
+    assert len(cache.entries) == 1
+
+
+def test_incomplete_history_responses_expire(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, ttl=60)
+    pages = [dict(HISTORY, pageNum=i) for i in range(4)]
+    cache.put(pages[0], {"announcements": [], "totalAnnouncement": 0})
+    cache.put(pages[1], {"announcements": None})
+    cache.put(pages[2], {"msg": "请求过于频繁"})
+    cache.put(pages[3], [])
+    assert all(cache.get(params) is not None for params in pages)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert all(cache.get(params) is None for params in pages)
+    assert not cache.entries
+
+
+def test_old_immutable_empty_entry_is_not_trusted(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, ttl=60)
+    cache.put(HISTORY, {"announcements": []})
+    # 旧版缓存把历史窗口的空响应也标为永久有效
+    path = cache._path(cache.make_key(HISTORY))
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    entry["immutable"] = True
+    path.write_text(json.dumps(entry), encoding="utf-8")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get(HISTORY) is None
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path)
+    params = [{"seDate": "", "pageNum": i} for i in range(3)]
+    cache.put(params[0], {"data": "x" * 200})
+    cache.max_bytes = cache.total_bytes * 2 + 10
+    cache.put(params[1], {"data": "x" * 200})
+    cache.entries[cache.make_key(params[0])] = (cache.entries[cache.make_key(params[0])][0], time.time() + 10)
+    cache.put(params[2], {"data": "x" * 200})
+
+    assert cache.get(params[1]) is None
+    assert cache.get(params[0]) is not None and cache.get(params[2]) is not None
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_corrupt_entry_counts_as_miss(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put(HISTORY, {"n": 1})
+    path = cache._path(cache.make_key(HISTORY))
+    path.write_text("{not json", encoding="utf-8")
+    assert cache.get(HISTORY) is None
+    assert cache.misses == 1
+    assert not path.exists() and not cache.entries
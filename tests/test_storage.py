@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+
+import storage
+
+
+def test_stored_and_logical_path():
+    assert storage.stored_path("a/b.pdf") == "a/b.pdf"
+    assert storage.stored_path("a/b.pdf", "gzip") == "a/b.pdf.gz"
+    assert storage.stored_path("a/b.pdf", "zstd") == "a/b.pdf.zst"
+    assert storage.logical_path("a/b.pdf.gz").name == "b.pdf"
+    assert storage.logical_path("a/b.pdf.zst").name == "b.pdf"
+    assert storage.logical_path("a/b.pdf").name == "b.pdf"
+
+
+def test_check_compression():
+    storage.check_compression("gzip")
+    with pytest.raises(ValueError):
+        storage.check_compression("lz4")
+
+
+def test_find_files_includes_compressed(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("a.pdf", "sub/b.pdf.gz", "sub/c.pdf.zst", "d.html", "e.html.gz"):
+        (tmp_path / name).write_bytes(b"")
+    found = [path.relative_to(tmp_path).as_posix() for path in storage.find_files(tmp_path, ".pdf")]
+    assert found == ["a.pdf", "sub/b.pdf.gz", "sub/c.pdf.zst"]
+
+
+def test_gzip_round_trip(tmp_path):
+    data = b"%PDF-1.4\n" + bytes(range(256)) * 100
+    path = storage.stored_path(tmp_path / "x.pdf", "gzip")
+    with storage.open_write(path, "gzip") as f:
+        f.write(data)
+    assert gzip.decompress(open(path, "rb").read()) == data
+    assert storage.read_bytes(path) == data
+    with storage.open_read(path) as f:
+        assert f.read() == data
+    assert storage.open_source(path).read() == data
+
+
+def test_uncompressed_passthrough(tmp_path):
+    path = tmp_path / "x.pdf"
+    with storage.open_write(path) as f:
+        f.write(b"plain")
+    assert storage.read_bytes(path) == b"plain"
+    with storage.open_read(path) as f:
+        assert f.read() == b"plain"
+    assert storage.open_source(path) == path
+
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    data = b"announcement" * 1000
+    path = storage.stored_path(tmp_path / "x.html", "zstd")
+    with storage.open_write(path, "zstd", level=1) as f:
+        f.write(data)
+    assert storage.read_bytes(path) == data
+    with storage.open_read(path) as f:
+        assert f.read() == data